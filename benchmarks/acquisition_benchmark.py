@@ -0,0 +1,223 @@
+"""
+Measure the acquisition path of LabjackReader end to end: collect_data
+ingest throughput, block callback latency, to_array/to_dataframe conversion
+cost, and how long find_max_freq takes to converge.
+
+No LabJack device is needed; the LJM library is replaced by SimulatedLJM.
+Ingest and conversion run on its simulated clock, so they measure only the
+host. Callback latency and find_max_freq stream in real time.
+
+Results are printed as a table. They can also be saved as JSON, and compared
+against an earlier run, in which case the exit status is 1 if anything got
+slower by more than the tolerance.
+
+Usage::
+
+    python benchmarks/acquisition_benchmark.py [--quick] [--output FILE]
+        [--compare BASELINE] [--tolerance 0.2] [--only NAME ...]
+"""
+import argparse
+import datetime
+import json
+import platform
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+from labjackcontroller.labtools import LJMLibrary, LabjackReader, _time_func
+from labjackcontroller.simulation import SimulatedLJM
+
+
+def make_reader(**simulation) -> LabjackReader:
+    LJMLibrary.use_backend(SimulatedLJM(**simulation))
+    reader = LabjackReader("T7")
+    # Measured rates from a real device must not cap the simulated one.
+    reader.frequency_cache = None
+    return reader
+
+
+def channels(num_channels):
+    return ["AIN%d" % i for i in range(num_channels)], [1.0] * num_channels
+
+
+def result(name, params, value, unit, better="higher"):
+    return {"name": name, "params": params, "value": value, "unit": unit,
+            "better": better}
+
+
+def bench_ingest(num_channels, scans_per_read, num_rows):
+    inputs, voltages = channels(num_channels)
+    # The highest rate _setup allows at resolution 1 and a 1 V range. A
+    # packet cannot hold more than a second of scans.
+    frequency = 50000 // num_channels
+    scans_per_read = min(scans_per_read, frequency)
+
+    # Take the best of a few runs, to keep out unrelated hiccups.
+    best = float("inf")
+    with make_reader(realtime=False) as reader:
+        for _ in range(3):
+            total_time, _ = reader.collect_data(inputs, voltages,
+                                                num_rows / frequency,
+                                                frequency,
+                                                scans_per_read=scans_per_read,
+                                                resolution=1)
+            best = min(best, total_time)
+    return [result("ingest", {"channels": num_channels,
+                              "scans_per_read": scans_per_read},
+                   num_rows / best, "scans/s")]
+
+
+def bench_callback_latency(num_channels, scans_per_read, seconds):
+    inputs, voltages = channels(num_channels)
+    frequency = 50000 // num_channels
+    latencies = []
+    time_origin = _time_func()
+
+    def callback(block):
+        # The last column is when the block was read, from time_origin.
+        latencies.append(_time_func() - time_origin - block[-1, -1])
+
+    with make_reader(realtime=True) as reader:
+        reader.collect_data(inputs, voltages, seconds, frequency,
+                            scans_per_read=scans_per_read, resolution=1,
+                            callback_function=callback,
+                            callback_mode="block", time_origin=time_origin)
+
+    params = {"channels": num_channels, "scans_per_read": scans_per_read}
+    return [result("callback_latency_median", params,
+                   1e3 * float(np.median(latencies)), "ms", "lower"),
+            result("callback_latency_p99", params,
+                   1e3 * float(np.percentile(latencies, 99)), "ms", "lower")]
+
+
+def bench_conversion(num_channels, num_rows):
+    inputs, voltages = channels(num_channels)
+    frequency = 50000 // num_channels
+
+    results = []
+    with make_reader(realtime=False) as reader:
+        reader.collect_data(inputs, voltages, num_rows / frequency,
+                            frequency, scans_per_read=1000, resolution=1)
+
+        for name, convert in (("to_array", reader.to_array),
+                              ("to_dataframe", reader.to_dataframe)):
+            best = float("inf")
+            for _ in range(3):
+                start = time.perf_counter()
+                convert()
+                best = min(best, time.perf_counter() - start)
+            results.append(result(name, {"channels": num_channels},
+                                  best * 1e6 / num_rows,
+                                  "s per million rows", "lower"))
+    return results
+
+
+def bench_find_max_freq(num_seconds):
+    # Each read costs the host 0.5 ms, plus 25 us per scan, so at most
+    # 40000 scans/s can be sustained.
+    with make_reader(realtime=True, read_overhead=5e-4,
+                     scan_overhead=2.5e-5) as reader:
+        start = time.perf_counter()
+        frequency, scans_per_read = reader.find_max_freq(
+            ["AIN0"], [10.0], verbose=False, num_seconds=num_seconds)
+        elapsed = time.perf_counter() - start
+
+    params = {"num_seconds": num_seconds}
+    return [result("find_max_freq_time", params, elapsed, "s", "lower"),
+            result("find_max_freq_rate", params, frequency, "scans/s")]
+
+
+def run(quick: bool, only) -> list:
+    num_rows = 200000 if quick else 2000000
+    benchmarks = {
+        "ingest": lambda: [entry
+                           for num_channels in (1, 4, 8)
+                           for scans_per_read in (100, 1000, 10000)
+                           for entry in bench_ingest(num_channels,
+                                                     scans_per_read,
+                                                     num_rows)],
+        "callback_latency": lambda: [entry
+                                     for scans_per_read in (100, 1000)
+                                     for entry in bench_callback_latency(
+                                         4, scans_per_read,
+                                         2 if quick else 10)],
+        "conversion": lambda: [entry
+                               for num_channels in (1, 8)
+                               for entry in bench_conversion(num_channels,
+                                                             num_rows)],
+        "find_max_freq": lambda: bench_find_max_freq(1 if quick else 4),
+    }
+
+    results = []
+    for name, benchmark in benchmarks.items():
+        if only and name not in only:
+            continue
+        for entry in benchmark():
+            print("%-24s %-40s %14.4g %s"
+                  % (entry["name"], json.dumps(entry["params"]),
+                     entry["value"], entry["unit"]))
+            results.append(entry)
+    LJMLibrary.use_backend(None)
+    return results
+
+
+def compare(results: list, baseline: list, tolerance: float) -> list:
+    """
+    Find the results that are worse than the baseline by more than
+    tolerance, as a fraction of the baseline value.
+    """
+    previous = {(entry["name"], json.dumps(entry["params"], sort_keys=True)):
+                entry["value"] for entry in baseline}
+
+    regressions = []
+    for entry in results:
+        key = (entry["name"], json.dumps(entry["params"], sort_keys=True))
+        if key not in previous or not previous[key]:
+            continue
+        change = entry["value"] / previous[key] - 1
+        if entry["better"] == "lower":
+            change = -change
+        if change < -tolerance:
+            regressions.append((entry, previous[key]))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--quick", action="store_true",
+                        help="use fewer rows and shorter runs")
+    parser.add_argument("--only", nargs="+",
+                        choices=["ingest", "callback_latency", "conversion",
+                                 "find_max_freq"],
+                        help="run only these benchmarks")
+    parser.add_argument("--output", help="save the results as JSON here")
+    parser.add_argument("--compare",
+                        help="a JSON file from an earlier run to compare to")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="the fraction a result may worsen by before it"
+                             " counts as a regression")
+    args = parser.parse_args()
+
+    results = run(args.quick, args.only)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump({"date": datetime.datetime.now().isoformat(),
+                       "python": platform.python_version(),
+                       "numpy": np.__version__,
+                       "pandas": pd.__version__,
+                       "machine": platform.machine(),
+                       "quick": args.quick,
+                       "results": results}, output, indent=1)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)["results"]
+        regressions = compare(results, baseline, args.tolerance)
+        for entry, before in regressions:
+            print("REGRESSION %s %s: %.4g -> %.4g %s"
+                  % (entry["name"], json.dumps(entry["params"]), before,
+                     entry["value"], entry["unit"]))
+        sys.exit(1 if regressions else 0)
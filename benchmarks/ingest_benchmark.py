@@ -0,0 +1,90 @@
+"""
+Compare the sustained ingest rate of the old scan-at-a-time packet loop in
+LabjackReader.collect_data against the vectorized block ingest path.
+
+No LabJack device is needed; packets are synthesized up front so only the
+cost of moving stream data into the reader's storage array is measured.
+
+Usage::
+
+    python benchmarks/ingest_benchmark.py
+"""
+import ctypes
+
+import numpy as np
+
+from labjackcontroller.labtools import LabjackReader, _time_func
+
+
+def legacy_ingest(data_arr, max_index, curr_data, step_size, packet_num,
+                  scans_per_read, frequency, start):
+    # The per-scan loop collect_data used before block ingest.
+    for i in range(0, len(curr_data), step_size):
+        if max_index >= len(data_arr):
+            break
+
+        curr_time = (scans_per_read / frequency) \
+            * (packet_num + (i / len(curr_data)))
+
+        data_arr[max_index: max_index + step_size] = \
+            curr_data[i:i + step_size]
+        max_index += step_size
+
+        data_arr[max_index] = curr_time
+        max_index += 1
+        data_arr[max_index] = _time_func() - start
+        max_index += 1
+
+    return max_index
+
+
+def run_legacy(num_channels, scans_per_read, num_packets, frequency):
+    row_width = num_channels + 2
+    size = num_packets * scans_per_read * row_width
+    data_arr = (ctypes.c_double * size)()
+
+    packet = (ctypes.c_double * (scans_per_read * num_channels))()
+    start = _time_func()
+    max_index = 0
+    for packet_num in range(num_packets):
+        max_index = legacy_ingest(data_arr, max_index, packet, num_channels,
+                                  packet_num, scans_per_read, frequency,
+                                  start)
+    return _time_func() - start
+
+
+def run_vectorized(num_channels, scans_per_read, num_packets, frequency):
+    row_width = num_channels + 2
+    num_rows = num_packets * scans_per_read
+    data_arr = (ctypes.c_double * (num_rows * row_width))()
+    data_view = np.ctypeslib.as_array(data_arr).reshape((num_rows,
+                                                         row_width))
+
+    packet = (ctypes.c_double * (scans_per_read * num_channels))()
+    start = _time_func()
+    row = 0
+    for packet_num in range(num_packets):
+        block = np.ctypeslib.as_array(packet).reshape((-1, num_channels))
+        row += LabjackReader._ingest_packet(data_view, row, block,
+                                            packet_num, frequency,
+                                            _time_func() - start)
+    return _time_func() - start
+
+
+if __name__ == "__main__":
+    frequency = 100000
+    num_packets = 200
+
+    print("%8s %14s %18s %18s %8s"
+          % ("Channels", "Scans/Read", "Before (scans/s)", "After (scans/s)",
+             "Speedup"))
+    for num_channels in (1, 4, 8):
+        for scans_per_read in (100, 1000, 10000):
+            num_scans = num_packets * scans_per_read
+            before = run_legacy(num_channels, scans_per_read, num_packets,
+                                frequency)
+            after = run_vectorized(num_channels, scans_per_read, num_packets,
+                                   frequency)
+            print("%8d %14d %18.0f %18.0f %7.1fx"
+                  % (num_channels, scans_per_read, num_scans / before,
+                     num_scans / after, before / after))
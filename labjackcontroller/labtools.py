@@ -1,21 +1,39 @@
-import labjack.ljm as ljm
 from labjack.ljm import constants as ljm_constants, \
                         errorcodes as ljm_errorcodes
 from labjack.ljm.ljm import LJMError
 
+import multiprocessing
 from multiprocessing import Process, Pool
 
 import numpy as np
 import pandas as pd
-from typing import List, Tuple, Union
+from typing import Callable, Dict, Iterator, List, Tuple, Union
 from math import ceil
+import os
 import sys
+import tempfile
 import time
 import datetime
+import threading
+import atexit
 import ctypes
+import json
+import re
+import weakref
 import warnings
+import asyncio
+import queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from ctypes import c_int32
 from colorama import init, Fore
+from labjackcontroller.stages import Decimator, Pyramid, RunningStats, \
+    WelchPSD
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    # Python < 3.8
+    resource_tracker = shared_memory = None
 init()
 
 """
@@ -133,17 +151,50 @@ class LJMLibrary(metaclass=Singleton):
     A singleton class that interfaces with Labjack's LJM C wrapper. Used to
     support the LabjackReader's functionality.
 
+    Connections are pooled: opening a device that is already open returns
+    its existing handle, and the handle is only closed once every user of it
+    has closed it. Device information and the list of connected devices are
+    cached, so inspecting devices repeatedly does not talk to them each time.
+
     Attributes
     ----------
     staticlib : Union[ctypes.WinDLL, ctypes.CDLL]
         A reference to the functions provided in the LJM C wrapper.
+    list_all_ttl : float
+        The number of seconds list_all reuses its last result for.
+
+    Examples
+    --------
+    Stream from a simulated T7 instead of a real device.
+
+    >>> from labjackcontroller.simulation import SimulatedLJM
+    >>> LJMLibrary.use_backend(SimulatedLJM())
+    >>> with LabjackReader("T7") as reader:
+    ...     reader.collect_data(["AIN0"], [10.0], 1, 1000)
     """
     # Base reference to the staticlib.
     _staticlib = None
     _ljm_buffer = {}
+    _ljm_backlog = {}
     _ljm_is_open = {}
 
-    def __init__(self):
+    # Open handles by (device type, connection type, identifier), and how
+    # many users each handle has.
+    _ljm_pool = {}
+    _ljm_users = {}
+    _ljm_pool_lock = threading.Lock()
+
+    # Results of connection_info by handle, and the time and result of the
+    # last list_all.
+    _ljm_info = {}
+    _ljm_list_all = None
+    list_all_ttl = 5.0
+
+    def __init__(self, staticlib=None):
+        if staticlib is not None:
+            self._staticlib = staticlib
+            return
+
         os_is = sys.platform.startswith
         try:
             self._staticlib = (ctypes.WinDLL("LabJackM.dll") if os_is("win32") else
@@ -165,6 +216,35 @@ class LJMLibrary(metaclass=Singleton):
             raise LJMError(errorString="Cannot load the LJM library."
                            " Unsupported platform %s." % sys.platform)
 
+    @classmethod
+    def use_backend(cls, staticlib=None) -> None:
+        """
+        Choose what implements the LJM C library, such as a SimulatedLJM
+        from labjackcontroller.simulation. LabjackReaders created afterwards
+        use it; close any existing ones first, since connections opened
+        through the previous library are forgotten without being closed.
+
+        Parameters
+        ----------
+        staticlib : optional
+            An object with the same functions as the LJM C library. If None,
+            the LJM library is loaded the next time it is needed.
+
+        Returns
+        -------
+        None
+        """
+        with cls._ljm_pool_lock:
+            for state in (cls._ljm_buffer, cls._ljm_backlog,
+                          cls._ljm_is_open, cls._ljm_pool, cls._ljm_users,
+                          cls._ljm_info):
+                state.clear()
+            cls._ljm_list_all = None
+            Singleton._instances.pop(cls, None)
+
+        if staticlib is not None:
+            cls(staticlib)
+
     def _validate_handle(self, handle: int, stream_mode=False) -> None:
         """
         Internal method to validate the handle that a user provides,
@@ -244,7 +324,9 @@ class LJMLibrary(metaclass=Singleton):
     def connection_close(self, handle: str):
         """
         Based on the LJM function LJM_Close. Closes the connection associated
-        with the device handle, freeing it for usage elsewhere.
+        with the device handle, freeing it for usage elsewhere. If the handle
+        was opened more than once through connection_open, it stays open
+        until it has been closed as many times.
 
         Parameters
         ----------
@@ -265,11 +347,28 @@ class LJMLibrary(metaclass=Singleton):
         """
         self._validate_handle(handle)
 
-        error = self.staticlib.LJM_Close(handle)
-        if error != ljm_errorcodes.NOERROR:
-            raise LJMError(error)
+        with self._ljm_pool_lock:
+            users = self._ljm_users.get(handle, 1) - 1
+            if users > 0:
+                self._ljm_users[handle] = users
+                return
+
+            error = self.staticlib.LJM_Close(handle)
+            if error != ljm_errorcodes.NOERROR:
+                raise LJMError(error)
 
-        self._ljm_is_open[handle] = False
+            self._ljm_is_open[handle] = False
+            self._forget_handle(handle)
+
+    def _forget_handle(self, handle: int) -> None:
+        """
+        Internal method to remove a closed handle from the pool and caches.
+        """
+        self._ljm_users.pop(handle, None)
+        self._ljm_info.pop(handle, None)
+        for key in [key for key, value in self._ljm_pool.items()
+                    if value == handle]:
+            del self._ljm_pool[key]
 
     def connection_close_all(self):
         """
@@ -295,18 +394,26 @@ class LJMLibrary(metaclass=Singleton):
         if error != ljm_errorcodes.NOERROR:
             raise LJMError(error)
 
-        # Empty the dict.
-        self._ljm_is_open.clear()
+        # Empty the dicts.
+        with self._ljm_pool_lock:
+            self._ljm_is_open.clear()
+            self._ljm_pool.clear()
+            self._ljm_users.clear()
+            self._ljm_info.clear()
 
-    def connection_info(self, handle: int):
+    def connection_info(self, handle: int, refresh=False):
         """
         Based on the LJM function LJM_GetHandleInfo. Returns attribute info
-        about the device associated with the selected handle.
+        about the device associated with the selected handle. The device is
+        only asked once per handle; later calls return the same information.
 
         Parameters
         ----------
         handle: int
             A valid handle to a LJM device that has an opened connection.
+        refresh: bool, optional
+            If True, ask the device again instead of using what was returned
+            for this handle before.
 
         Returns
         -------
@@ -337,6 +444,9 @@ class LJMLibrary(metaclass=Singleton):
         """
         self._validate_handle(handle)
 
+        if not refresh and handle in self._ljm_info:
+            return self._ljm_info[handle]
+
         device_type = ctypes.c_int32(0)
         connection_type = ctypes.c_int32(0)
         serial_num = ctypes.c_int32(0)
@@ -363,14 +473,19 @@ class LJMLibrary(metaclass=Singleton):
                            "WIFI" if connection_type == ljm_constants.ctWIFI else
                            "Ethernet" if connection_type == ljm_constants.ctETHERNET
                            else "Other")
-        return device_name, connection_name, serial_num.value, \
+        info = device_name, connection_name, serial_num.value, \
             self._num_to_ipv4(ipv4_address.value), port.value, \
             max_packet_size.value
+        self._ljm_info[handle] = info
+        return info
 
     def connection_open(self, device_type: str, connection_type: str,
                         device_id) -> int:
         """
-        Opens a connection to the device with the designated inputs.
+        Opens a connection to the device with the designated inputs. If a
+        connection with the same inputs is already open, its handle is
+        returned instead, and must be closed once more before the connection
+        actually closes.
 
         Parameters
         ----------
@@ -431,27 +546,40 @@ class LJMLibrary(metaclass=Singleton):
         if isinstance(device_id, int):
             device_id = str(device_id)
 
-        error = self.staticlib \
-            .LJM_OpenS(device_type.encode("ascii"),
-                       connection_type.encode("ascii"),
-                       device_id.encode("ascii"),
-                       ctypes.byref(temp_handle))
+        key = (device_type, connection_type, device_id)
+        with self._ljm_pool_lock:
+            handle = self._ljm_pool.get(key)
+            if handle is not None and self._ljm_is_open.get(handle):
+                self._ljm_users[handle] += 1
+                return handle
 
-        if error != ljm_errorcodes.NOERROR:
-            raise LJMError(error)
+            error = self.staticlib \
+                .LJM_OpenS(device_type.encode("ascii"),
+                           connection_type.encode("ascii"),
+                           device_id.encode("ascii"),
+                           ctypes.byref(temp_handle))
 
-        # Note that the connection is now open.
-        self._ljm_is_open[temp_handle.value] = True
+            if error != ljm_errorcodes.NOERROR:
+                raise LJMError(error)
 
-        return temp_handle.value
+            # Note that the connection is now open.
+            handle = temp_handle.value
+            self._ljm_is_open[handle] = True
+            self._ljm_pool[key] = handle
+            self._ljm_users[handle] = self._ljm_users.get(handle, 0) + 1
 
-    def list_all(self) -> List[Tuple[str, str, str, str]]:
+        return handle
+
+    def list_all(self, max_age=None) -> List[Tuple[str, str, str, str]]:
         """
-        Finds all LJM devices connected via any method to the host.
+        Finds all LJM devices connected via any method to the host. Searching
+        is slow, so the devices found are reused for list_all_ttl seconds.
 
         Parameters
         ----------
-        None
+        max_age : float, optional
+            The oldest, in seconds, a previous search may be to be reused.
+            Defaults to list_all_ttl; 0 always searches again.
 
         Returns
         -------
@@ -466,6 +594,13 @@ class LJMLibrary(metaclass=Singleton):
             If the LJM library is forbidden from finding out if there are any
             devices attached.
         """
+        if max_age is None:
+            max_age = self.list_all_ttl
+        if self._ljm_list_all is not None:
+            found_at, devices = self._ljm_list_all
+            if time.monotonic() - found_at < max_age:
+                return list(devices)
+
         num_found = ctypes.c_int32(0)
         dev_types = (ctypes.c_int32 * ljm_constants.LIST_ALL_SIZE)()
         conn_types = (ctypes.c_int32 * ljm_constants.LIST_ALL_SIZE)()
@@ -500,7 +635,9 @@ class LJMLibrary(metaclass=Singleton):
                              else "Other")
             ip_addrs[i] = self._num_to_ipv4(ip_addrs[i])
 
-        return list(zip(*[dev_types, conn_types, ser_nums, ip_addrs]))
+        devices = list(zip(*[dev_types, conn_types, ser_nums, ip_addrs]))
+        LJMLibrary._ljm_list_all = (time.monotonic(), devices)
+        return list(devices)
 
     @property
     def staticlib(self):
@@ -509,6 +646,51 @@ class LJMLibrary(metaclass=Singleton):
         """
         return self._staticlib
 
+    def write_names(self, handle: int, names: List[str],
+                    values: List[float]) -> None:
+        """
+        Based on the LJM function LJM_eWriteNames. Writes values to several
+        named registers of a device at once.
+
+        Parameters
+        ----------
+        handle : int
+            A valid handle to a LJM device that has an opened connection.
+        names : List[str]
+            The names of the registers to write, such as "AIN0_RANGE".
+        values : List[float]
+            The value to write to each register.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If there is not exactly one value per name.
+        Exception
+            If the handle specified does not have a connection open.
+        LJMError
+            If the LJM library cannot write to the device.
+        """
+        if len(values) != len(names):
+            raise ValueError("Expected one value per register name.")
+        self._validate_handle(handle)
+
+        num_frames = len(names)
+        names = (ctypes.c_char_p * num_frames)(*[name.encode("ascii")
+                                                 for name in names])
+        values = (ctypes.c_double * num_frames)(*values)
+        error_address = c_int32(-1)
+
+        error = self.staticlib.LJM_eWriteNames(handle, c_int32(num_frames),
+                                               ctypes.byref(names),
+                                               ctypes.byref(values),
+                                               ctypes.byref(error_address))
+        if error != ljm_errorcodes.NOERROR:
+            raise LJMError(error, error_address.value)
+
     def stream_read(self, handle: int) -> Tuple[ctypes.c_double, int, int]:
         """
         Returns data from a LabJack device with an open connection that is
@@ -543,26 +725,96 @@ class LJMLibrary(metaclass=Singleton):
             If the handle specified does not have a connection to close.
         LJMError
             If the LJM library cannot read from the device.
+
+        See Also
+        --------
+        stream_read_into : Read into a preallocated buffer instead.
         """
 
         self._validate_handle(handle, stream_mode=True)
 
-        # Initialize variables that we'll populate with results
+        # Initialize the array that we'll populate with results
         packet_data = (ctypes.c_double * self._ljm_buffer[handle])()
-        dev_buffer_backlog = ctypes.c_int32(0)
-        ljm_buffer_backlog = ctypes.c_int32(0)
+
+        return (packet_data, *self.stream_read_into(handle, packet_data))
+
+    def stream_read_into(self, handle: int,
+                         out: Union[ctypes.Array, np.ndarray]) \
+            -> Tuple[int, int]:
+        """
+        Based on the LJM function LJM_eStreamRead. Reads data from a LabJack
+        device that is currently streaming into a caller-supplied buffer,
+        allowing the same memory to be reused for every read.
+
+        Parameters
+        ----------
+        handle: int
+            A valid handle to a LJM device that has an opened connection.
+        out: Union[ctypes.Array, numpy.ndarray]
+            A c_double array, or a writable C-contiguous float64 NumPy array,
+            with room for at least scans_per_read * number of channels values.
+            All channels are written sequentially, one scan after another.
+
+        Returns
+        -------
+        device_buffer_backlog : int
+            The number of scans left in the device buffer, as measured from
+            when data was last collected from the device. This should usually
+            be near zero and not growing.
+        ljm_buffer_backlog : int
+            The number of scans left in the LJM buffer, as measured from after
+            the data returned from this function is removed from the LJM
+            buffer. This should usually be near zero and not growing.
+
+        Raises
+        ------
+        KeyError
+            If the handle specified does not have a buffer associated with it,
+            meaning the stream initialization has not happened or was
+            originally not successful.
+        Exception
+            If the handle specified does not have a connection to close.
+        TypeError
+            If out is not a c_double array or a float64 NumPy array.
+        ValueError
+            If out is too small, not writable, or not C-contiguous.
+        LJMError
+            If the LJM library cannot read from the device.
+        """
+        self._validate_handle(handle, stream_mode=True)
+
+        if isinstance(out, np.ndarray):
+            if out.dtype != np.float64:
+                raise TypeError("Expected a float64 array, not %s."
+                                % str(out.dtype))
+            if not (out.flags.c_contiguous and out.flags.writeable):
+                raise ValueError("Expected a writable, C-contiguous array.")
+            out_size = out.size
+            out_ref = out.ctypes.data_as(ctypes.POINTER(ctypes.c_double))
+        elif isinstance(out, ctypes.Array) and out._type_ is ctypes.c_double:
+            out_size = len(out)
+            out_ref = ctypes.byref(out)
+        else:
+            raise TypeError("Expected a c_double array or a NumPy array,"
+                            " not %s." % str(type(out)))
+
+        if out_size < self._ljm_buffer[handle]:
+            raise ValueError("Expected room for at least %d values, but the"
+                             " buffer provided holds %d."
+                             % (self._ljm_buffer[handle], out_size))
+
+        # Reuse this handle's backlog holders rather than making new ones.
+        dev_buffer_backlog, ljm_buffer_backlog = self._ljm_backlog[handle]
 
         # Actually read data from the device
-        error = self.staticlib.LJM_eStreamRead(handle,
-                                               ctypes.byref(packet_data),
+        error = self.staticlib.LJM_eStreamRead(handle, out_ref,
                                                ctypes.byref(dev_buffer_backlog),
                                                ctypes.byref(ljm_buffer_backlog))
         # Handle errors if they occured
         if error != ljm_errorcodes.NOERROR:
             raise LJMError(error)
 
-        return packet_data, dev_buffer_backlog.value, \
-            ljm_buffer_backlog.value
+        return dev_buffer_backlog.value, ljm_buffer_backlog.value
 
     def stream_start(self, handle: int, scan_list: List[str], frequency: float,
                      scans_per_read: int) -> float:
@@ -604,6 +856,7 @@ class LJMLibrary(metaclass=Singleton):
         num_addrs = len(scan_list)
         scan_list = self._names_to_modbus_addresses(scan_list)
         self._ljm_buffer[handle] = scans_per_read * num_addrs
+        self._ljm_backlog[handle] = (c_int32(0), c_int32(0))
 
         error = self.staticlib.LJM_eStreamStart(handle,
                                                 c_int32(scans_per_read),
@@ -645,6 +898,7 @@ class LJMLibrary(metaclass=Singleton):
         self._validate_handle(handle, stream_mode=True)
 
         del self._ljm_buffer[handle]
+        self._ljm_backlog.pop(handle, None)
 
         error = self.staticlib.LJM_eStreamStop(handle)
         if error != ljm_errorcodes.NOERROR:
@@ -701,189 +955,1653 @@ class LJMLibrary(metaclass=Singleton):
                 continue
 
 
-class LabjackReader(object):
+# Every DataBuffer in shared memory, so they can be released before the
+# interpreter starts tearing objects down.
+_shared_buffers = weakref.WeakSet()
+
+
+@atexit.register
+def _close_shared_buffers():
+    for buffer in list(_shared_buffers):
+        buffer.close()
+
+
+# One interval of consecutive skipped samples in one channel.
+_SKIP_DTYPE = np.dtype([("row", np.int64), ("length", np.int64),
+                        ("channel", np.int64)])
+
+
+def _find_skips(packet: np.ndarray, first_row: int) -> np.ndarray:
     """
-    A class designed to represent an arbitrary LabJack device.
+    Find the runs of skipped samples, which LJM reports as -9999.0, in each
+    channel of a packet. first_row is the row number of the packet's first
+    scan, which the returned intervals are numbered from.
+    """
+    skipped = packet == ljm_constants.DUMMY_VALUE
+    if not skipped.any():
+        return np.empty(0, dtype=_SKIP_DTYPE)
 
-    Attributes
-    ----------
-    connection_status : bool
-        True if the connection is open
-        False if the connection is closed/does not exist
-    max_row : int
-        The number of rows recorded in the data array, or -1 on error
-    max_index : int
-        The flat-mapped 1D index of the latest value that has been recorded.
+    # Mark where runs start and end, one channel at a time. The padding
+    # keeps runs from joining across channels.
+    edges = np.diff(np.pad(skipped.T, ((0, 0), (1, 1))).astype(np.int8),
+                    axis=1)
+    channels, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+
+    skips = np.empty(len(starts), dtype=_SKIP_DTYPE)
+    skips["row"] = first_row + starts
+    skips["length"] = ends - starts
+    skips["channel"] = channels
+    return skips
+
+
+def _store_columns(records: np.ndarray, block: np.ndarray) -> None:
     """
+    Copy each column of a 2D block into the matching field of an array of
+    records. Values are clipped to the range of integer fields, so skipped
+    samples (-9999.0) are stored as 0 there.
+    """
+    for i, name in enumerate(records.dtype.names):
+        _store_column(records[name], block[:, i])
 
-    # Keep track of the input channels we're reading.
-    _input_channels = []
 
-    # Declare a data storage handle, is a ctypes.c_int with some number
-    # (in other words, is a C array)
-    _data_arr = None
+def _store_column(dest: np.ndarray, column: np.ndarray) -> None:
+    """
+    Copy a column of values into a 1D array, clipping them to its range if
+    it holds integers.
+    """
+    if dest.dtype.kind in "iu":
+        limits = np.iinfo(dest.dtype)
+        column = np.clip(column, limits.min, limits.max)
+    dest[:] = column
 
-    # Also, specify the largest index that is populated.
-    _max_index = 0
 
-    # There will be an int handle for the LabJack device
-    _handle = -1
+class DataBuffer(object):
+    """
+    A fixed-size store for rows of stream data, where each row is one scan
+    across all channels followed by the device and system time of that scan.
 
-    _connection_open = False
+    When the buffer wraps, it behaves as a ring buffer and only keeps the
+    most recent rows written to it. Otherwise, rows that do not fit are
+    discarded.
 
-    # For administrative purposes, we will also keep track of the
-    # self-reported metadata of this device.
-    _meta_device = None
-    _meta_connection = None
-    _meta_serial_number = 0
-    _meta_ip_addr = None
-    _meta_port = 0
-    _meta_max_packet_size = 0
+    Every column is float64 unless other data types are given, in which case
+    rows are kept as NumPy records with one field per column.
 
-    def __init__(self,
-                 device_type: str,
-                 connection_type="ANY",
-                 device_identifier="ANY") -> None:
+    Rows are stored one after another unless the 'columns' layout is chosen.
+    Then each column is kept in its own contiguous array, which read_columns
+    gives views of, so one channel can be read without passing over the
+    others.
+
+    If the number of rows per packet is given, the two time columns are not
+    stored in each row. The device time is computed from the row number and
+    scan rate, and the system time is stored once per packet; both are
+    filled back in when rows are read.
+
+    The rows are preceded by a small header holding the column names, data
+    types and number of rows written, so a buffer placed in shared memory can
+    be attached to and read live from other processes, and a buffer placed
+    in a memory-mapped file can be read back after the process that wrote
+    it has exited.
+
+    Attributes
+    ----------
+    columns : List[str]
+        The name of each column of a row.
+    row_width : int
+        The number of values in each row.
+    dtypes : List[numpy.dtype]
+        The data type of each column.
+    capacity : int
+        The maximum number of rows the buffer can hold.
+    wrap : bool
+        True if new rows overwrite the oldest rows once the buffer is full.
+    storage : str
+        Where the rows are kept; 'memory', 'shared' or 'file'.
+    name : Union[str, None]
+        The shared memory name or file path other processes can attach to
+        the buffer with, if any.
+    metadata : dict
+        Extra information published in the header.
+    packet_rows : Union[int, None]
+        The number of rows per packet when times are stored per packet.
+    scan_rate : Union[float, None]
+        The number of rows per second when times are stored per packet.
+    layout : str
+        How the rows are laid out in memory; 'rows' or 'columns'.
+    total_rows : int
+        The number of rows that have ever been written to the buffer.
+    num_rows : int
+        The number of rows currently held by the buffer.
+    """
+
+    # Bytes reserved ahead of the rows for the header. The header is the
+    # magic string, the number of rows written, the length of the JSON
+    # description that follows, and the description itself.
+    _HEADER_SIZE = 4096
+    _MAGIC = b"LJCDATA1"
+
+    def __init__(self, columns: List[str], capacity: int, wrap=False,
+                 storage="memory", name=None, metadata=None,
+                 dtypes=None, packet_rows=None, scan_rate=None,
+                 layout="rows") -> None:
         """
-        Initialize a LabJack object.
+        Allocate a new, empty buffer.
 
         Parameters
         ----------
-        device_type : str
-            A LabJack model. Valid options are
-            'ANY' for any arbitrary device connected.
-            'T7' for the T7 and T7 Pro
-            'T4' for the T4
-            'DIGIT' for Digit series devices.
-        connection_type : str, optional
+        columns : List[str]
+            The name of each column of a row.
+        capacity : int
+            The maximum number of rows the buffer can hold.
+        wrap : bool, optional
+            If True, overwrite the oldest rows once the buffer is full.
+        storage : str, optional
             Valid options are
-            'ANY' for attempting any mode of connection
-            'USB' for attempting connection over USB
-            'ETHERNET' for attempting connection over Ethernet
-            'WIFI' for attempting connection over WiFi
-            Support for each of these modes is a function of the LabJack model
-            you are connecting to. When 'ANY' is selected, the LabJack library
-            generally defaults to a USB connection.
-        device_identifier : str, optional
-            The user-designated name of the LabJack device, or an IP address
-            if approperiate.
 
-        Returns
-        -------
-        LabjackReader
-            A new instance of a LabjackReader.
+            'memory'
+                Keep the rows in this process's memory.
+            'shared'
+                Keep the rows in a block of shared memory that other
+                processes can attach to. Requires Python 3.8 or newer.
+            'file'
+                Keep the rows in a memory-mapped file, letting the operating
+                system page them to and from disk. Allows buffers larger
+                than the memory of the host.
+        name : str, optional
+            When storage is 'shared', the name of the shared memory block to
+            create; a unique name is chosen if None. When storage is 'file',
+            the path of the file to create, which is required. An existing
+            file is overwritten.
+        metadata : dict, optional
+            Extra JSON-serializable information to publish in the header.
+        dtypes : List, optional
+            The data type of each column, as anything numpy.dtype accepts.
+            Every column is float64 if None.
+        packet_rows : int, optional
+            If set, store times once per packet of this many rows instead of
+            in every row. Rows must then be written a packet at a time, with
+            the first row of every packet starting at a multiple of
+            packet_rows, and with one system time per packet.
+        scan_rate : float, optional
+            The number of rows per second, which is required when
+            packet_rows is set. The device time of a row is its row number
+            divided by scan_rate.
+        layout : str, optional
+            Valid options are
+
+            'rows'
+                Store each row's values next to each other.
+            'columns'
+                Store each column's values next to each other.
 
         Raises
         ------
-        LJMError
-            If the LJM library cannot open a connection.
-        TypeError
-            If the type of an input is invalid.
         ValueError
-            If a value provided as an argument is invalid.
+            If there are no columns, capacity is less than one, the storage
+            type or layout is unknown, no file is named for file storage,
+            the header description is too large, there is not one data type
+            per column, or packet_rows is set without a positive scan_rate.
+        RuntimeError
+            If shared storage is requested but is not supported by this
+            version of Python.
         """
-        if not isinstance(device_type, str):
-            raise TypeError("device_type error: expected a string instead"
-                            " of %s."
-                            % str(type(device_type)))
-        if device_type not in ["T7", "T4", "DIGIT", "ANY"]:
-            raise ValueError("Expected device type to be either \"T7\","
-                             " \"T4\", \"DIGIT\", or \"ANY\"")
-        if not isinstance(connection_type, str):
-            raise TypeError("connection_type error: expected a string instead"
-                            " of %s."
-                            % str(type(connection_type)))
-        if connection_type not in ["USB", "ETHERNET", "WIFI", "ANY"]:
-            raise ValueError("Expected connection type to be either"
-                             "\"USB\", \"ETHERNET\", \"WIFI\", or \"ANY\"")
-        if not (isinstance(device_identifier, str)
-                or isinstance(device_identifier, int)):
-            raise TypeError("device_identifier error: expected a string"
-                            " or an int instead of %s."
-                            % str(type(device_identifier)))
-        self.device_type, self.connection_type = device_type, connection_type
-        self.device_identifier = device_identifier
-        self._ljm_reference = LJMLibrary()
-
-    def __enter__(self):
-        self.open(verbose=False)
-        return self
+        if not len(columns) or capacity < 1:
+            raise ValueError("Expected at least one column and a positive"
+                             " capacity.")
+        if storage not in ("memory", "shared", "file"):
+            raise ValueError("Expected storage to be either \"memory\","
+                             " \"shared\" or \"file\"")
+        if storage == "file" and name is None:
+            raise ValueError("A file name is needed for file storage.")
+        if layout not in ("rows", "columns"):
+            raise ValueError("Expected layout to be either \"rows\" or"
+                             " \"columns\"")
+
+        self.columns = list(columns)
+        self.row_width = len(self.columns)
+        if dtypes is None:
+            dtypes = [np.float64] * self.row_width
+        if len(dtypes) != self.row_width:
+            raise ValueError("Expected one data type per column.")
+        self.dtypes = [np.dtype(dtype) for dtype in dtypes]
+        self.capacity = capacity
+        self.wrap = wrap
+        self.storage = storage
+        self.name = None
+        self.metadata = dict(metadata) if metadata else {}
+        self.packet_rows = packet_rows
+        self.scan_rate = scan_rate
+        self.layout = layout
+        if packet_rows is not None and (packet_rows < 1 or not scan_rate
+                                        or scan_rate <= 0
+                                        or self.row_width < 3):
+            raise ValueError("Storing times per packet needs a positive"
+                             " number of rows per packet, a positive scan"
+                             " rate and two time columns.")
+
+        description = self._description()
+
+        num_bytes = self._packet_times_offset() \
+            + 8 * self._num_packet_times()
+
+        self._shm = None
+        self._owner = True
+        if storage == "shared":
+            if shared_memory is None:
+                raise RuntimeError("Shared storage requires Python 3.8 or"
+                                   " newer.")
+            self._shm = shared_memory.SharedMemory(name=name, create=True,
+                                                   size=num_bytes)
+            self.name = self._shm.name
+            raw = self._shm.buf
+            _shared_buffers.add(self)
+        elif storage == "file":
+            raw = np.memmap(name, dtype=np.uint8, mode="w+",
+                            shape=(num_bytes,))
+            self.name = name
+        else:
+            raw = (ctypes.c_byte * num_bytes)()
+        self._raw = raw
 
-    def __exit__(self, exc_type, exc_value, traceback):
-        self.close()
+        header = np.frombuffer(raw, dtype=np.uint8, count=self._HEADER_SIZE)
+        header[:8] = np.frombuffer(self._MAGIC, dtype=np.uint8)
+        self._write_description(description)
 
-    def __str__(self):
-        return self.__repr__() + " Max packet size in bytes: %i" \
-               % (self._meta_max_packet_size)
+        self._map_views(raw)
+        self.total_rows = 0
 
-    def __repr__(self):
-        # Make sure we have a connection open.
-        self.open(verbose=False)
+    @classmethod
+    def attach(cls, name: str, storage="shared") -> "DataBuffer":
+        """
+        Attach to a buffer kept in shared memory or a file by another object,
+        possibly in another process. The rows are read in place, without
+        copying the whole buffer.
 
-        # If we don't have enough metadata abut this device, get it.
-        if not (self._meta_device and self._meta_connection
-                and self._meta_serial_number
-                and self._meta_ip_addr
-                and self._meta_port
-                and self._meta_max_packet_size):
+        Parameters
+        ----------
+        name : str
+            The name of the buffer, as given by its name attribute.
+        storage : str, optional
+            Where the buffer is kept; 'shared' or 'file'.
 
-            self._meta_device, self._meta_connection, \
-                self._meta_serial_number, self._meta_ip_addr, \
-                self._meta_port, self._meta_max_packet_size = \
-                self._ljm_reference.connection_info(self._handle)
+        Returns
+        -------
+        DataBuffer
+            A read-only buffer sharing its rows with the original.
 
-        return "LabjackReader('Type': %s, Connection': %s, 'Serial': %i," \
-            " 'IP': %s, 'Port': %i)" \
-            % (self._meta_device, self._meta_connection,
-               self._meta_serial_number, self._meta_ip_addr, self._meta_port)
+        Raises
+        ------
+        RuntimeError
+            If shared memory is not supported by this version of Python.
+        ValueError
+            If the named block of shared memory or file is not a DataBuffer,
+            or the storage type is unknown.
+        """
+        if storage == "file":
+            raw = np.memmap(name, dtype=np.uint8, mode="r")
+            return cls._from_raw(raw, "file", name, None)
+        if storage != "shared":
+            raise ValueError("Expected storage to be either \"shared\" or"
+                             " \"file\"")
+        if shared_memory is None:
+            raise RuntimeError("Shared storage requires Python 3.8 or newer.")
 
-    @property
-    def connection_status(self):
+        try:
+            shm = shared_memory.SharedMemory(name=name, track=False)
+        except TypeError:
+            # Before Python 3.13, every process that opens a block of shared
+            # memory will also try to remove it when it exits. Child
+            # processes share their parent's tracker, and the creator needs
+            # its registration, so leave those alone.
+            shm = shared_memory.SharedMemory(name=name)
+            created_here = any(buffer._owner and buffer.name == shm.name
+                               for buffer in list(_shared_buffers))
+            if multiprocessing.parent_process() is None and not created_here:
+                resource_tracker.unregister(shm._name, "shared_memory")
+
+        buffer = cls._from_raw(shm.buf, "shared", shm.name, shm)
+        _shared_buffers.add(buffer)
+        return buffer
+
+    @classmethod
+    def _from_raw(cls, raw, storage: str, name: str, shm) -> "DataBuffer":
         """
-        Get the status of the connection to the LabJack
+        Internal method to build a read-only buffer over existing memory.
         """
-        return self._connection_open
-
-    @property
-    def max_row(self) -> int:
+        description = cls._read_description(raw)
+
+        buffer = cls.__new__(cls)
+        buffer.columns = description["columns"]
+        buffer.row_width = len(buffer.columns)
+        # Buffers from before per-column types have a single "dtype".
+        buffer.dtypes = [np.dtype(dtype) for dtype in description.get(
+            "dtypes", [description.get("dtype")] * buffer.row_width)]
+        buffer.capacity = description["capacity"]
+        buffer.wrap = description["wrap"]
+        buffer.packet_rows = description.get("packet_rows")
+        buffer.scan_rate = description.get("scan_rate")
+        buffer.layout = description.get("layout", "rows")
+        buffer.storage = storage
+        buffer.name = name
+        buffer.metadata = description["metadata"]
+        buffer._shm = shm
+        buffer._owner = False
+        buffer._raw = raw
+        buffer._map_views(raw)
+        for view in buffer._stored_views():
+            view.flags.writeable = False
+        buffer._packet_times.flags.writeable = False
+        return buffer
+
+    def _description(self) -> bytes:
         """
-        Get the number of rows that currently exist.
+        Internal method to encode the JSON description kept in the header.
         """
-        if self.max_index < 1:
-            return -1
-        # Else...
-        return int(self.max_index / (len(self._input_channels) + 1))
-
-    @property
-    def max_index(self) -> int:
+        description = json.dumps({"columns": self.columns,
+                                  "dtypes": [dtype.str
+                                             for dtype in self.dtypes],
+                                  "capacity": self.capacity,
+                                  "wrap": self.wrap,
+                                  "packet_rows": self.packet_rows,
+                                  "scan_rate": self.scan_rate,
+                                  "layout": self.layout,
+                                  "metadata": self.metadata}).encode("utf-8")
+        if len(description) > self._HEADER_SIZE - 24:
+            raise ValueError("Too much metadata to fit in the buffer header.")
+        return description
+
+    def _write_description(self, description: bytes) -> None:
         """
-        Get or set the largest index value that has been filled.
+        Internal method to store an encoded description in the header.
         """
-        if self._max_index is not None and self._max_index:
-            return self._max_index
-        else:
-            return -1
-
-    @max_index.setter
-    def max_index(self, value: int) -> None:
-        if not isinstance(value, int):
-            raise TypeError("Invalid type provided.")
-        if value < -1:
-            raise ValueError("Invalid value provided, must be greater than or"
-                             " equal to -1.")
-
-        self._max_index = value
-
-    def _reshape_data(self, from_row: int, to_row: int) -> np.ndarray:
+        header = np.frombuffer(self._raw, dtype=np.uint8,
+                               count=self._HEADER_SIZE)
+        header[16:24] = np.frombuffer(np.int64(len(description)).tobytes(),
+                                      dtype=np.uint8)
+        header[24:24 + len(description)] = np.frombuffer(description,
+                                                         dtype=np.uint8)
+
+    def set_scan_rate(self, scan_rate: float, metadata=None) -> None:
         """
-        Get a range of rows from the recorded data
+        Change the scan rate, and optionally metadata, kept with the rows;
+        for when a stream starts at a slightly different rate than the
+        buffer was created for. Buffers already attached elsewhere keep the
+        description they read.
 
         Parameters
         ----------
-        from_row: int
+        scan_rate : float
+            The number of rows per second.
+        metadata : dict, optional
+            Entries to add to or replace in the metadata.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        ValueError
+            If times are stored per packet and scan_rate is not positive, or
+            the new description does not fit in the header.
+        """
+        if self.packet_rows is not None and (not scan_rate
+                                             or scan_rate <= 0):
+            raise ValueError("Storing times per packet needs a positive scan"
+                             " rate.")
+
+        old_rate, old_metadata = self.scan_rate, self.metadata
+        self.scan_rate = scan_rate
+        self.metadata = dict(old_metadata, **(metadata or {}))
+        try:
+            description = self._description()
+        except ValueError:
+            self.scan_rate, self.metadata = old_rate, old_metadata
+            raise
+        self._write_description(description)
+
+    @classmethod
+    def _read_description(cls, raw) -> dict:
+        """
+        Internal method to parse the JSON description in a buffer's header.
+        """
+        header = bytes(raw[:cls._HEADER_SIZE])
+        if header[:8] != cls._MAGIC:
+            raise ValueError("Not a labjackcontroller data buffer.")
+
+        length = int(np.frombuffer(header[16:24], dtype=np.int64)[0])
+        return json.loads(header[24:24 + length].decode("utf-8"))
+
+    def _row_type(self, num_columns: int) -> np.dtype:
+        """
+        Internal method to get the data type of a row made of the first
+        num_columns columns; a record type unless they are all float64.
+        """
+        dtypes = self.dtypes[:num_columns]
+        if all(dtype == np.float64 for dtype in dtypes):
+            return np.dtype((np.float64, (num_columns,)))
+        return np.dtype(list(zip(self.columns, dtypes)))
+
+    @property
+    def _stored_width(self) -> int:
+        """
+        Internal property for the number of columns stored in each row.
+        """
+        if self.packet_rows is None:
+            return self.row_width
+        return self.row_width - 2
+
+    def _num_packet_times(self) -> int:
+        """
+        Internal method to get the number of packets whose system time is
+        kept, which covers every packet with rows in the buffer.
+        """
+        if self.packet_rows is None:
+            return 0
+        return self.capacity // self.packet_rows + 2
+
+    def _column_offsets(self) -> List[int]:
+        """
+        Internal method to get the offset of each stored column in the
+        'columns' layout, followed by the offset just past the last one.
+        Each column is aligned to 8 bytes.
+        """
+        offsets = [self._HEADER_SIZE]
+        for dtype in self.dtypes[:self._stored_width]:
+            offsets.append(offsets[-1]
+                           + 8 * ceil(self.capacity * dtype.itemsize / 8))
+        return offsets
+
+    def _packet_times_offset(self) -> int:
+        """
+        Internal method to get the offset of the packet times, which follow
+        the rows, aligned to 8 bytes.
+        """
+        if self.layout == "columns":
+            return self._column_offsets()[-1]
+        rows_size = self.capacity * self._row_type(self._stored_width).itemsize
+        return self._HEADER_SIZE + 8 * ceil(rows_size / 8)
+
+    def _map_views(self, raw) -> None:
+        """
+        Internal method to create the NumPy views of the row counter and the
+        rows themselves; one view of every row, or one view per column.
+        """
+        self._counter = np.frombuffer(raw, dtype=np.int64, count=1, offset=8)
+        self._view = None
+        self._column_views = None
+        if self.layout == "columns":
+            self._column_views = [
+                np.frombuffer(raw, dtype=dtype, count=self.capacity,
+                              offset=offset)
+                for dtype, offset in zip(self.dtypes[:self._stored_width],
+                                         self._column_offsets())]
+        else:
+            self._view = np.frombuffer(raw,
+                                       dtype=self._row_type(
+                                           self._stored_width),
+                                       count=self.capacity,
+                                       offset=self._HEADER_SIZE)
+        self._packet_times = np.frombuffer(
+            raw, dtype=np.float64, count=self._num_packet_times(),
+            offset=self._packet_times_offset())
+
+    def flush(self) -> None:
+        """
+        Write any changes to a file-backed buffer out to disk. Does nothing
+        for other types of storage.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self.storage == "file" and self._owner and self._raw is not None:
+            self._raw.flush()
+
+    def close(self) -> None:
+        """
+        Release the buffer's memory, leaving it empty. Shared memory is
+        unlinked if this object created it, so no new processes can attach to
+        it. Files are flushed and kept.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        if self._raw is None:
+            return
+
+        self.flush()
+        shm, self._shm = self._shm, None
+
+        # Our own views must go before the memory can be unmapped.
+        self._raw = None
+        self._counter = np.zeros(1, dtype=np.int64)
+        if self._view is not None:
+            self._view = np.array(self._view[:0])
+        if self._column_views is not None:
+            self._column_views = [np.array(view[:0])
+                                  for view in self._column_views]
+        self._packet_times = np.array(self._packet_times[:0])
+
+        if shm is None:
+            return
+
+        try:
+            shm.close()
+        except BufferError:
+            # Arrays handed out still point into the block; it is unmapped
+            # once they are gone.
+            pass
+        if self._owner:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+    @property
+    def total_rows(self) -> int:
+        """
+        Get or set the number of rows that have ever been written.
+        """
+        return int(self._counter[0])
+
+    @total_rows.setter
+    def total_rows(self, value: int) -> None:
+        self._counter[0] = value
+
+    @property
+    def num_rows(self) -> int:
+        """
+        Get the number of rows currently held by the buffer.
+        """
+        return min(self.total_rows, self.capacity)
+
+    @property
+    def is_full(self) -> bool:
+        """
+        Get whether the buffer can no longer accept new rows.
+        """
+        return not self.wrap and self.total_rows >= self.capacity
+
+    def write(self, block: np.ndarray) -> int:
+        """
+        Append a block of rows to the buffer.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A 2D array of shape (number of rows, row_width).
+
+        Returns
+        -------
+        int
+            The number of rows accepted. This is only less than the number of
+            rows in block when the buffer does not wrap and is full.
+        """
+        total_rows = self.total_rows
+
+        if not self.wrap:
+            num_rows = min(len(block), self.capacity - total_rows)
+            self._put(total_rows, block[:num_rows])
+            self._put_packet_times(total_rows, block[:num_rows])
+            self.total_rows = total_rows + num_rows
+            return num_rows
+
+        # Rows older than one full buffer would be overwritten anyway.
+        num_rows = len(block)
+        block = block[-self.capacity:]
+        first = (total_rows + num_rows - len(block)) % self.capacity
+        split = min(len(block), self.capacity - first)
+
+        self._put(first, block[:split])
+        self._put(0, block[split:])
+        self._put_packet_times(total_rows + num_rows - len(block), block)
+
+        # Only publish the new rows once they are in place.
+        self.total_rows = total_rows + num_rows
+        return num_rows
+
+    def _stored_views(self) -> List[np.ndarray]:
+        """
+        Internal method to get every view of the stored rows.
+        """
+        if self._column_views is not None:
+            return self._column_views
+        return [self._view]
+
+    def _put(self, first: int, block: np.ndarray) -> None:
+        """
+        Internal method to store a block of rows, starting at a row of the
+        underlying memory.
+        """
+        if self._column_views is not None:
+            # Split the rows into their columns, once, as they arrive.
+            for i, view in enumerate(self._column_views):
+                _store_column(view[first:first + len(block)], block[:, i])
+        elif self._view.dtype.names is None:
+            self._view[first:first + len(block)] = \
+                block[:, :self._stored_width]
+        else:
+            _store_columns(self._view[first:first + len(block)], block)
+
+    def _put_packet_times(self, first_row: int, block: np.ndarray) -> None:
+        """
+        Internal method to keep the system time of each packet that a block
+        of rows, starting at row number first_row, begins.
+        """
+        if self.packet_rows is None or not len(block):
+            return
+
+        # Offsets in the block of the first row of each packet.
+        next_packet = first_row // self.packet_rows + 1
+        starts = np.arange(next_packet * self.packet_rows - first_row,
+                           len(block), self.packet_rows)
+        if first_row % self.packet_rows == 0:
+            starts = np.concatenate(([0], starts))
+
+        packets = (first_row + starts) // self.packet_rows
+        self._packet_times[packets % len(self._packet_times)] = \
+            block[starts, -1]
+
+    def read(self, from_row: int, to_row: int, copy=True) -> np.ndarray:
+        """
+        Get a range of rows, in the order they were written.
+
+        Parameters
+        ----------
+        from_row : int
+            The first row to include, inclusive, where row 0 is the oldest row
+            held by the buffer.
+        to_row : int
+            The last row to include, non-inclusive.
+        copy : bool, optional
+            If False, return a read-only view of the buffer's memory when the
+            rows are stored contiguously. Rows that wrap around the end of a
+            ring buffer, or with times stored per packet, are always copied.
+
+        Returns
+        -------
+        numpy.ndarray
+            A 2D array of shape (to_row - from_row, row_width) if every
+            column is float64. Otherwise, a 1D array of to_row - from_row
+            records, with one field per column.
+        """
+        from_row = max(from_row, 0)
+        total_rows = self.total_rows
+        num_rows = min(total_rows, self.capacity)
+        to_row = min(to_row, num_rows)
+        count = max(to_row - from_row, 0)
+
+        first = (total_rows - num_rows + from_row) % self.capacity
+        if self.packet_rows is not None:
+            return self._expand_times(total_rows - num_rows + from_row,
+                                      self._read_stored(first, count, False))
+        return self._read_stored(first, count, copy)
+
+    def read_columns(self, from_row: int, to_row: int,
+                     copy=True) -> List[np.ndarray]:
+        """
+        Get a range of rows, in the order they were written, as one array
+        per column.
+
+        Parameters
+        ----------
+        from_row : int
+            The first row to include, inclusive, where row 0 is the oldest row
+            held by the buffer.
+        to_row : int
+            The last row to include, non-inclusive.
+        copy : bool, optional
+            If False, return read-only views of the buffer's memory when the
+            rows are stored contiguously. These are only contiguous
+            themselves with the 'columns' layout. Rows that wrap around the
+            end of a ring buffer, and times stored per packet, are always
+            copied.
+
+        Returns
+        -------
+        List[numpy.ndarray]
+            A 1D array of to_row - from_row values for each column.
+        """
+        from_row = max(from_row, 0)
+        total_rows = self.total_rows
+        num_rows = min(total_rows, self.capacity)
+        to_row = min(to_row, num_rows)
+        count = max(to_row - from_row, 0)
+
+        first = (total_rows - num_rows + from_row) % self.capacity
+        columns = self._read_stored_columns(first, count, copy)
+        if self.packet_rows is not None:
+            columns.extend(self._packet_time_columns(
+                total_rows - num_rows + from_row, count))
+        return columns
+
+    def _read_stored_columns(self, first: int, count: int,
+                             copy: bool) -> List[np.ndarray]:
+        """
+        Internal method to get count rows as stored, starting at a row of the
+        underlying memory, as one array per stored column.
+        """
+        if self._column_views is None:
+            rows = self._read_stored(first, count, copy)
+            if rows.dtype.names is None:
+                return [rows[:, i] for i in range(self._stored_width)]
+            return [rows[name] for name in rows.dtype.names]
+
+        columns = []
+        for view in self._column_views:
+            if first + count > self.capacity:
+                # The range wraps around the end of the buffer.
+                split = self.capacity - first
+                column = np.concatenate((view[first:],
+                                         view[:count - split]))
+            elif copy:
+                column = np.array(view[first:first + count])
+            else:
+                column = view[first:first + count]
+                column.flags.writeable = False
+            columns.append(column)
+        return columns
+
+    def _read_stored(self, first: int, count: int, copy: bool) -> np.ndarray:
+        """
+        Internal method to get count rows as stored, starting at a row of the
+        underlying memory.
+        """
+        if self._column_views is not None:
+            # Rows have to be put back together from their columns.
+            rows = np.empty(count, dtype=self._row_type(self._stored_width))
+            columns = self._read_stored_columns(first, count, False)
+            for i, column in enumerate(columns):
+                if rows.dtype.names is None:
+                    rows[:, i] = column
+                else:
+                    rows[rows.dtype.names[i]] = column
+            return rows
+
+        if first + count <= self.capacity:
+            if copy:
+                return np.array(self._view[first:first + count])
+
+            view = self._view[first:first + count]
+            view.flags.writeable = False
+            return view
+
+        # The range wraps around the end of the buffer.
+        split = self.capacity - first
+        return np.concatenate((self._view[first:],
+                               self._view[:count - split]))
+
+    def _packet_time_columns(self, first_row: int,
+                             count: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Internal method to get the device and system time of count rows
+        stored without them, where first_row is the row number of the first
+        row.
+        """
+        row_numbers = np.arange(first_row, first_row + count)
+        host_times = self._packet_times[(row_numbers // self.packet_rows)
+                                        % len(self._packet_times)]
+        return row_numbers / self.scan_rate, host_times
+
+    def _expand_times(self, first_row: int, rows: np.ndarray) -> np.ndarray:
+        """
+        Internal method to add the time columns to rows stored without them,
+        where first_row is the row number of the first row.
+        """
+        device_times, host_times = self._packet_time_columns(first_row,
+                                                             len(rows))
+
+        expanded = np.empty(len(rows), dtype=self._row_type(self.row_width))
+        if expanded.dtype.names is None:
+            expanded[:, :-2] = rows
+            expanded[:, -2] = device_times
+            expanded[:, -1] = host_times
+        else:
+            for i, name in enumerate(self.columns[:-2]):
+                expanded[name] = rows[name] if rows.dtype.names \
+                    else rows[:, i]
+            expanded[self.columns[-2]] = device_times
+            expanded[self.columns[-1]] = host_times
+        return expanded
+
+
+class Telemetry(object):
+    """
+    Statistics about each read of a stream, recorded into a preallocated
+    array of records so that keeping them costs the read loop almost
+    nothing. The fields of each record are
+
+    time
+        When the read returned, in seconds from the run's time origin.
+    read_seconds
+        The time spent waiting in LJM_eStreamRead.
+    process_seconds
+        The time spent storing the packet and handing it to callbacks and
+        writers before the next read.
+    device_backlog
+        The scans left on the device after the read.
+    ljm_backlog
+        The scans left in LJM's buffer after the read.
+    skips
+        The number of samples in the packet that were skipped.
+
+    Once capacity reads are recorded, each new read replaces the oldest.
+    The records can be taken while a run is still going.
+
+    Attributes
+    ----------
+    capacity : int
+        The most reads kept.
+    num_reads : int
+        The number of reads recorded, including any since replaced.
+    """
+
+    dtype = np.dtype([("time", np.float64), ("read_seconds", np.float64),
+                      ("process_seconds", np.float64),
+                      ("device_backlog", np.int64),
+                      ("ljm_backlog", np.int64), ("skips", np.int64)])
+
+    def __init__(self, capacity: int) -> None:
+        """
+        Create an empty record of reads.
+
+        Parameters
+        ----------
+        capacity : int
+            The most reads to keep.
+        """
+        self.capacity = capacity
+        self.num_reads = 0
+        self._records = np.zeros(capacity, dtype=self.dtype)
+
+    def record(self, read_time: float, read_seconds: float,
+               process_seconds: float, device_backlog: int,
+               ljm_backlog: int, skips: int) -> None:
+        """
+        Record one read. See the class description for what each value is.
+
+        Returns
+        -------
+        None
+        """
+        self._records[self.num_reads % self.capacity] = \
+            (read_time, read_seconds, process_seconds, device_backlog,
+             ljm_backlog, skips)
+        self.num_reads += 1
+
+    def to_array(self) -> np.ndarray:
+        """
+        Get the reads kept, oldest first.
+
+        Returns
+        -------
+        numpy.ndarray
+            A copy of the records, one per read.
+        """
+        num_reads = self.num_reads
+        if num_reads <= self.capacity:
+            return self._records[:num_reads].copy()
+
+        oldest = num_reads % self.capacity
+        return np.concatenate((self._records[oldest:],
+                               self._records[:oldest]))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the reads kept, oldest first, as a DataFrame with one column per
+        field.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per read.
+        """
+        return pd.DataFrame(self.to_array())
+
+
+class BlockConsumer(object):
+    """
+    Calls a function on blocks of stream data from a single background
+    thread. Blocks are handed over through a bounded queue, so whoever is
+    reading the stream only has to wait when the queue is full.
+
+    Attributes
+    ----------
+    function : Callable[[numpy.ndarray], None]
+        The function called on each block.
+    batch_rows : Union[int, None]
+        The number of rows in every block passed to function, or None if
+        blocks are passed on as they are given.
+    """
+
+    # Marks the end of the blocks in the queue.
+    _END = object()
+
+    def __init__(self, function: Callable[[np.ndarray], None],
+                 max_pending=64, batch_rows=None) -> None:
+        """
+        Start a new consumer thread.
+
+        Parameters
+        ----------
+        function : Callable[[numpy.ndarray], None]
+            The function to call on each block.
+        max_pending : int, optional
+            The most blocks that can wait in the queue.
+        batch_rows : int, optional
+            If set, rows are regrouped so every block passed to function has
+            this many rows, except possibly the last one.
+
+        Raises
+        ------
+        ValueError
+            If max_pending or batch_rows is less than one.
+        """
+        if max_pending < 1:
+            raise ValueError("Expected room for at least one block.")
+        if batch_rows is not None and batch_rows < 1:
+            raise ValueError("Expected at least one row per batch.")
+
+        self.function = function
+        self.batch_rows = batch_rows
+
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._batch = None
+        self._batch_len = 0
+        self._error = None
+        self._closed = False
+
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            block = self._queue.get()
+            if block is self._END:
+                return
+
+            # After a failure, keep draining so put never blocks forever.
+            if self._error is None:
+                try:
+                    self.function(block)
+                except Exception as e:
+                    self._error = e
+
+    def put(self, block: np.ndarray) -> None:
+        """
+        Queue a copy of a block of rows for the consumer thread.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A 2D array with one row per scan.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        Exception
+            Whatever exception function raised on an earlier block.
+        """
+        if self._error is not None:
+            raise self._error
+
+        if self.batch_rows is None:
+            self._queue.put(np.array(block))
+            return
+
+        while len(block):
+            if self._batch is None:
+                self._batch = np.empty((self.batch_rows, block.shape[1]))
+                self._batch_len = 0
+
+            num_rows = min(len(block), self.batch_rows - self._batch_len)
+            self._batch[self._batch_len:self._batch_len + num_rows] = \
+                block[:num_rows]
+            self._batch_len += num_rows
+            block = block[num_rows:]
+
+            if self._batch_len == self.batch_rows:
+                self._queue.put(self._batch)
+                self._batch = None
+
+    def close(self, flush=True) -> None:
+        """
+        Stop the consumer thread. Does nothing if it is already stopped.
+
+        Parameters
+        ----------
+        flush : bool, optional
+            If True, pass any partial batch to function and wait for every
+            queued block to be consumed. Otherwise, drop any blocks that are
+            still waiting.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        Exception
+            If flush is True, whatever exception function raised on any
+            block.
+        """
+        if self._closed:
+            return
+        self._closed = True
+
+        if flush and self._batch is not None and self._batch_len:
+            self._queue.put(self._batch[:self._batch_len])
+        elif not flush:
+            while not self._queue.empty():
+                self._queue.get_nowait()
+
+        self._queue.put(self._END)
+        self._thread.join()
+
+        if flush and self._error is not None:
+            raise self._error
+
+
+class AsyncBlockStream(object):
+    """
+    An asynchronous iterator over the packet blocks of a LabJack stream,
+    created by LabjackReader.astream.
+
+    The blocking LJM reads run on a dedicated executor thread, and each block
+    is handed to the event loop through a bounded queue. If the queue fills
+    because blocks are not consumed fast enough, reading pauses until there
+    is room, and the device's backlog grows in the meantime.
+    """
+
+    # Marks the end of the stream in the queue.
+    _END = object()
+
+    def __init__(self, reader: "LabjackReader", blocks: Iterator[np.ndarray],
+                 max_blocks: int) -> None:
+        """
+        Wrap a block iterator for use from an event loop.
+
+        Parameters
+        ----------
+        reader : LabjackReader
+            The reader the blocks come from.
+        blocks : Iterator[numpy.ndarray]
+            An iterator returned by LabjackReader.iter_blocks that has not
+            been started.
+        max_blocks : int
+            The most blocks that can wait in the queue to be consumed.
+        """
+        self._reader = reader
+        self._blocks = blocks
+        self._max_blocks = max_blocks
+        self._loop = None
+        self._queue = None
+        self._executor = None
+        self._producer = None
+        self._closing = False
+
+    async def __aenter__(self):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(maxsize=self._max_blocks)
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._producer = self._loop.run_in_executor(self._executor,
+                                                    self._produce)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self._closing = True
+        # Leave the reader alone if the stream already finished.
+        if not self._producer.done():
+            self._reader.stop()
+
+        # Keep the queue drained so the producer is never stuck on a put.
+        while not self._producer.done():
+            while not self._queue.empty():
+                self._queue.get_nowait()
+            await asyncio.wait([self._producer], timeout=0.05)
+
+        self._executor.shutdown(wait=False)
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self) -> np.ndarray:
+        item = await self._queue.get()
+        if item is self._END:
+            # Leave the marker in place for any later calls.
+            self._queue.put_nowait(item)
+            raise StopAsyncIteration
+        if isinstance(item, BaseException):
+            raise item
+        return item
+
+    def _produce(self) -> None:
+        """
+        Read blocks on the executor thread, passing each to the event loop.
+        """
+        def put(item):
+            asyncio.run_coroutine_threadsafe(self._queue.put(item),
+                                             self._loop).result()
+
+        try:
+            for block in self._blocks:
+                if self._closing:
+                    break
+                put(block)
+        except Exception as e:
+            put(e)
+        finally:
+            self._blocks.close()
+            if not self._closing:
+                put(self._END)
+
+
+class FrequencyCache(object):
+    """
+    Keeps the results of LabjackReader.find_max_freq in a JSON file, so a
+    measured maximum scan rate can be reused after a restart. Results are
+    stored per device serial number, connection type, channel list, channel
+    ranges and resolution.
+
+    Attributes
+    ----------
+    path : str
+        The JSON file results are kept in.
+    """
+
+    # Used when no path is given and LABJACKCONTROLLER_CACHE is not set.
+    default_path = os.path.join(os.path.expanduser("~"), ".cache",
+                                "labjackcontroller", "max_freq.json")
+
+    def __init__(self, path=None) -> None:
+        """
+        Create a cache. Nothing is read until a result is looked up.
+
+        Parameters
+        ----------
+        path : str, optional
+            The JSON file to keep results in. Defaults to the environment
+            variable LABJACKCONTROLLER_CACHE, or else default_path.
+        """
+        if path is None:
+            path = os.environ.get("LABJACKCONTROLLER_CACHE",
+                                  self.default_path)
+        self.path = path
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(serial_number: int, connection_type: str, inputs: List[str],
+            inputs_max_voltages: List[float], resolution: int) -> str:
+        """
+        Get the name a configuration's result is stored under.
+
+        Parameters
+        ----------
+        serial_number : int
+            The serial number of the device.
+        connection_type : str
+            How the device is connected, as reported by
+            LJMLibrary.connection_info.
+        inputs : sequence of strings
+            Names of the channels streamed.
+        inputs_max_voltages : sequence of real values
+            Maximum voltages of the analog channels streamed.
+        resolution : int
+            The stream resolution index.
+
+        Returns
+        -------
+        str
+            The key for this configuration.
+        """
+        return "%i/%s/%s/%s/%i" % (serial_number, connection_type.upper(),
+                                   ",".join(inputs),
+                                   ",".join("%g" % voltage for voltage
+                                            in inputs_max_voltages),
+                                   resolution)
+
+    def _load(self) -> dict:
+        try:
+            with open(self.path) as cache_file:
+                return json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, key: str) -> Union[Tuple[float, int], None]:
+        """
+        Look up a measured result.
+
+        Parameters
+        ----------
+        key : str
+            A key made by FrequencyCache.key.
+
+        Returns
+        -------
+        Union[Tuple[float, int], None]
+            The measured scan rate and scans per read, or None if this
+            configuration has not been measured.
+        """
+        with self._lock:
+            entry = self._load().get(key)
+        if entry is None:
+            return None
+        return entry["frequency"], entry["scans_per_read"]
+
+    def put(self, key: str, frequency: float, scans_per_read: int) -> None:
+        """
+        Store a measured result, replacing any earlier one for the same key.
+        The file is replaced in one step, so readers never see it half
+        written.
+
+        Parameters
+        ----------
+        key : str
+            A key made by FrequencyCache.key.
+        frequency : float
+            The highest scan rate that could be sustained.
+        scans_per_read : int
+            The scans per read it was sustained with.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            entries = self._load()
+            entries[key] = {"frequency": frequency,
+                            "scans_per_read": int(scans_per_read),
+                            "measured": datetime.datetime.now().isoformat()}
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+            try:
+                with os.fdopen(fd, "w") as cache_file:
+                    json.dump(entries, cache_file, indent=1, sort_keys=True)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                os.unlink(temp_path)
+                raise
+
+    def clear(self) -> None:
+        """
+        Forget every stored result.
+
+        Returns
+        -------
+        None
+        """
+        with self._lock:
+            try:
+                os.remove(self.path)
+            except FileNotFoundError:
+                pass
+
+
+class LabjackReader(object):
+    """
+    A class designed to represent an arbitrary LabJack device.
+
+    Attributes
+    ----------
+    connection_status : bool
+        True if the connection is open
+        False if the connection is closed/does not exist
+    max_row : int
+        The number of rows recorded in the data array, or -1 on error
+    max_index : int
+        The flat-mapped 1D index of the latest value that has been recorded.
+    skips : numpy.ndarray
+        Every run of skipped samples in the latest recorded data.
+    telemetry : Union[Telemetry, None]
+        Statistics about each read of the latest run of collect_data.
+    frequency_cache : FrequencyCache
+        Where find_max_freq results are stored, and looked up when starting
+        a stream. Set to None to neither store nor use them.
+    """
+
+    # Keep track of the input channels we're reading.
+    _input_channels = []
+
+    # Statistics about each read of the latest run.
+    _telemetry = None
+
+    # Declare a data storage handle, is a DataBuffer wrapping a C array.
+    _data_buffer = None
+
+    # Also, specify the largest index that is populated.
+    _max_index = 0
+
+    # There will be an int handle for the LabJack device
+    _handle = -1
+
+    _connection_open = False
+
+    # Whether this reader started the stream running on its handle, which
+    # other readers may share.
+    _stream_running = False
+
+    # For administrative purposes, we will also keep track of the
+    # self-reported metadata of this device.
+    _meta_device = None
+    _meta_connection = None
+    _meta_serial_number = 0
+    _meta_ip_addr = None
+    _meta_port = 0
+    _meta_max_packet_size = 0
+
+    def __init__(self,
+                 device_type: str,
+                 connection_type="ANY",
+                 device_identifier="ANY") -> None:
+        """
+        Initialize a LabJack object.
+
+        Parameters
+        ----------
+        device_type : str
+            A LabJack model. Valid options are
+            'ANY' for any arbitrary device connected.
+            'T7' for the T7 and T7 Pro
+            'T4' for the T4
+            'DIGIT' for Digit series devices.
+        connection_type : str, optional
+            Valid options are
+            'ANY' for attempting any mode of connection
+            'USB' for attempting connection over USB
+            'ETHERNET' for attempting connection over Ethernet
+            'WIFI' for attempting connection over WiFi
+            Support for each of these modes is a function of the LabJack model
+            you are connecting to. When 'ANY' is selected, the LabJack library
+            generally defaults to a USB connection.
+        device_identifier : str, optional
+            The user-designated name of the LabJack device, or an IP address
+            if approperiate.
+
+        Returns
+        -------
+        LabjackReader
+            A new instance of a LabjackReader.
+
+        Raises
+        ------
+        LJMError
+            If the LJM library cannot open a connection.
+        TypeError
+            If the type of an input is invalid.
+        ValueError
+            If a value provided as an argument is invalid.
+        """
+        if not isinstance(device_type, str):
+            raise TypeError("device_type error: expected a string instead"
+                            " of %s."
+                            % str(type(device_type)))
+        if device_type not in ["T7", "T4", "DIGIT", "ANY"]:
+            raise ValueError("Expected device type to be either \"T7\","
+                             " \"T4\", \"DIGIT\", or \"ANY\"")
+        if not isinstance(connection_type, str):
+            raise TypeError("connection_type error: expected a string instead"
+                            " of %s."
+                            % str(type(connection_type)))
+        if connection_type not in ["USB", "ETHERNET", "WIFI", "ANY"]:
+            raise ValueError("Expected connection type to be either"
+                             "\"USB\", \"ETHERNET\", \"WIFI\", or \"ANY\"")
+        if not (isinstance(device_identifier, str)
+                or isinstance(device_identifier, int)):
+            raise TypeError("device_identifier error: expected a string"
+                            " or an int instead of %s."
+                            % str(type(device_identifier)))
+        self.device_type, self.connection_type = device_type, connection_type
+        self.device_identifier = device_identifier
+        self._ljm_reference = LJMLibrary()
+
+        # Set from another thread or process to end the running stream.
+        # Every run makes its own, so a stop never outlives its run.
+        self._stop_event = threading.Event()
+
+        # Arrays of the skipped sample intervals found in each packet.
+        self._skip_intervals = []
+
+        # The stages updated by the latest run.
+        self._stages = []
+
+        self.frequency_cache = FrequencyCache()
+
+    def __enter__(self):
+        self.open(verbose=False)
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def __str__(self):
+        return self.__repr__() + " Max packet size in bytes: %i" \
+               % (self._meta_max_packet_size)
+
+    def __repr__(self):
+        # Make sure we have a connection open.
+        self.open(verbose=False)
+
+        # The library only asks the device for this once per connection.
+        self._meta_device, self._meta_connection, \
+            self._meta_serial_number, self._meta_ip_addr, \
+            self._meta_port, self._meta_max_packet_size = \
+            self._ljm_reference.connection_info(self._handle)
+
+        return "LabjackReader('Type': %s, Connection': %s, 'Serial': %i," \
+            " 'IP': %s, 'Port': %i)" \
+            % (self._meta_device, self._meta_connection,
+               self._meta_serial_number, self._meta_ip_addr, self._meta_port)
+
+    @property
+    def connection_status(self):
+        """
+        Get the status of the connection to the LabJack
+        """
+        return self._connection_open
+
+    @property
+    def max_row(self) -> int:
+        """
+        Get the number of rows that currently exist.
+        """
+        if self.max_index < 1:
+            return -1
+        # Else...
+        return int(self.max_index / (len(self._input_channels) + 1))
+
+    @property
+    def max_index(self) -> int:
+        """
+        Get or set the largest index value that has been filled. While data
+        is held in a buffer, this always reflects what the buffer holds, even
+        if another process is writing to it.
+        """
+        max_index = self._max_index
+        if self._data_buffer is not None:
+            max_index = self._data_buffer.num_rows \
+                * self._data_buffer.row_width
+
+        if max_index is not None and max_index:
+            return max_index
+        else:
+            return -1
+
+    @max_index.setter
+    def max_index(self, value: int) -> None:
+        if not isinstance(value, int):
+            raise TypeError("Invalid type provided.")
+        if value < -1:
+            raise ValueError("Invalid value provided, must be greater than or"
+                             " equal to -1.")
+
+        self._max_index = value
+
+    @property
+    def telemetry(self) -> Union[Telemetry, None]:
+        """
+        Get the statistics about each read of the latest collect_data run,
+        as a Telemetry, or None if none were kept. They are updated as the
+        run goes on.
+        """
+        return self._telemetry
+
+    @property
+    def stages(self) -> List:
+        """
+        Get the stages given to the latest collect_data run. They are updated
+        as the run goes on.
+        """
+        return self._stages
+
+    @property
+    def skips(self) -> np.ndarray:
+        """
+        Get every run of skipped samples found by collect_data, as an array
+        of records with the fields
+
+        row
+            The row number of the first skipped sample, counting from the
+            first row recorded, even if a ring buffer has since overwritten
+            earlier rows. Runs entirely in rows a ring buffer has overwritten
+            are forgotten.
+        length
+            The number of consecutive rows skipped.
+        channel
+            The index of the channel skipped, in the order given to
+            collect_data.
+
+        Readers created with attach have no record of skips.
+        """
+        if len(self._skip_intervals) != 1:
+            self._skip_intervals = [np.concatenate(
+                [np.empty(0, dtype=_SKIP_DTYPE)] + self._skip_intervals)]
+        return self._skip_intervals[0]
+
+    @property
+    def storage_name(self) -> Union[str, None]:
+        """
+        Get the name that other processes can pass to attach to read this
+        object's data, or None if its data is not in shared memory or a file.
+        """
+        if self._data_buffer is None:
+            return None
+        return self._data_buffer.name
+
+    @classmethod
+    def attach(cls, name: str, storage="shared") -> "LabjackReader":
+        """
+        Get a reader for data recorded into shared memory or a file by
+        another LabjackReader, which may be in another process. Data is read
+        in place, so polling a long run does not copy it between processes.
+
+        Parameters
+        ----------
+        name : str
+            The storage_name of the reader recording the data.
+        storage : str, optional
+            The storage type the data was recorded with; 'shared' or 'file'.
+
+        Returns
+        -------
+        LabjackReader
+            A reader that is not connected to any device. Only its methods
+            for accessing recorded data, such as to_array and to_dataframe,
+            may be used.
+
+        Raises
+        ------
+        RuntimeError
+            If shared memory is not supported by this version of Python.
+        ValueError
+            If name does not refer to data recorded by a LabjackReader, or
+            the storage type is unknown.
+
+        Examples
+        --------
+        Record 10 minutes of data in one process:
+
+        >>> reader = LabjackReader("T7")
+        >>> reader.collect_data(["AIN0"], [10.0], 600, 10000,
+                                storage="shared", storage_name="run1")
+
+        And meanwhile, look at it from another:
+
+        >>> LabjackReader.attach("run1").to_dataframe(mode="relative",
+                                                      num_rows=100)
+
+        Read back a run recorded to disk:
+
+        >>> LabjackReader.attach("run1.ljdata", storage="file").to_array()
+
+        """
+        buffer = DataBuffer.attach(name, storage=storage)
+
+        reader = cls.__new__(cls)
+        reader.device_type = buffer.metadata.get("device_type")
+        reader.connection_type = buffer.metadata.get("connection_type")
+        reader.device_identifier = buffer.metadata.get("device_identifier")
+        reader._ljm_reference = None
+        reader._stop_event = threading.Event()
+        reader._skip_intervals = []
+        reader._stages = []
+        reader._data_buffer = buffer
+        reader._input_channels = buffer.columns[:-2]
+        return reader
+
+    def _prune_skips(self, first_row: int) -> None:
+        """
+        Forget the runs of skipped samples that end before a row.
+        """
+        while self._skip_intervals:
+            skips = self._skip_intervals[0]
+            keep = skips["row"] + skips["length"] > first_row
+            if keep.all():
+                return
+            if keep.any():
+                self._skip_intervals[0] = skips[keep]
+                return
+            del self._skip_intervals[0]
+
+    def _reshape_data(self, from_row: int, to_row: int,
+                      mask_skips=False, copy=False) -> np.ndarray:
+        """
+        Get a range of rows from the recorded data
+
+        Parameters
+        ----------
+        from_row: int
             The first row to include, inclusive.
         to_row: int
             The last row to include, non-inclusive.
+        mask_skips: bool, optional
+            If True, replace skipped samples with NaN. See to_array.
+        copy: bool, optional
+            If True, return a copy rather than a read-only view of the
+            buffer, where possible. See to_array.
 
         Returns
         -------
@@ -891,22 +2609,201 @@ class LabjackReader(object):
             A 2D array, starting at from_row, of data points, where
             every row is one data point across all channels.
         """
-        if (self._data_arr is not None and self.max_index != -1
+        if (self._data_buffer is not None and self.max_index != -1
            and from_row >= 0):
-            row_width = len(self._input_channels) + 2
-            max_index = min(self.max_index, row_width * to_row)
-
-            start_index = from_row * row_width
-
-            return np.array(self._data_arr[start_index:max_index]) \
-                .reshape((ceil((max_index - start_index) / row_width),
-                         row_width))
+            data = self._data_buffer.read(from_row, to_row,
+                                          copy=copy and not mask_skips)
+            if mask_skips:
+                data = self._mask_skips(data, from_row)
+            return data
         # Else...
         return None
 
+    def _mask_skips(self, data: np.ndarray, from_row: int) -> np.ndarray:
+        """
+        Internal method to get a copy of rows read from the buffer, starting
+        at from_row, with every skipped sample replaced by NaN. Integer
+        columns are converted to float64 to hold NaN.
+        """
+        if data.dtype.names is None:
+            masked = data.astype(np.float64)
+        else:
+            masked = data.astype([(name, np.float64
+                                   if data.dtype[name].kind in "iu"
+                                   else data.dtype[name])
+                                  for name in data.dtype.names])
+
+        # The row number of the first row of data.
+        first_row = self._data_buffer.total_rows \
+            - self._data_buffer.num_rows + from_row
+        for start, end, channel in self._skips_between(first_row,
+                                                       len(data)):
+            if masked.dtype.names is None:
+                masked[start:end, channel] = np.nan
+            else:
+                masked[masked.dtype.names[channel]][start:end] = np.nan
+        return masked
+
+    def _skips_between(self, first_row: int,
+                       count: int) -> List[Tuple[int, int, int]]:
+        """
+        Internal method to get the skipped samples among count rows starting
+        at row number first_row, as the first and last row, non-inclusive,
+        counted from first_row, and channel of each run.
+        """
+        skips = self.skips
+        skips = skips[(skips["row"] < first_row + count)
+                      & (skips["row"] + skips["length"] > first_row)]
+        return [(max(row - first_row, 0),
+                 min(row + length - first_row, count), channel)
+                for row, length, channel in skips.tolist()]
+
+    @staticmethod
+    def _ingest_packet(data_view: np.ndarray, row: int, packet: np.ndarray,
+                       packet_num: int, scan_rate: float,
+                       host_time: float) -> int:
+        """
+        Write one packet of stream data, plus its time columns, into a
+        2D data array in a single vectorized step.
+
+        Parameters
+        ----------
+        data_view : numpy.ndarray
+            A 2D array of shape (rows, number of channels + 2) to write into.
+        row : int
+            The first row of data_view to write to.
+        packet : numpy.ndarray
+            A 2D array of shape (scans_per_read, number of channels), as
+            returned by the LJM library.
+        packet_num : int
+            The number of packets read before this one in the current stream.
+        scan_rate : float
+            The actual scan rate of the stream, in Hz.
+        host_time : float
+            The time, in seconds, the host system recieved this packet at.
+
+        Returns
+        -------
+        int
+            The number of rows written, which is less than the number of
+            scans in packet if data_view would otherwise overflow.
+        """
+        num_rows = min(len(packet), len(data_view) - row)
+        num_addrs = packet.shape[1]
+        dest = data_view[row:row + num_rows]
+
+        dest[:, :num_addrs] = packet[:num_rows]
+
+        # We will manually calculate the times each entry occurs at.
+        # The stream itself is timed by the same clock that runs
+        # CORE_TIMER, and it is officially advised we use the
+        # stream clocking instead.
+        # See https://forums.labjack.com/index.php?showtopic=6992
+        time_col = dest[:, num_addrs]
+        time_col[:] = np.arange(packet_num * len(packet),
+                                packet_num * len(packet) + num_rows)
+        time_col /= scan_rate
+
+        dest[:, num_addrs + 1] = host_time
+
+        return num_rows
+
+    @staticmethod
+    def _column_dtypes(inputs: List[str], dtype: str) -> List[np.dtype]:
+        """
+        Internal method to pick the storage data type of each column of
+        recorded data, including the two time columns.
+
+        Parameters
+        ----------
+        inputs : sequence of strings
+            Names of input channels on the LabJack device to read.
+        dtype : str
+            'float64', 'float32' or 'compact'. See collect_data.
+
+        Returns
+        -------
+        List[numpy.dtype]
+            One data type per input, followed by float64 for both times.
+
+        Raises
+        ------
+        ValueError
+            If dtype is not a known option.
+        """
+        if dtype not in ("float64", "float32", "compact"):
+            raise ValueError("Expected dtype to be either \"float64\","
+                             " \"float32\" or \"compact\"")
+
+        dtypes = []
+        for channel in inputs:
+            if dtype == "float64":
+                dtypes.append(np.dtype(np.float64))
+            elif dtype == "float32" or channel.startswith("AIN"):
+                dtypes.append(np.dtype(np.float32))
+            elif re.fullmatch(r"[DFECM]IO\d+|\w+_STATE|STREAM_DATA_CAPTURE_16",
+                              channel):
+                # Digital lines and states are 16 bits or fewer in a stream.
+                dtypes.append(np.dtype(np.uint16))
+            else:
+                dtypes.append(np.dtype(np.float64))
+        return dtypes + 2 * [np.dtype(np.float64)]
+
+    @staticmethod
+    def _validate_stream_inputs(inputs: List[str],
+                                inputs_max_voltages: List[float],
+                                frequency: int) -> None:
+        """
+        Internal method to validate the stream parameters shared by every
+        method that starts a stream.
+
+        Parameters
+        ----------
+        inputs : sequence of strings
+            Names of input channels on the LabJack device to read.
+        inputs_max_voltages : sequence of real values
+            Maximum voltages corresponding element-wise to the channels
+            listed in inputs.
+        frequency : int
+            Number of times per second (Hz) the device will get a data point
+            for each of the channels specified.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        TypeError
+            If a channel name is not a string.
+        ValueError
+            If no channels or voltages are given, or frequency is not
+            positive.
+        """
+        if not len(inputs):
+            raise ValueError("Needed a non-empty string collection of channels.")
+        for channel in inputs:
+            if not isinstance(channel, str):
+                raise TypeError("Expected a string name for each channel,"
+                                " not %s" % str(channel))
+
+        # Input validation for inputs_max_voltages
+        if not len(inputs_max_voltages):
+            raise ValueError("Needed a non-empty numerical collection of values.")
+        for channel in inputs:
+            if not isinstance(channel, str):
+                raise TypeError("Expected a numerical value, not %s"
+                                % str(channel))
+
+        # Input validation for frequency
+        if frequency <= 0:
+            raise ValueError("Invalid frequency provided for frequency.")
+
     def _close_stream(self, verbose=False) -> None:
         """
-        Close a streaming connection to the LabJack.
+        Close a streaming connection to the LabJack, if this reader started
+        one. A stream another reader started on the same pooled handle is
+        left running.
 
         Parameters
         ----------
@@ -917,10 +2814,13 @@ class LabjackReader(object):
         None
 
         """
+        if not self._stream_running:
+            return
+        self._stream_running = False
+
         try:
             # Try to close the stream
             self._ljm_reference.stream_stop(self._handle)
-            self._connection_open = False
             if verbose:
                 print("\nStream stopped.")
         except Exception:
@@ -930,8 +2830,58 @@ class LabjackReader(object):
                       " stream running.")
             pass
 
+    def _stream_rates(self, inputs, inputs_max_voltages, resolution,
+                      frequency, scans_per_read=-1,
+                      max_frequency=None) -> Tuple[int, int]:
+        """
+        Internal method to get the scan rate and packet size _setup will
+        start a stream with, without touching the device. See _setup for
+        parameters.
+        """
+        # A rate measured on this device beats the rated maximum.
+        measured = None
+        if max_frequency is None:
+            measured = self._measured_max(inputs, inputs_max_voltages,
+                                          resolution)
+            if measured is not None:
+                max_frequency = measured[0]
+
+        if max_frequency is None:
+            # Sanity check on inputs
+            max_frequency = int(calculate_max_speed(
+                self.device_type, len(inputs),
+                int(max(inputs_max_voltages)), resolution))
+            if max_frequency < 0:
+                warnings.warn("Maximum valid scan rate is not known for this"
+                              " configuration or device. Proceed at your own"
+                              " risk.", RuntimeWarning)
+            max_frequency = int(max_frequency / 2)
+
+        # Verify frequency first.
+        if frequency > max_frequency:
+            warnings.warn("Maximum valid scan rate is less than the value"
+                          " provided. Setting to highest valid value.",
+                          UserWarning)
+            frequency = max_frequency
+
+        # Next, verify the scans/read. At the measured maximum, use the
+        # packet size it was measured with.
+        if scans_per_read == -1 and measured is not None \
+           and frequency >= max_frequency:
+            scans_per_read = measured[1]
+        elif scans_per_read == -1:
+            scans_per_read = int(frequency / 2)
+        elif scans_per_read > frequency:
+            warnings.warn("Maximum valid scan/read rate is larger than"
+                          " the scan rate. Setting to be equal to the scan"
+                          " rate.", UserWarning)
+            scans_per_read = int(frequency / 2)
+
+        return frequency, scans_per_read
+
     def _setup(self, inputs, inputs_max_voltages, resolution,
-               frequency, scans_per_read=-1) -> Tuple[int, int]:
+               frequency, scans_per_read=-1,
+               start_barrier=None, max_frequency=None) -> Tuple[int, int]:
         """
         Set up a connection to the LabJack for streaming
 
@@ -951,6 +2901,13 @@ class LabjackReader(object):
         scans_per_read: int, optional
             Number of data points contained in a packet sent by the LabJack
             device. -1 indicates the maximum possible sample rate.
+        start_barrier: threading.Barrier, optional
+            If set, wait on this barrier once the device is configured, just
+            before starting the stream.
+        max_frequency: float, optional
+            The highest scan rate to allow. If None, this is the rate
+            find_max_freq measured for this configuration, if it is in
+            frequency_cache, or else half the rated maximum.
 
         Returns
         -------
@@ -960,31 +2917,9 @@ class LabjackReader(object):
             The actual sample rate the device starts at
 
         """
-        # Sanity check on inputs
-        max_frequency = int(calculate_max_speed(self.device_type, len(inputs),
-                                                int(max(inputs_max_voltages)),
-                                                resolution))
-        if max_frequency < 0:
-            warnings.warn("Maximum valid scan rate is not known for this"
-                          " configuration or device. Proceed at your own"
-                          " risk.", RuntimeWarning)
-        max_frequency = int(max_frequency / 2)
-
-        # Verify frequency first.
-        if frequency > max_frequency:
-            warnings.warn("Maximum valid scan rate is less than the value"
-                          " provided. Setting to highest valid value.",
-                          UserWarning)
-            frequency = max_frequency
-
-        # Next, verify the scans/read.
-        if scans_per_read == -1:
-            scans_per_read = int(frequency / 2)
-        elif scans_per_read > frequency:
-            warnings.warn("Maximum valid scan/read rate is larger than"
-                          " the scan rate. Setting to be equal to the scan"
-                          " rate.", UserWarning)
-            scans_per_read = int(frequency / 2)
+        frequency, scans_per_read = self._stream_rates(
+            inputs, inputs_max_voltages, resolution, frequency,
+            scans_per_read=scans_per_read, max_frequency=max_frequency)
 
         # If a packet is lost, don't try and get it again.
         self._ljm_reference.modify_settings(retry_on_transaction_err=False)
@@ -1008,18 +2943,25 @@ class LabjackReader(object):
             names.append("AIN_ALL_NEGATIVE_CH")
             values.append(ljm_constants.GND)
 
+        # Voltages are given for the analog inputs only, in order; any more
+        # are ignored.
         names.extend([element + "_RANGE" for element in ain_inputs])
-        values.extend(inputs_max_voltages)
+        values.extend(inputs_max_voltages[:len(ain_inputs)])
 
         # Write the analog inputs' negative channels (when applicable),
         # ranges, stream settling time and stream resolution configuration.
-        num_frames = len(names)
-        ljm.eWriteNames(self._handle, num_frames, names, values)
+        self._ljm_reference.write_names(self._handle, names, values)
+
+        # Let other devices catch up, so all their streams start together.
+        if start_barrier is not None:
+            start_barrier.wait()
 
         # Configure and start stream
-        return (self._ljm_reference.stream_start(self._handle, inputs,
-                                                 frequency, scans_per_read),
-                scans_per_read)
+        frequency = self._ljm_reference.stream_start(self._handle, inputs,
+                                                     frequency,
+                                                     scans_per_read)
+        self._stream_running = True
+        return frequency, scans_per_read
 
     def open(self, verbose=True) -> None:
         """
@@ -1050,7 +2992,9 @@ class LabjackReader(object):
     def close(self):
         """
         Close a connection to the LabJack, allowing others to connect to this
-        object's labjack via the connections used by this object.
+        object's labjack via the connections used by this object. Readers
+        sharing the connection keep it until they close too. Does nothing if
+        this reader is not connected.
 
         Parameters
         ----------
@@ -1061,9 +3005,33 @@ class LabjackReader(object):
         None
 
         """
+        if not self._connection_open:
+            return
+
         self._close_stream()
-        self._ljm_reference.connection_close(self._handle)
-        self._connection_open = False
+        try:
+            self._ljm_reference.connection_close(self._handle)
+        finally:
+            self._connection_open = False
+
+    def stop(self) -> None:
+        """
+        End a run of collect_data that is in progress. Safe to call from
+        another thread; the run finishes once the packet it is currently
+        reading has been stored. A run that is still setting up its stream
+        ends as soon as it starts streaming. Does nothing to runs that start
+        later, so it does nothing if no run is in progress.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        self._stop_event.set()
 
     def modify_settings(self, **kwargs):
         """
@@ -1243,7 +3211,8 @@ class LabjackReader(object):
                       resolution=0,
                       verbose=True,
                       max_buffer_size=0,
-                      num_seconds=45):
+                      num_seconds=45,
+                      cached=False):
         """
         Determine the maximum frequency and number of elements per packet this
         device can sample at without overflowing any buffers.
@@ -1261,7 +3230,12 @@ class LabjackReader(object):
         verbose : str, optional
             If enabled, will print out statistics about each read.
         num_seconds : int, optional
-            The amount of time to test a given configuration.
+            The longest amount of time to test a given configuration. Early
+            in the search, and whenever the backlog of scans shows a clear
+            result sooner, configurations are tested for less time.
+        cached : bool, optional
+            If True, and this configuration has been measured before on this
+            device, return the stored result instead of measuring again.
 
         Returns
         -------
@@ -1285,11 +3259,29 @@ class LabjackReader(object):
         >>> reader.find_max_freq(["AIN0", "AIN1"], [10.0, 10.0])
         (57400.0, 1024)
 
+        The result is stored in the reader's frequency_cache, and collect_data
+        streams at up to this rate from then on, instead of half the rated
+        maximum.
+
         """
+        if cached:
+            self.open(verbose=False)
+            measured = self._measured_max(inputs, inputs_max_voltages,
+                                          resolution)
+            if measured is not None:
+                return measured
 
         # Close any existing streams.
         self._close_stream()
 
+        # Search up to the device's rated maximum, rather than the more
+        # conservative limit _setup applies by default.
+        rated_frequency = calculate_max_speed(self.device_type, len(inputs),
+                                              int(max(inputs_max_voltages)),
+                                              resolution)
+        if rated_frequency < 0:
+            rated_frequency = float("inf")
+
         if verbose:
             print("%s %15s %16s %15s %15s %15s"
                   % ("Success", "Scan Rate (Hz)", "Search Range (Hz)",
@@ -1313,6 +3305,12 @@ class LabjackReader(object):
         last_attempted_sample = -1
 
         while(1):
+            # Rates above what _setup allows would be streamed at its limit,
+            # so there is no point searching any higher.
+            if med_rate > rated_frequency:
+                med_rate = max_rate = rated_frequency
+                exponential_mode = False
+
             # First, try to start at the rate specified.
             opened = False
             valid_config = False
@@ -1321,16 +3319,15 @@ class LabjackReader(object):
                 try:
                     # Open a connection.
                     self.open(verbose=False)
-                    frequency, sample_rate = self._setup(inputs,
-                                                         inputs_max_voltages,
-                                                         resolution,
-                                                         med_rate,
-                                                         scans_per_read=scans_per_read)
+                    frequency, sample_rate = self._setup(
+                        inputs, inputs_max_voltages, resolution, med_rate,
+                        scans_per_read=scans_per_read,
+                        max_frequency=rated_frequency)
                 except Exception as e:
                     print(e)
-                    if scans_per_read < med_rate:
+                    if scans_per_read < int(med_rate):
                         # First, try increasing the number of elements/packet.
-                        scans_per_read = min(2 * scans_per_read, med_rate)
+                        scans_per_read = int(min(2 * scans_per_read, med_rate))
                     else:
                         # Step down, and turn off exponential mode
                         exponential_mode = False
@@ -1340,9 +3337,9 @@ class LabjackReader(object):
 
                         if int(med_rate) == int(min_rate) \
                            or int(med_rate) == int(max_rate):
-                            self._close_stream()
-                            return last_good_rate - (last_good_rate % 100), \
-                                last_good_scan_per_packet
+                            return self._finish_max_freq(
+                                inputs, inputs_max_voltages, resolution,
+                                last_good_rate, last_good_scan_per_packet)
                 else:
                     opened = True
 
@@ -1367,39 +3364,56 @@ class LabjackReader(object):
             last_attempted_rate = med_rate
             last_attempted_sample = scans_per_read
 
-            iterations = 0
             buffer_size = 0
             num_skips = 0
             ljm_buffer_size = 0
             max_buffer_size = 0
 
+            # Every read of this trial reuses the same buffer.
+            packet_data = np.empty(sample_rate * len(inputs))
+
+            # Trials get longer as the search closes in on the answer, but
+            # may end early once the backlog shows whether the rate is
+            # sustainable.
+            trial_seconds = self._trial_seconds(num_seconds, min_rate,
+                                                max_rate, exponential_mode)
+            # Running sums for a least-squares fit of backlog over time.
+            fit = np.zeros(5)
+            passed = None
+
             start = time.time()
 
             try:
-                while time.time() - start < num_seconds:
+                while passed is None:
                     # Read all rows of data off of the latest packet
                     # in the stream.
-                    ret = self._ljm_reference.stream_read(self._handle)
-                    buffer_size = ret[1]
-                    ljm_buffer_size = max(ljm_buffer_size, ret[2])
+                    buffer_size, ljm_backlog = self._ljm_reference \
+                        .stream_read_into(self._handle, packet_data)
+                    ljm_buffer_size = max(ljm_buffer_size, ljm_backlog)
 
-                    for element in ret[0]:
-                        if element == -9999.0:
-                            num_skips += 1
+                    num_skips += int(np.count_nonzero(
+                        packet_data == ljm_constants.DUMMY_VALUE))
 
                     max_buffer_size = max(max_buffer_size, buffer_size)
-                    iterations += len(ret[0])
 
-                    if buffer_size > MAX_BUFFERSIZE \
-                       or num_skips \
-                       or ljm_buffer_size > MAX_LJM_BUFFERSIZE:
-                        if scans_per_read < med_rate:
+                    elapsed = time.time() - start
+                    backlog = buffer_size + ljm_backlog
+                    fit += (1, elapsed, backlog, elapsed * elapsed,
+                            elapsed * backlog)
+                    passed = self._judge_trial(fit, backlog, num_skips,
+                                               scans_per_read, elapsed,
+                                               trial_seconds)
+
+                    if not passed and passed is not None:
+                        if scans_per_read < int(med_rate):
                             # First, try increasing the number of elements
                             # per packet.
-                            scans_per_read = min(2 * scans_per_read, med_rate)
+                            scans_per_read = int(min(2 * scans_per_read,
+                                                     med_rate))
                         else:
-                            # Step down, and turn off exponential mode
-                            scans_per_read = 1
+                            # Step down, and turn off exponential mode. The
+                            # last packet size that worked is a good start.
+                            scans_per_read = max(last_good_scan_per_packet, 1)
                             max_rate = med_rate
                             med_rate = (min_rate + med_rate) / 2
                             exponential_mode = False
@@ -1407,17 +3421,14 @@ class LabjackReader(object):
                             if (int(med_rate) == int(min_rate)
                                or int(med_rate) == int(max_rate)):
                                 # Go to last good and terminate.
-                                self._close_stream()
-                                return last_good_rate - (last_good_rate % 100), \
-                                    last_good_scan_per_packet
-
-                        # In all cases, try again.
-                        break
+                                return self._finish_max_freq(
+                                    inputs, inputs_max_voltages, resolution,
+                                    last_good_rate, last_good_scan_per_packet)
 
             except LJMError:
-                if scans_per_read < med_rate:
+                if scans_per_read < int(med_rate):
                     # First, try increasing the number of elements per packet.
-                    scans_per_read = min(2 * scans_per_read, med_rate)
+                    scans_per_read = int(min(2 * scans_per_read, med_rate))
                 else:
                     # Step down, and turn off exponential mode
                     scans_per_read = last_good_scan_per_packet
@@ -1426,9 +3437,7 @@ class LabjackReader(object):
                     exponential_mode = False
                     break
             else:
-                if (buffer_size <= MAX_BUFFERSIZE
-                   and not num_skips
-                   and ljm_buffer_size <= MAX_LJM_BUFFERSIZE):
+                if passed:
                     # Store these working values
                     last_good_rate = med_rate
                     last_good_scan_per_packet = scans_per_read
@@ -1447,9 +3456,9 @@ class LabjackReader(object):
 
                     if int(med_rate) == int(min_rate) \
                        or int(med_rate) == int(max_rate):
-                        self._close_stream()
-                        return last_good_rate - (last_good_rate % 100), \
-                            last_good_scan_per_packet
+                        return self._finish_max_freq(
+                            inputs, inputs_max_voltages, resolution,
+                            last_good_rate, last_good_scan_per_packet)
             finally:
                 self._close_stream()
 
@@ -1461,16 +3470,148 @@ class LabjackReader(object):
                            (Fore.RED if ljm_buffer_size > MAX_LJM_BUFFERSIZE else Fore.RESET) + str(ljm_buffer_size) + Fore.RESET,
                            (Fore.RED if num_skips > 0 else Fore.RESET) + str(num_skips) + Fore.RESET))
 
+    def _finish_max_freq(self, inputs, inputs_max_voltages, resolution,
+                         frequency, scans_per_read) -> Tuple[float, int]:
+        """
+        Internal method to end find_max_freq, storing a successful result in
+        frequency_cache.
+        """
+        self._close_stream()
+        frequency = frequency - (frequency % 100)
+
+        if frequency > 0 and self.frequency_cache is not None:
+            key = self._frequency_key(inputs, inputs_max_voltages, resolution)
+            if key is not None:
+                self.frequency_cache.put(key, frequency, scans_per_read)
+
+        return frequency, scans_per_read
+
+    def _frequency_key(self, inputs, inputs_max_voltages,
+                       resolution) -> Union[str, None]:
+        """
+        Internal method to get the frequency_cache key of a configuration on
+        this device, or None if the device cannot be identified.
+        """
+        try:
+            _, connection_type, serial_number, _, _, _ = \
+                self._ljm_reference.connection_info(self._handle)
+        except Exception:
+            return None
+        return FrequencyCache.key(serial_number, connection_type, inputs,
+                                  inputs_max_voltages, resolution)
+
+    def _measured_max(self, inputs, inputs_max_voltages,
+                      resolution) -> Union[Tuple[float, int], None]:
+        """
+        Internal method to look up the stored find_max_freq result for a
+        configuration on this device, if there is one.
+        """
+        if self.frequency_cache is None:
+            return None
+        key = self._frequency_key(inputs, inputs_max_voltages, resolution)
+        if key is None:
+            return None
+        return self.frequency_cache.get(key)
+
+    @staticmethod
+    def _trial_seconds(num_seconds: float, min_rate: float, max_rate: float,
+                       exponential_mode: bool) -> float:
+        """
+        Internal method to get the longest time find_max_freq should test a
+        rate for. Trials are short while the search bracket is wide, and
+        grow to num_seconds as it narrows.
+        """
+        shortest = min(num_seconds, max(1.0, num_seconds / 10))
+        if exponential_mode or max_rate <= 0:
+            return shortest
+
+        width = (max_rate - min_rate) / max_rate
+        return num_seconds - (num_seconds - shortest) * min(1.0, 2 * width)
+
+    @staticmethod
+    def _judge_trial(fit: np.ndarray, backlog: int, num_skips: int,
+                     scans_per_read: int, elapsed: float,
+                     trial_seconds: float) -> Union[bool, None]:
+        """
+        Internal method to decide whether a trial of find_max_freq has shown
+        that a configuration can be sustained.
+
+        Parameters
+        ----------
+        fit : numpy.ndarray
+            Sums over every read so far of 1, t, b, t * t and t * b, where t
+            is the seconds since the trial started and b is the number of
+            scans waiting on the device and in LJM.
+        backlog : int
+            The number of scans waiting after the latest read.
+        num_skips : int
+            The number of samples skipped so far.
+        scans_per_read : int
+            The number of scans in each packet.
+        elapsed : float
+            The seconds since the trial started.
+        trial_seconds : float
+            The longest the trial may last. Once elapsed reaches it, the
+            trial is always decided.
+
+        Returns
+        -------
+        Union[bool, None]
+            True if the configuration passed, False if it failed, and None
+            if the trial needs to continue.
+        """
+        final = elapsed >= trial_seconds
+        if num_skips:
+            return False
+        if backlog > 4 * scans_per_read:
+            # Far behind; no need to wait for a trend.
+            return False
+
+        num_reads, sum_t, sum_b, sum_tt, sum_tb = fit
+        spread = num_reads * sum_tt - sum_t * sum_t
+        if num_reads < 5 or spread <= 0:
+            return backlog <= scans_per_read if final else None
+
+        # Scans per second the backlog grows by. The host is keeping up if,
+        # at this pace, the backlog would grow by less than a packet over a
+        # whole trial.
+        slope = (num_reads * sum_tb - sum_t * sum_b) / spread
+        tolerance = scans_per_read / trial_seconds
+        if slope > tolerance and backlog > scans_per_read:
+            return False
+        if final:
+            return slope <= tolerance and backlog <= 2 * scans_per_read
+        if (elapsed >= trial_seconds / 4 and slope <= tolerance
+           and backlog <= scans_per_read):
+            return True
+        return None
+
     def collect_data(self,
                      inputs: List[str],
                      inputs_max_voltages: List[float],
-                     seconds: float,
+                     seconds: Union[float, None],
                      frequency: int,
                      scans_per_read=-1,
                      resolution=4,
                      verbose=False,
                      callback_function=None,
-                     num_threads=4) -> Tuple[float, float]:
+                     num_threads=4,
+                     buffer_seconds=None,
+                     buffer_rows=None,
+                     callback_mode="row",
+                     callback_rows=None,
+                     max_pending=256,
+                     storage="memory",
+                     storage_name=None,
+                     writer=None,
+                     dtype="float64",
+                     timestamps="row",
+                     start_barrier=None,
+                     time_origin=None,
+                     telemetry_reads=None,
+                     layout="rows",
+                     stages=None,
+                     keep_data=True) -> Tuple[float, float]:
         """
         Collect data from the LabJack device.
 
@@ -1485,13 +3626,17 @@ class LabjackReader(object):
         inputs_max_voltages : sequence of real values
             Maximum voltages corresponding element-wise to the channels
             listed in inputs. Only applicable for analog (AIN) channels.
-        seconds : float
+        seconds : Union[float, None]
             Duration of the data run in seconds. The run will last at least as
             long as this value, and will try to stop streaming when this time
-            has been met.
+            has been met. If None, the run continues until stop() is called,
+            which requires buffer_seconds or buffer_rows to be set.
         frequency : int
             Number of times per second (Hz) the device will get a data point
             for each of the channels specified.
+            Rates above the highest find_max_freq measured for this
+            configuration are lowered to it; if it has not been measured,
+            the limit is half the rated maximum.
         scans_per_read : int, optional
             Number of data points contained in a packet sent by the LabJack
             device. -1 indicates the maximum possible sample rate.
@@ -1503,11 +3648,118 @@ class LabjackReader(object):
             A callable object that takes the single parameter "row" as an
             argument. This argument represents one row of data collected from
             the labjack, and as such has the same format as data outputted
-            from the method to_array.
+            from the method to_array. In 'block' callback mode, the argument
+            is instead a 2D NumPy array of rows.
         num_threads : optional
             Only taken into consideration when callback_function is not None.
             The number of threads in a pool used to call the callback function.
             As long as your system can handle it, more is better.
+        callback_mode : str, optional
+            Valid options are
+
+            'row'
+                Call callback_function on each row, from a multiprocessing
+                pool of num_threads workers.
+            'block'
+                Call callback_function on blocks of rows, one packet's worth
+                or callback_rows at a time, from a single thread. Much
+                cheaper at high scan rates.
+        callback_rows : int, optional
+            Only used in 'block' callback mode. The number of rows passed to
+            each call of callback_function. If None, each call gets the rows
+            of one packet.
+        max_pending : int, optional
+            The most callbacks that can be waiting to run before data
+            collection waits for them to catch up.
+        storage : str, optional
+            Valid options are
+
+            'memory'
+                Keep recorded data in this process's memory.
+            'shared'
+                Keep recorded data in shared memory, so other processes can
+                read it live with LabjackReader.attach. Requires Python 3.8
+                or newer.
+            'file'
+                Keep recorded data in a memory-mapped file named by
+                storage_name, for runs larger than the host's memory. The
+                data survives the process, and can be read back with
+                LabjackReader.attach.
+        storage_name : str, optional
+            When storage is 'shared', the name other processes attach with;
+            a unique name is chosen if None. When storage is 'file', the path
+            of the file to write, which is required.
+        buffer_seconds : float, optional
+            If set, store data in a ring buffer that only keeps the most
+            recent buffer_seconds worth of rows, so memory use stays
+            constant no matter how long the run lasts.
+        buffer_rows : int, optional
+            Like buffer_seconds, but sets the ring buffer's size in rows.
+            Takes precedence over buffer_seconds.
+        writer : labjackcontroller.writers.StreamWriter, optional
+            If set, every packet is also appended to this writer's file from
+            a background thread, along with the channel names, stream
+            parameters and device information. The file is complete when
+            this method returns.
+        dtype : str, optional
+            The data type recorded data is stored as. Valid options are
+
+            'float64'
+                Store every value as float64.
+            'float32'
+                Store channels as float32, halving their size.
+            'compact'
+                Store AIN channels as float32, digital lines and states such
+                as DIO0 or FIO_STATE as uint16, and other channels as
+                float64.
+
+            The time columns are always float64. Unless dtype is 'float64',
+            to_array returns an array of records, with one field per column,
+            and to_dataframe returns columns of these types. Skipped samples
+            in uint16 columns are stored as 0.
+        timestamps : str, optional
+            Valid options are
+
+            'row'
+                Store the device and system time in every row.
+            'packet'
+                Store only the system time, once per packet, and compute both
+                time columns when data is read. Saves two values per row,
+                but to_array and to_dataframe always return copies.
+        start_barrier : threading.Barrier, optional
+            If set, wait on this barrier just before starting the stream, so
+            several readers on other threads can start streaming together.
+            See MultiReader.
+        time_origin : float, optional
+            The host time, as given by time.time(), that the System Time
+            column is measured from. Defaults to when the stream starts.
+            Giving several readers the same origin makes their system times
+            comparable.
+        telemetry_reads : int, optional
+            The most reads to keep statistics about in telemetry; after
+            that, the oldest are replaced. Defaults to every read of a timed
+            run, or 65536 reads for an untimed one. 0 keeps none.
+        layout : str, optional
+            Valid options are
+
+            'rows'
+                Store each scan's values next to each other, so to_array
+                returns a view.
+            'columns'
+                Store each channel's values, and each time column, in its
+                own contiguous array, splitting every packet up as it
+                arrives. to_columns and to_dataframe return views, and
+                reading one channel touches no other; to_array copies.
+        stages : List[Stage], optional
+            Summaries from labjackcontroller.stages, such as a Decimator,
+            to update with each packet as it is read. They are started with
+            the input channels and the scan rate the device actually
+            streams at. See stages.
+        keep_data : bool, optional
+            If False, only keep the latest packet of rows, for runs that
+            only need what stages, a writer or a callback make of the data.
+            A continuous run then needs no buffer_seconds or buffer_rows,
+            which are ignored.
 
         Returns
         -------
@@ -1518,10 +3770,14 @@ class LabjackReader(object):
 
         Notes
         -----
-        `callback_function` gets passed to a `multiprocessing` thread pool.
-        At this time, this means it must be pickleable and not have local
-        scope. Future versions of this library may be able to work around
-        this limitation.
+        In 'row' callback mode, `callback_function` gets passed to a
+        `multiprocessing` thread pool. At this time, this means it must be
+        pickleable and not have local scope. 'block' mode has no such
+        limitation.
+
+        When a ring buffer is used, to_array and to_dataframe return the rows
+        it holds in the order they were recorded. Reading while the run is in
+        progress may return rows that are being overwritten.
 
         Examples
         --------
@@ -1548,32 +3804,72 @@ class LabjackReader(object):
         >>> reader.collect_data(["AIN0"], [10.0], 60.5, 10000,
                                 callback_function=new_callback)
 
+        Print the mean of every 1000 rows instead:
+
+        >>> reader.collect_data(["AIN0"], [10.0], 60.5, 10000,
+                                callback_function=lambda block:
+                                    print(block[:, 0].mean()),
+                                callback_mode="block", callback_rows=1000)
+
+        Save a long run to disk as it is recorded:
+
+        >>> from labjackcontroller.writers import HDF5Writer
+        >>> reader.collect_data(["AIN0"], [10.0], 3600, 10000,
+                                buffer_seconds=60,
+                                writer=HDF5Writer("run.h5"))
+
+        Stream until stopped from another thread, keeping only the last 10
+        seconds of data:
+
+        >>> worker = threading.Thread(target=reader.collect_data,
+                                      args=(["AIN0"], [10.0], None, 10000),
+                                      kwargs={"buffer_seconds": 10})
+        >>> worker.start()
+        >>> time.sleep(60)
+        >>> reader.stop()
+
         """
+        # Only this run listens to this event, so stops sent before it
+        # started, or to earlier runs, do not end it.
+        self._stop_event = stop_event = threading.Event()
 
         self.modify_settings(stream_settling_time="auto")
 
-        if not len(inputs):
-            raise ValueError("Needed a non-empty string collection of channels.")
-        for channel in inputs:
-            if not isinstance(channel, str):
-                raise TypeError("Expected a string name for each channel,"
-                                " not %s" % str(channel))
-
-        # Input validation for inputs_max_voltages
-        if not len(inputs_max_voltages):
-            raise ValueError("Needed a non-empty numerical collection of values.")
-        for channel in inputs:
-            if not isinstance(channel, str):
-                raise TypeError("Expected a numerical value, not %s"
-                                % str(channel))
+        self._validate_stream_inputs(inputs, inputs_max_voltages, frequency)
 
         # Input validation for seconds
-        if seconds <= 0:
+        if seconds is None:
+            if keep_data and buffer_seconds is None and buffer_rows is None:
+                raise ValueError("A continuous run needs buffer_seconds or"
+                                 " buffer_rows to be set.")
+        elif seconds <= 0:
             raise ValueError("Invalid duration for data collection.")
 
-        # Input validation for frequency
-        if frequency <= 0:
-            raise ValueError("Invalid frequency provided for frequency.")
+        if callback_mode not in ("row", "block"):
+            raise ValueError("Expected callback mode to be either \"row\""
+                             " or \"block\"")
+
+        if storage not in ("memory", "shared", "file"):
+            raise ValueError("Expected storage to be either \"memory\","
+                             " \"shared\" or \"file\"")
+        if storage == "file" and storage_name is None:
+            raise ValueError("A file name is needed for file storage.")
+
+        dtypes = self._column_dtypes(inputs, dtype)
+
+        if timestamps not in ("row", "packet"):
+            raise ValueError("Expected timestamps to be either \"row\" or"
+                             " \"packet\"")
+
+        if layout not in ("rows", "columns"):
+            raise ValueError("Expected layout to be either \"rows\" or"
+                             " \"columns\"")
+
+        # Input validation for the ring buffer size
+        if buffer_rows is not None and buffer_rows < 1:
+            raise ValueError("Invalid number of rows for the buffer.")
+        if buffer_seconds is not None and buffer_seconds <= 0:
+            raise ValueError("Invalid duration for the buffer.")
 
         # Open a connection.
         self.open(verbose=verbose)
@@ -1584,15 +3880,70 @@ class LabjackReader(object):
         self._close_stream()
 
         num_addrs = len(inputs)
-
-        # Create a RawArray for multiple processes; this array
-        # stores our data.
-        size = int(seconds * frequency * (len(inputs) + 2))
-
-        frequency, scans_per_read = self._setup(inputs, inputs_max_voltages,
-                                                resolution,
-                                                frequency,
-                                                scans_per_read=scans_per_read)
+        row_width = num_addrs + 2
+
+        # Total rows to gather; None means run until stopped.
+        num_rows = int(seconds * frequency) if seconds is not None else None
+
+        # Size the buffer that stores our data; only wrap it if it was
+        # explicitly sized.
+        wrap = buffer_rows is not None or buffer_seconds is not None
+        capacity = (buffer_rows if buffer_rows is not None else
+                    int(buffer_seconds * frequency) if wrap else
+                    num_rows)
+
+        # Work out the rates the stream will run at, so everything it needs
+        # is allocated before it starts.
+        frequency, scans_per_read = self._stream_rates(
+            inputs, inputs_max_voltages, resolution, frequency,
+            scans_per_read=scans_per_read)
+
+        if not keep_data:
+            wrap, capacity = True, scans_per_read
+        size = capacity * row_width
+
+        # Release the previous run's data before allocating for this one.
+        if self._data_buffer is not None:
+            self._data_buffer.close()
+
+        self._data_buffer = DataBuffer(list(inputs) + ["Time", "System Time"],
+                                       capacity, wrap=wrap, storage=storage,
+                                       name=storage_name,
+                                       metadata={
+                                           "device_type": self.device_type,
+                                           "connection_type":
+                                               self.connection_type,
+                                           "device_identifier":
+                                               self.device_identifier,
+                                           "frequency": frequency,
+                                           "scans_per_read": scans_per_read},
+                                       dtypes=dtypes,
+                                       packet_rows=(scans_per_read
+                                                    if timestamps == "packet"
+                                                    else None),
+                                       scan_rate=frequency,
+                                       layout=layout)
+
+        # Every packet is read into this same buffer.
+        curr_data = np.empty(scans_per_read * num_addrs)
+
+        # We get a giant 1D array back; view it as one scan per row.
+        packet = curr_data.reshape((scans_per_read, num_addrs))
+
+        # Each packet, with its time columns, is assembled here as one block
+        # before being stored.
+        block = np.empty((scans_per_read, row_width))
+
+        actual = self._setup(inputs, inputs_max_voltages, resolution,
+                             frequency, scans_per_read=scans_per_read,
+                             start_barrier=start_barrier,
+                             max_frequency=frequency)[0]
+
+        # The device may round the scan rate to its clock.
+        if actual != frequency:
+            frequency = actual
+            self._data_buffer.set_scan_rate(frequency,
+                                            {"frequency": frequency})
 
         if verbose:
             print("[%26s] %15s / %15s %5s  %15s %15s"
@@ -1602,85 +3953,141 @@ class LabjackReader(object):
         self._input_channels = inputs
 
         total_skip = 0  # Total skipped samples
+        self._skip_intervals = []
+
+        self._stages = stages = list(stages or [])
+        for stage in stages:
+            stage.start(inputs, frequency)
+
+        # A timed run needs statistics about one read per packet.
+        if telemetry_reads is None:
+            telemetry_reads = (ceil(num_rows / scans_per_read)
+                               if num_rows is not None else 65536)
+        self._telemetry = telemetry = (Telemetry(telemetry_reads)
+                                       if telemetry_reads > 0 else None)
 
         packet_num = 0
         self.max_index = 0
-        step_size = len(inputs)
+        curr_row = 0
+
+        # Per-row callbacks go to a process pool, block callbacks to a
+        # single consumer thread. Either way, only so many may be pending.
+        threadpool = None
+        consumer = None
+        if callback_function and callback_mode == "row":
+            threadpool = Pool(processes=num_threads)
+        elif callback_function:
+            consumer = BlockConsumer(callback_function,
+                                     max_pending=max_pending,
+                                     batch_rows=callback_rows)
+        all_waiting = deque()
 
-        self._data_arr = (ctypes.c_double * size)(size)
+        try:
+            if writer is not None:
+                info = self._ljm_reference.connection_info(self._handle)
+                metadata = {"channels": list(inputs),
+                            "frequency": frequency,
+                            "scans_per_read": scans_per_read}
+                metadata.update(zip(("device_type", "connection_type",
+                                     "serial_number", "ip_address", "port",
+                                     "max_packet_size"), info))
+                writer.start(self._data_buffer.columns, metadata,
+                             dtypes=dtypes)
 
-        all_waiting = []
-        with Pool(processes=num_threads) as threadpool:
             start = _time_func()
-            while self.max_index < size:
+            if time_origin is None:
+                time_origin = start
+
+            while ((num_rows is None or curr_row < num_rows)
+                   and not self._data_buffer.is_full
+                   and not stop_event.is_set()):
                 # Read all rows of data off of the latest packet in the stream.
-                ret = self._ljm_reference.stream_read(self._handle)
-                curr_data = ret[0]
+                read_start = _time_func()
+                dev_backlog, ljm_backlog = self._ljm_reference \
+                    .stream_read_into(self._handle, curr_data)
+                read_end = _time_func()
 
                 if verbose:
                     print("[%26s] %15d / %15d %4.1d%% %15d %15d"
                           % (datetime.datetime.now(), self.max_index, size,
                              ((float(self.max_index) / float(size)) * 100
-                             if self.max_index else 0), ret[1], ret[2]))
-
-                for i in range(0, len(curr_data), step_size):
-                    # Ensure that this packet won't overflow our buffer.
-                    if self._max_index >= size:
-                        break
-
-                    # We will manually calculate the times each entry occurs
-                    # at.
-                    # The stream itself is timed by the same clock that runs
-                    # CORE_TIMER, and it is officially advised we use the
-                    # stream clocking instead.
-                    # See https://forums.labjack.com/index.php?showtopic=6992
-                    curr_time = (scans_per_read / frequency) * (packet_num + (i / len(curr_data)))
-
-                    # We get a giant 1D list back, so work with what we have.
-                    self._data_arr[self._max_index: self._max_index + step_size] =\
-                        curr_data[i:i + step_size]
-                    self._max_index += step_size
-
-                    # Put in the time as well
-                    self._data_arr[self._max_index] = curr_time
-                    self._max_index += 1
-                    self._data_arr[self._max_index] = _time_func() - start
-                    self._max_index += 1
-
-                    if callback_function:
-                        all_waiting.append(threadpool.apply_async(callback_function,
-                                            (self._data_arr[self._max_index - step_size - 2: self._max_index],)))
-
-                if callback_function:
-                    for waiting_thread in all_waiting:
-                        if waiting_thread.ready():
-                            waiting_thread.get()
-            
+                             if self.max_index else 0), dev_backlog,
+                             ljm_backlog))
+
+                rows_read = self._ingest_packet(block, 0, packet,
+                                                packet_num, frequency,
+                                                read_end - time_origin)
+                if num_rows is not None:
+                    rows_read = min(rows_read, num_rows - curr_row)
+
+                rows_written = self._data_buffer.write(block[:rows_read])
+
+                # Skipped samples are indicated by -9999 values. Missed
+                # samples occur after a device's stream buffer overflows and
+                # are reported after auto-recover mode ends.
+                skips = _find_skips(packet[:rows_written], curr_row)
+                num_skipped = int(skips["length"].sum())
+                if num_skipped:
+                    self._skip_intervals.append(skips)
+                    total_skip += num_skipped
+
+                curr_row += rows_written
+                packet_num += 1
+
+                # Only keep the skips a ring buffer still holds rows of, so
+                # memory use stays constant however long the run goes.
+                if wrap and self._skip_intervals:
+                    self._prune_skips(curr_row - capacity)
+
+                if threadpool is not None:
+                    for row in block[:rows_written]:
+                        # Wait on the oldest callback if too many are pending.
+                        if len(all_waiting) >= max_pending:
+                            all_waiting.popleft().get()
+                        all_waiting.append(
+                            threadpool.apply_async(callback_function,
+                                                   (row.tolist(),)))
+
+                    while all_waiting and all_waiting[0].ready():
+                        all_waiting.popleft().get()
+                elif consumer is not None:
+                    consumer.put(block[:rows_written])
+
+                if writer is not None:
+                    writer.put(block[:rows_written])
+
+                if stages:
+                    values = packet[:rows_written]
+                    if num_skipped:
+                        values = np.where(
+                            values == ljm_constants.DUMMY_VALUE, np.nan,
+                            values)
+                    for stage in stages:
+                        stage.update(values)
+
+                if telemetry is not None:
+                    telemetry.record(read_end - time_origin,
+                                     read_end - read_start,
+                                     _time_func() - read_end, dev_backlog,
+                                     ljm_backlog, num_skipped)
+
             # Outside of data gathering. Close all.
-            while callback_function and len(all_waiting):
-                for i in range(len(all_waiting)):
-                    if all_waiting[i].ready():
-                        all_waiting[i].get()
-                        del all_waiting[i]
-                        break
-
-            packet_num += 1
-
-            # Count the skipped samples which are indicated by -9999 values
-            # Missed samples occur after a device's stream buffer overflows
-            # and are reported after auto-recover mode ends.
-            curr_skip = 0
-            for value in curr_data:
-                if value == -9999.0:
-                    curr_skip += 1
-
-            total_skip += curr_skip
-
-            ainStr = ""
-            for j in range(0, num_addrs):
-                ainStr += "%s = %0.5f, " % (inputs[j], curr_data[j])
-            if curr_skip:
-                print("Scans Skipped = %0.0f" % (curr_skip/num_addrs))
+            while all_waiting:
+                all_waiting.popleft().get()
+            if consumer is not None:
+                consumer.close()
+            if writer is not None:
+                writer.close()
+
+            if total_skip:
+                print("Scans Skipped = %0.0f" % (total_skip / num_addrs))
+        finally:
+            if threadpool is not None:
+                threadpool.terminate()
+            if consumer is not None:
+                consumer.close(flush=False)
+            if writer is not None:
+                writer.close(flush=False)
 
         # We are done, record the actual ending time.
         end = _time_func()
@@ -1700,10 +4107,179 @@ class LabjackReader(object):
 
         # Close the connection.
         self._close_stream()
+        self._data_buffer.flush()
 
         return total_time, (total_skip / num_addrs)
 
-    def to_array(self, mode="all", **kwargs) -> Union[List[List[float]], None]:
+    def iter_blocks(self,
+                    inputs: List[str],
+                    inputs_max_voltages: List[float],
+                    frequency: int,
+                    seconds=None,
+                    scans_per_read=-1,
+                    resolution=4) -> Iterator[np.ndarray]:
+        """
+        Stream data from the LabJack device one packet at a time, without
+        storing it in this object's internal array.
+
+        The stream starts when the first block is requested, and is closed
+        when the iterator is exhausted, closed, or garbage collected.
+
+        Parameters
+        ----------
+        inputs : sequence of strings
+            Names of input channels on the LabJack device to read.
+            Must correspond to the actual name on the device.
+        inputs_max_voltages : sequence of real values
+            Maximum voltages corresponding element-wise to the channels
+            listed in inputs. Only applicable for analog (AIN) channels.
+        frequency : int
+            Number of times per second (Hz) the device will get a data point
+            for each of the channels specified.
+        seconds : float, optional
+            Duration of the data run in seconds. If None, blocks are yielded
+            until the iterator is closed or stop() is called.
+        scans_per_read : int, optional
+            Number of data points contained in a packet sent by the LabJack
+            device. -1 indicates the maximum possible sample rate.
+        resolution : int, optional
+            See official LabJack documentation.
+
+        Yields
+        ------
+        block : numpy.ndarray
+            A 2D array of shape (scans_per_read, number of channels + 2),
+            with the same columns as the output of to_array. The final block
+            of a timed run may have fewer rows.
+
+        Examples
+        --------
+        Print the mean of each packet of a 10 kHz stream from AIN0 for one
+        minute:
+
+        >>> reader = LabjackReader("T7")
+        >>> for block in reader.iter_blocks(["AIN0"], [10.0], 10000,
+                                            seconds=60):
+        >>>     print(block[:, 0].mean())
+
+        """
+        self._validate_stream_inputs(inputs, inputs_max_voltages, frequency)
+        if seconds is not None and seconds <= 0:
+            raise ValueError("Invalid duration for data collection.")
+
+        return self._generate_blocks(inputs, inputs_max_voltages, frequency,
+                                     seconds, scans_per_read, resolution)
+
+    def _generate_blocks(self, inputs, inputs_max_voltages, frequency,
+                         seconds, scans_per_read,
+                         resolution) -> Iterator[np.ndarray]:
+        """
+        Generator behind iter_blocks; see that method for parameters.
+        """
+        self._stop_event = stop_event = threading.Event()
+
+        self.open(verbose=False)
+        self._close_stream()
+
+        num_addrs = len(inputs)
+        num_rows = int(seconds * frequency) if seconds is not None else None
+
+        frequency, scans_per_read = self._setup(inputs, inputs_max_voltages,
+                                                resolution,
+                                                frequency,
+                                                scans_per_read=scans_per_read)
+
+        curr_data = np.empty(scans_per_read * num_addrs)
+        packet = curr_data.reshape((scans_per_read, num_addrs))
+
+        packet_num = 0
+        curr_row = 0
+
+        try:
+            start = _time_func()
+            while ((num_rows is None or curr_row < num_rows)
+                   and not stop_event.is_set()):
+                self._ljm_reference.stream_read_into(self._handle, curr_data)
+
+                # Each block is handed off to the caller, so it can't be
+                # reused.
+                block = np.empty((scans_per_read, num_addrs + 2))
+                rows_read = self._ingest_packet(block, 0, packet,
+                                                packet_num, frequency,
+                                                _time_func() - start)
+                if num_rows is not None:
+                    rows_read = min(rows_read, num_rows - curr_row)
+
+                curr_row += rows_read
+                packet_num += 1
+
+                yield block[:rows_read]
+        finally:
+            self._close_stream()
+
+    def astream(self,
+                inputs: List[str],
+                inputs_max_voltages: List[float],
+                frequency: int,
+                seconds=None,
+                scans_per_read=-1,
+                resolution=4,
+                max_blocks=16) -> AsyncBlockStream:
+        """
+        Stream data from the LabJack device from within an asyncio event loop,
+        without storing it in this object's internal array.
+
+        Parameters
+        ----------
+        inputs : sequence of strings
+            Names of input channels on the LabJack device to read.
+            Must correspond to the actual name on the device.
+        inputs_max_voltages : sequence of real values
+            Maximum voltages corresponding element-wise to the channels
+            listed in inputs. Only applicable for analog (AIN) channels.
+        frequency : int
+            Number of times per second (Hz) the device will get a data point
+            for each of the channels specified.
+        seconds : float, optional
+            Duration of the data run in seconds. If None, blocks are yielded
+            until the stream is exited.
+        scans_per_read : int, optional
+            Number of data points contained in a packet sent by the LabJack
+            device. -1 indicates the maximum possible sample rate.
+        resolution : int, optional
+            See official LabJack documentation.
+        max_blocks : int, optional
+            The most blocks that can be read ahead of the consumer.
+
+        Returns
+        -------
+        AsyncBlockStream
+            An asynchronous context manager and iterator yielding the same
+            blocks as iter_blocks.
+
+        Examples
+        --------
+        Print the mean of each packet of a 10 kHz stream from AIN0 while
+        other tasks keep running:
+
+        >>> async def monitor(reader):
+        >>>     async with reader.astream(["AIN0"], [10.0], 10000) as stream:
+        >>>         async for block in stream:
+        >>>             print(block[:, 0].mean())
+
+        """
+        if max_blocks < 1:
+            raise ValueError("Expected room for at least one block.")
+
+        return AsyncBlockStream(self,
+                                self.iter_blocks(inputs, inputs_max_voltages,
+                                                 frequency, seconds=seconds,
+                                                 scans_per_read=scans_per_read,
+                                                 resolution=resolution),
+                                max_blocks)
+
+    def to_array(self, mode="all", mask_skips=False, copy=False,
+                 **kwargs) -> Union[List[List[float]], None]:
         """
         Return data in latest array.
 
@@ -1720,6 +4296,17 @@ class LabjackReader(object):
             'range'
                 Retrieves a range of rows. Expects the kwargs 'start' and
                 'end'.
+        mask_skips: bool, optional
+            If True, return a copy with every sample the device skipped, as
+            listed in skips, replaced by NaN. Integer columns are returned as
+            float64 to hold NaN.
+        copy: bool, optional
+            If True, return a writable copy of the data. Otherwise, return
+            a read-only view of the reader's buffer, which costs nothing
+            however much data there is. The view stays valid after later
+            runs, but while a ring buffer is being filled, its rows can be
+            overwritten under it. Rows that wrap around the end of a ring
+            buffer, or with times stored per packet, are always copied.
 
         Returns
         -------
@@ -1728,6 +4315,8 @@ class LabjackReader(object):
             (ceil(1d data len/ (number of channels + 2), number of channels + 2)
             Final two columns are the LabJack device's time in nanoseconds, and
             the host system's time, also in nanoseconds.
+            If the data was recorded with a dtype other than 'float64', a 1D
+            array of records instead, with one field per column.
 
         Examples
         --------
@@ -1770,6 +4359,17 @@ class LabjackReader(object):
         If the internal data array has not been initialized yet, the return
         value of this function will be None.
         """
+        rows = self._row_range(mode, **kwargs)
+        if rows is None:
+            return None
+        return self._reshape_data(*rows, mask_skips, copy)
+
+    def _row_range(self, mode, **kwargs) -> Union[Tuple[int, int], None]:
+        """
+        Internal method to get the first and last row, non-inclusive,
+        selected by the mode and keyword arguments of to_array, or None if
+        there is no data.
+        """
         max_row = self.max_index
         if max_row < 0:
             return None
@@ -1778,12 +4378,12 @@ class LabjackReader(object):
         max_row = int(max_row / row_width)
 
         if mode == "all" or mode == 'all':
-            return self._reshape_data(0, max_row)
+            return 0, max_row
         elif mode == "range" or mode == 'range':
             if "start" in kwargs and "end" in kwargs:
                 from_range, to_range = kwargs["start"], kwargs["end"]
                 if 0 <= from_range < to_range and to_range < max_row:
-                    return self._reshape_data(from_range, to_range)
+                    return from_range, to_range
                 else:
                     raise Exception("Invalid range provided of [%d, %d]"
                                     % (from_range, to_range))
@@ -1795,13 +4395,176 @@ class LabjackReader(object):
                 if kwargs["num_rows"] < 0 or kwargs["num_rows"] > max_row:
                     raise Exception("Invalid number of rows provided")
                 else:
-                    return self._reshape_data(max_row - kwargs["num_rows"],
-                                              max_row)
+                    return max_row - kwargs["num_rows"], max_row
             else:
                 raise Exception("Number of rows must be specified in"
                                 " relative mode.")
 
-    def to_dataframe(self, mode="all", **kwargs):
+    def to_columns(self, mode="all", mask_skips=False, copy=False,
+                   **kwargs) -> Union[Dict[str, np.ndarray], None]:
+        """
+        Return data in latest array, as one array per column.
+
+        Parameters
+        ----------
+        mode: str, optional
+            Selects the rows returned, as for to_array.
+        mask_skips: bool, optional
+            If True, return copies with every sample the device skipped
+            replaced by NaN. See to_array.
+        copy: bool, optional
+            If True, return writable copies. Otherwise, return read-only
+            views of the reader's buffer. These are contiguous when data was
+            collected with the 'columns' layout, and strided otherwise.
+        **kwargs
+            The num_rows, start and end of the mode, as for to_array.
+
+        Returns
+        -------
+        Dict[str, numpy.ndarray]
+            A 1D array for each input channel, and for the "Time" and
+            "System Time" columns, in that order. None if no data has been
+            collected.
+
+        Examples
+        --------
+        Average one channel of a long run without touching the others.
+
+        >>> reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 600, 10000,
+        ...                     layout="columns")
+        >>> reader.to_columns()["AIN1"].mean()
+        """
+        rows = self._row_range(mode, **kwargs)
+        if rows is None or self._data_buffer is None:
+            return None
+
+        from_row, to_row = rows
+        columns = self._data_buffer.read_columns(from_row, to_row,
+                                                 copy=copy and not mask_skips)
+        if mask_skips:
+            columns = [column.astype(np.float64) for column in columns]
+            first_row = self._data_buffer.total_rows \
+                - self._data_buffer.num_rows + from_row
+            for start, end, channel in self._skips_between(
+                    first_row, len(columns[0])):
+                columns[channel][start:end] = np.nan
+        return dict(zip(self._data_buffer.columns, columns))
+
+    def _find_stage(self, stage_type: type):
+        """
+        Get the first stage of a type given to the latest collect_data run.
+
+        Raises
+        ------
+        ValueError
+            If there is none.
+        """
+        for stage in self._stages:
+            if isinstance(stage, stage_type):
+                return stage
+        raise ValueError("No %s was given to collect_data."
+                         % stage_type.__name__)
+
+    def summary(self, start: float, end: float, points: int) -> pd.DataFrame:
+        """
+        Summarise a range of time in at most a given number of rows, from
+        the Pyramid given to collect_data as one of its stages. This does
+        not read the recorded data, and takes time in proportion to points
+        however long the range is, so it suits scrubbing through a long
+        recording, even while it is being made.
+
+        Parameters
+        ----------
+        start : float
+            The device time, in seconds, to summarise from.
+        end : float
+            The device time, in seconds, to summarise up to.
+        points : int
+            The most rows wanted, such as the width of a plot in pixels.
+
+        Returns
+        -------
+        pandas.DataFrame
+            See Pyramid.query.
+
+        Raises
+        ------
+        ValueError
+            If no Pyramid was given to collect_data, or points is not
+            positive.
+
+        Examples
+        --------
+        Record AIN0 for twelve hours, then plot an hour of it 1000 pixels
+        wide:
+
+        >>> reader.collect_data(["AIN0"], [10.0], 12 * 3600, 1000,
+                                stages=[Pyramid()])
+        >>> reader.summary(3600, 7200, 1000).plot(x="Time")
+        """
+        return self._find_stage(Pyramid).query(start, end, points)
+
+    def running_stats(self) -> pd.DataFrame:
+        """
+        Get the statistics of each channel over every sample read so far,
+        from the RunningStats given to collect_data as one of its stages.
+        This does not read the recorded data, so it is cheap enough to call
+        repeatedly while data is being collected.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per channel. See RunningStats.to_dataframe.
+
+        Raises
+        ------
+        ValueError
+            If no RunningStats was given to collect_data.
+
+        Examples
+        --------
+        Watch AIN0 for drift while recording it:
+
+        >>> reader.collect_data(["AIN0"], [10.0], None, 10000,
+                                stages=[RunningStats()])
+
+        And from another thread:
+
+        >>> reader.running_stats().loc["AIN0", "mean"]
+        """
+        return self._find_stage(RunningStats).to_dataframe()
+
+    def power_spectrum(self) -> pd.DataFrame:
+        """
+        Get the power spectral density of each channel estimated so far,
+        from the WelchPSD given to collect_data as one of its stages. This
+        does not read the recorded data, so it can be called while data is
+        being collected, or after a run with keep_data=False.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One column per channel. See WelchPSD.to_dataframe.
+
+        Raises
+        ------
+        ValueError
+            If no WelchPSD was given to collect_data.
+
+        Examples
+        --------
+        Estimate the spectrum of AIN0 over ten minutes, without keeping the
+        samples:
+
+        >>> reader.collect_data(["AIN0"], [10.0], 600, 10000,
+                                stages=[WelchPSD(segment_length=10000)],
+                                keep_data=False)
+        >>> spectrum = reader.power_spectrum()
+        """
+        return self._find_stage(WelchPSD).to_dataframe()
+
+    def to_dataframe(self, mode="all", mask_skips=False, copy=False,
+                     decimate=False, **kwargs):
         """
         Gets this object's recorded data in dataframe form.
 
@@ -1821,6 +4584,20 @@ class LabjackReader(object):
                 Retrieves a range of rows. Expects the kwargs 'start'
                 and 'end'.
 
+        mask_skips: bool, optional
+            If True, every sample the device skipped is NaN. See to_array.
+        copy: bool, optional
+            If True, the DataFrame holds a copy of the data, and can be
+            modified. Otherwise, it wraps the same read-only views that
+            to_columns returns when data was collected with the 'columns'
+            layout, or that to_array returns when every column is float64,
+            without copying.
+        decimate: bool, optional
+            If True, get the latest bins of the Decimator given to
+            collect_data as one of its stages instead, ignoring the other
+            arguments. See Decimator.to_dataframe. This is cheap enough to
+            call repeatedly while data is being collected.
+
         Returns
         -------
         table: pandas.DataFrame
@@ -1835,12 +4612,237 @@ class LabjackReader(object):
                 Recorded time (in seconds) of datapoints in row, as observed
                 by the host computer
 
+        Raises
+        ------
+        ValueError
+            If decimate is True but no Decimator was given to collect_data.
+
         Notes
         -----
         If the internal data array has not been initialized yet, behavior
         is undefined.
         """
+        if decimate:
+            return self._find_stage(Decimator).to_dataframe()
 
-        return pd.DataFrame(self.to_array(mode, **kwargs),
+        if self._data_buffer is not None \
+           and self._data_buffer.layout == "columns":
+            columns = self.to_columns(mode, mask_skips, copy, **kwargs)
+            if columns is not None:
+                return pd.DataFrame(columns, copy=False)
+
+        return pd.DataFrame(self.to_array(mode, mask_skips, copy, **kwargs),
                             columns=self._input_channels
-                            + ["Time", "System Time"])
+                            + ["Time", "System Time"], copy=False)
+
+
+class MultiReader(object):
+    """
+    Streams from several LabJack devices at once. Each device is read by its
+    own LabjackReader on its own thread, so reading scales across USB and
+    Ethernet links; the LJM library releases the GIL while it waits for a
+    packet.
+
+    All streams are started together, once every device is configured, and
+    the System Time column of every device is measured from the same host
+    time, so rows from different devices can be lined up. Each device keeps
+    its own recorded data, which is read through its reader.
+
+    Attributes
+    ----------
+    readers : List[LabjackReader]
+        The reader for each device, in the order given.
+    time_origin : Union[float, None]
+        The host time, as given by time.time(), that the latest run's
+        System Time columns are measured from.
+    """
+
+    def __init__(self, readers: List[LabjackReader]) -> None:
+        """
+        Group readers so they can stream together.
+
+        Parameters
+        ----------
+        readers : List[LabjackReader]
+            One reader per device. Each must be for a different device, so
+            give each a device_identifier, such as a serial number.
+
+        Raises
+        ------
+        ValueError
+            If no readers are given.
+        """
+        if not len(readers):
+            raise ValueError("Expected at least one reader.")
+
+        self.readers = list(readers)
+        self.time_origin = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self) -> None:
+        """
+        Open a connection to every device.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        for reader in self.readers:
+            reader.open(verbose=False)
+
+    def close(self) -> None:
+        """
+        Close the connection to every device.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        for reader in self.readers:
+            reader.close()
+
+    def stop(self) -> None:
+        """
+        End a run of collect_data that is in progress on every device. Safe
+        to call from another thread.
+
+        Parameters
+        ----------
+        None
+
+        Returns
+        -------
+        None
+
+        """
+        for reader in self.readers:
+            reader.stop()
+
+    def collect_data(self,
+                     inputs: List,
+                     inputs_max_voltages: List,
+                     seconds: Union[float, None],
+                     frequency: int,
+                     device_kwargs=None,
+                     **kwargs) -> List[Tuple[float, float]]:
+        """
+        Collect data from every device at the same time. Returns once every
+        device has finished.
+
+        Parameters
+        ----------
+        inputs : sequence of strings, or sequence of sequences of strings
+            Names of input channels to read on every device, or a separate
+            sequence of names for each device.
+        inputs_max_voltages : sequence of real values, or sequence of
+        sequences of real values
+            Maximum voltages corresponding element-wise to the channels
+            listed in inputs; for every device, or for each device.
+        seconds : Union[float, None]
+            Duration of the data run in seconds. If None, the run continues
+            until stop() is called.
+        frequency : int
+            Number of times per second (Hz) each device will get a data point
+            for each of its channels.
+        device_kwargs : List[dict], optional
+            Keyword arguments for LabjackReader.collect_data, one dictionary
+            per device, such as a distinct storage_name or writer for each.
+        **kwargs
+            Keyword arguments for LabjackReader.collect_data shared by every
+            device, such as scans_per_read or buffer_seconds.
+
+        Returns
+        -------
+        List[Tuple[float, float]]
+            What LabjackReader.collect_data returned for each device.
+
+        Raises
+        ------
+        ValueError
+            If a separate value for each device is given for the wrong number
+            of devices.
+        Exception
+            The first exception raised while collecting data from any device.
+            Every other device is stopped when this happens.
+
+        Examples
+        --------
+        Record AIN0 from two T7s at 10 kHz for a minute:
+
+        >>> multi = MultiReader([LabjackReader("T7", device_identifier=id)
+                                 for id in ("470012345", "470012346")])
+        >>> multi.collect_data(["AIN0"], [10.0], 60, 10000)
+        >>> first, second = [reader.to_dataframe()
+                             for reader in multi.readers]
+
+        """
+        num_readers = len(self.readers)
+        if isinstance(inputs[0], str):
+            inputs = [inputs] * num_readers
+        if np.ndim(inputs_max_voltages[0]) == 0:
+            inputs_max_voltages = [inputs_max_voltages] * num_readers
+        if device_kwargs is None:
+            device_kwargs = [{}] * num_readers
+        if not (len(inputs) == len(inputs_max_voltages)
+                == len(device_kwargs) == num_readers):
+            raise ValueError("Expected one set of channels, voltages and"
+                             " keyword arguments per device.")
+
+        barrier = threading.Barrier(num_readers)
+        self.time_origin = _time_func()
+        results = [None] * num_readers
+        errors = []
+
+        # The readers still collecting data, which an error should stop.
+        running = set()
+
+        def run(index: int) -> None:
+            running.add(index)
+            try:
+                results[index] = self.readers[index].collect_data(
+                    inputs[index], inputs_max_voltages[index], seconds,
+                    frequency, start_barrier=barrier,
+                    time_origin=self.time_origin,
+                    **dict(kwargs, **device_kwargs[index]))
+            except BaseException as e:
+                errors.append(e)
+                # Release devices waiting to start, and end the others.
+                barrier.abort()
+                for other in list(running):
+                    self.readers[other].stop()
+            finally:
+                running.discard(index)
+
+        threads = [threading.Thread(target=run, args=(index,))
+                   for index in range(num_readers)]
+        for thread in threads:
+            thread.start()
+        try:
+            for thread in threads:
+                thread.join()
+        except BaseException:
+            self.stop()
+            barrier.abort()
+            for thread in threads:
+                thread.join()
+            raise
+
+        if errors:
+            raise errors[0]
+        return results
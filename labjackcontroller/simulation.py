@@ -0,0 +1,370 @@
+"""
+A module that imitates the LJM C library, so LabjackReader can be run,
+tested and benchmarked without a LabJack device.
+"""
+import ctypes
+import re
+import threading
+import time
+
+import numpy as np
+from labjack.ljm import constants as ljm_constants, \
+    errorcodes as ljm_errorcodes
+from typing import Callable, List, Tuple
+
+
+def sine_waveform(channel: str, times: np.ndarray) -> np.ndarray:
+    """
+    The waveform a SimulatedLJM streams by default. Channel n carries a 1 V
+    sine wave at n + 1 Hz; channels without a number carry a 1 Hz one.
+
+    Parameters
+    ----------
+    channel : str
+        The name of the channel, such as 'AIN0'.
+    times : numpy.ndarray
+        The device time of each scan, in seconds.
+
+    Returns
+    -------
+    numpy.ndarray
+        The value of the channel at each time.
+    """
+    number = re.search(r"\d+", channel)
+    frequency = int(number.group()) + 1 if number else 1
+    return np.sin(2 * np.pi * frequency * times)
+
+
+class _Stream(object):
+    """
+    The state of one simulated stream.
+    """
+
+    def __init__(self, channels: List[str], scans_per_read: int,
+                 frequency: float) -> None:
+        self.channels = channels
+        self.scans_per_read = scans_per_read
+        self.frequency = frequency
+        self.scans_read = 0
+        self.num_reads = 0
+        # Seconds since the stream started, on the simulated host.
+        self.clock = 0.0
+        self.started = time.monotonic()
+
+
+class SimulatedLJM(object):
+    """
+    Stands in for the LJM C library. Install it with
+    LJMLibrary.use_backend, and every LabjackReader created afterwards
+    streams synthetic data from simulated devices.
+
+    Streams keep a clock of when each scan is taken. Each read waits until
+    its packet has been scanned, then spends read_overhead plus
+    scan_overhead per scan, plus up to jitter seconds chosen at random.
+    Scans taken during that time are the backlog reported by the next read.
+    The backlog is left in LJM's buffer; the device's own buffer is always
+    reported as empty. With realtime on, reads sleep to keep this clock in
+    step with the host, and time the caller spends between reads counts
+    too. With it off, no time passes except what the overheads add. That
+    makes runs repeatable, since jitter comes from a seeded generator.
+
+    Attributes
+    ----------
+    devices : List[Tuple[str, str, int, str]]
+        The device type, connection type, serial number and IP address of
+        each simulated device.
+    registers : dict
+        The last value written to each named register of each device, by
+        serial number.
+    library_config : dict
+        The last value written to each LJM library setting.
+    """
+
+    _device_types = {"T7": ljm_constants.dtT7, "T4": ljm_constants.dtT4,
+                     "DIGIT": ljm_constants.dtDIGIT}
+    _connection_types = {"USB": ljm_constants.ctUSB,
+                         "ETHERNET": ljm_constants.ctETHERNET,
+                         "WIFI": ljm_constants.ctWIFI}
+
+    def __init__(self,
+                 devices=None,
+                 waveform: Callable[[str, np.ndarray], np.ndarray] = None,
+                 realtime=True,
+                 read_overhead=0.0,
+                 scan_overhead=0.0,
+                 jitter=0.0,
+                 skip_every=0,
+                 skip_scans=1,
+                 disconnect_after=None,
+                 buffer_scans=2 ** 20,
+                 seed=0) -> None:
+        """
+        Create a simulated LJM library.
+
+        Parameters
+        ----------
+        devices : List[Tuple[str, str, int, str]], optional
+            The device type, connection type, serial number and IP address
+            of each simulated device. Defaults to one T7 over USB.
+        waveform : Callable[[str, numpy.ndarray], numpy.ndarray], optional
+            Given a channel name and the device time of some scans, returns
+            the channel's values at those times. Defaults to sine_waveform.
+        realtime : bool, optional
+            If True, reads block until their data would have been scanned.
+            If False, reads return at once and time only passes on the
+            simulated clock.
+        read_overhead : float, optional
+            Seconds the host spends on each read.
+        scan_overhead : float, optional
+            Seconds the host spends on each scan it reads. If the overheads
+            outweigh the time a packet takes to scan, the backlog grows.
+        jitter : float, optional
+            Up to this many extra seconds, chosen at random, are spent on
+            each read.
+        skip_every : int, optional
+            If set, every this many packets starts with skipped scans, whose
+            values are all -9999.
+        skip_scans : int, optional
+            The number of scans skipped in each of those packets.
+        disconnect_after : int, optional
+            If set, the device stops responding after this many reads of a
+            stream, and every later read fails.
+        buffer_scans : int, optional
+            The most scans LJM can hold. A read fails once the backlog
+            exceeds it.
+        seed : int, optional
+            Seeds the jitter.
+        """
+        if devices is None:
+            devices = [("T7", "USB", 470010000, "0.0.0.0")]
+        self.devices = [tuple(device) for device in devices]
+        self.waveform = waveform if waveform is not None else sine_waveform
+        self.realtime = realtime
+        self.read_overhead = read_overhead
+        self.scan_overhead = scan_overhead
+        self.jitter = jitter
+        self.skip_every = skip_every
+        self.skip_scans = skip_scans
+        self.disconnect_after = disconnect_after
+        self.buffer_scans = buffer_scans
+        self.registers = {}
+        self.library_config = {}
+
+        self._random = np.random.RandomState(seed)
+        self._lock = threading.Lock()
+        self._next_handle = 1
+        # Open handles and the device index each refers to, and each
+        # handle's stream.
+        self._handles = {}
+        self._streams = {}
+        # Made-up register addresses, in both directions.
+        self._addresses = {}
+        self._names = {}
+
+    @staticmethod
+    def _value(arg):
+        # Follow ctypes.byref to the object it refers to.
+        return getattr(arg, "_obj", arg)
+
+    def _device(self, handle: int) -> Tuple[str, str, int, str]:
+        return self.devices[self._handles[handle]]
+
+    def LJM_OpenS(self, device_type: bytes, connection_type: bytes,
+                  identifier: bytes, handle) -> int:
+        device_type = device_type.decode("ascii").upper()
+        connection_type = connection_type.decode("ascii").upper()
+        identifier = identifier.decode("ascii")
+
+        for index, (dev_type, conn_type, serial, ip_address) \
+                in enumerate(self.devices):
+            if device_type not in ("ANY", dev_type):
+                continue
+            if connection_type not in ("ANY", conn_type):
+                continue
+            if identifier.upper() not in ("ANY", "LJM_IDANY") \
+               and identifier not in (str(serial), ip_address):
+                continue
+
+            with self._lock:
+                self._value(handle).value = self._next_handle
+                self._handles[self._next_handle] = index
+                self._next_handle += 1
+            return ljm_errorcodes.NOERROR
+
+        return ljm_errorcodes.DEVICE_NOT_FOUND
+
+    def LJM_Close(self, handle: int) -> int:
+        with self._lock:
+            if self._handles.pop(handle, None) is None:
+                return ljm_errorcodes.INVALID_HANDLE
+            self._streams.pop(handle, None)
+        return ljm_errorcodes.NOERROR
+
+    def LJM_CloseAll(self) -> int:
+        with self._lock:
+            self._handles.clear()
+            self._streams.clear()
+        return ljm_errorcodes.NOERROR
+
+    def LJM_GetHandleInfo(self, handle: int, device_type, connection_type,
+                          serial_number, ip_address, port,
+                          max_packet_size) -> int:
+        if handle not in self._handles:
+            return ljm_errorcodes.INVALID_HANDLE
+
+        dev_type, conn_type, serial, ip_string = self._device(handle)
+        self._value(device_type).value = self._device_types[dev_type]
+        self._value(connection_type).value = self._connection_types[conn_type]
+        self._value(serial_number).value = serial
+        self._value(ip_address).value = self._ip_to_number(ip_string)
+        self._value(port).value = 502 if conn_type != "USB" else 0
+        self._value(max_packet_size).value = 64 if conn_type == "USB" \
+            else 1040
+        return ljm_errorcodes.NOERROR
+
+    @staticmethod
+    def _ip_to_number(ip_address: str) -> int:
+        number = 0
+        for part in ip_address.split("."):
+            number = (number << 8) | int(part)
+        # LJM hands IP addresses around as signed 32 bit integers.
+        return ctypes.c_int32(number).value
+
+    def LJM_NumberToIP(self, number, ip_string: bytes) -> int:
+        number = self._value(number)
+        number = getattr(number, "value", number) & 0xFFFFFFFF
+        text = ".".join(str((number >> shift) & 0xFF)
+                        for shift in (24, 16, 8, 0)).encode("ascii")
+        # LJM writes the text into the buffer it is given.
+        ctypes.memmove(ip_string, text + b"\0",
+                       min(len(text) + 1, len(ip_string)))
+        return ljm_errorcodes.NOERROR
+
+    def LJM_ListAll(self, device_type: int, connection_type: int, num_found,
+                    device_types, connection_types, serial_numbers,
+                    ip_addresses) -> int:
+        found = 0
+        for dev_type, conn_type, serial, ip_address in self.devices:
+            if device_type not in (ljm_constants.dtANY,
+                                   self._device_types[dev_type]):
+                continue
+            if connection_type not in (ljm_constants.ctANY,
+                                       self._connection_types[conn_type]):
+                continue
+            self._value(device_types)[found] = self._device_types[dev_type]
+            self._value(connection_types)[found] = \
+                self._connection_types[conn_type]
+            self._value(serial_numbers)[found] = serial
+            self._value(ip_addresses)[found] = self._ip_to_number(ip_address)
+            found += 1
+
+        self._value(num_found).value = found
+        return ljm_errorcodes.NOERROR
+
+    def LJM_WriteLibraryConfigS(self, setting: bytes, value) -> int:
+        self.library_config[setting.decode("ascii")] = \
+            getattr(value, "value", value)
+        return ljm_errorcodes.NOERROR
+
+    def LJM_eWriteName(self, handle: int, name: bytes, value) -> int:
+        if handle not in self._handles:
+            return ljm_errorcodes.INVALID_HANDLE
+
+        serial = self._device(handle)[2]
+        self.registers.setdefault(serial, {})[name.decode("ascii")] = \
+            getattr(value, "value", value)
+        return ljm_errorcodes.NOERROR
+
+    def LJM_eWriteNames(self, handle: int, num_frames, names, values,
+                        error_address) -> int:
+        names, values = self._value(names), self._value(values)
+        for i in range(getattr(num_frames, "value", num_frames)):
+            error = self.LJM_eWriteName(handle, names[i], values[i])
+            if error != ljm_errorcodes.NOERROR:
+                return error
+        return ljm_errorcodes.NOERROR
+
+    def LJM_NamesToAddresses(self, num_frames, names, addresses,
+                             types) -> int:
+        names, addresses = self._value(names), self._value(addresses)
+        with self._lock:
+            for i in range(getattr(num_frames, "value", num_frames)):
+                name = names[i].decode("ascii")
+                if name not in self._addresses:
+                    self._addresses[name] = 2 * len(self._addresses)
+                    self._names[self._addresses[name]] = name
+                addresses[i] = self._addresses[name]
+        return ljm_errorcodes.NOERROR
+
+    def LJM_eStreamStart(self, handle: int, scans_per_read, num_addresses,
+                         addresses, frequency) -> int:
+        if handle not in self._handles:
+            return ljm_errorcodes.INVALID_HANDLE
+        if handle in self._streams:
+            return ljm_errorcodes.COULD_NOT_START_STREAM
+
+        addresses = self._value(addresses)
+        channels = [self._names[addresses[i]]
+                    for i in range(num_addresses.value)]
+        self._streams[handle] = _Stream(channels, scans_per_read.value,
+                                        self._value(frequency).value)
+        return ljm_errorcodes.NOERROR
+
+    def LJM_eStreamStop(self, handle: int) -> int:
+        if self._streams.pop(handle, None) is None:
+            return ljm_errorcodes.STREAM_NOT_RUNNING
+        return ljm_errorcodes.NOERROR
+
+    def LJM_eStreamRead(self, handle: int, data, device_backlog,
+                        ljm_backlog) -> int:
+        stream = self._streams.get(handle)
+        if stream is None:
+            return ljm_errorcodes.STREAM_NOT_RUNNING
+        if self.disconnect_after is not None \
+           and stream.num_reads >= self.disconnect_after:
+            return ljm_errorcodes.NO_RESPONSE_BYTES_RECEIVED
+
+        num_channels = len(stream.channels)
+        scans = stream.scans_per_read
+
+        # Wait for the last scan of this packet, then do the host's work.
+        if self.realtime:
+            stream.clock = max(stream.clock,
+                               time.monotonic() - stream.started)
+        ready = (stream.scans_read + scans) / stream.frequency
+        stream.clock = max(stream.clock, ready) + self.read_overhead \
+            + scans * self.scan_overhead
+        if self.jitter:
+            stream.clock += self.jitter * self._random.random_sample()
+        if self.realtime:
+            delay = stream.started + stream.clock - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+
+        backlog = int(stream.clock * stream.frequency) \
+            - (stream.scans_read + scans)
+        if backlog > self.buffer_scans:
+            return ljm_errorcodes.LJM_BUFFER_FULL
+
+        target = self._value(data)
+        if isinstance(target, ctypes.Array):
+            address = ctypes.addressof(target)
+        else:
+            address = ctypes.cast(target, ctypes.c_void_p).value
+        packet = np.ctypeslib.as_array(
+            (ctypes.c_double * (scans * num_channels)).from_address(address))
+        packet = packet.reshape((scans, num_channels))
+
+        times = np.arange(stream.scans_read, stream.scans_read + scans) \
+            / stream.frequency
+        for column, channel in enumerate(stream.channels):
+            packet[:, column] = self.waveform(channel, times)
+
+        stream.num_reads += 1
+        if self.skip_every and stream.num_reads % self.skip_every == 0:
+            packet[:self.skip_scans] = ljm_constants.DUMMY_VALUE
+
+        stream.scans_read += scans
+        self._value(device_backlog).value = 0
+        self._value(ljm_backlog).value = max(backlog, 0)
+        return ljm_errorcodes.NOERROR
@@ -0,0 +1,586 @@
+"""
+A module that provides stages, which summarise stream data as a
+LabjackReader collects it, so the summaries can be read at any time without
+going back over the recorded data.
+"""
+import abc
+
+import numpy as np
+import pandas as pd
+from typing import List
+
+
+class Stage(abc.ABC):
+    """
+    Base class for summaries of stream data. Pass instances to collect_data
+    as its stages argument, and the reader updates each of them with every
+    packet it reads, on the thread that reads the stream. Give every reader
+    its own stages.
+
+    Skipped samples reach stages as NaN, and are left out of every summary.
+
+    Attributes
+    ----------
+    channels : List[str]
+        The name of each channel summarised, once the stage is started.
+    scan_rate : float
+        The number of scans per second, once the stage is started.
+    num_rows : int
+        The number of rows the stage has been given.
+    """
+
+    def __init__(self) -> None:
+        self.channels = []
+        self.scan_rate = None
+        self.num_rows = 0
+
+    def start(self, channels: List[str], scan_rate: float) -> None:
+        """
+        Forget anything summarised before, and get ready for a new stream.
+
+        Parameters
+        ----------
+        channels : List[str]
+            The name of each channel that will be summarised.
+        scan_rate : float
+            The number of scans per second the device is streaming at.
+
+        Returns
+        -------
+        None
+        """
+        self.channels = list(channels)
+        self.scan_rate = scan_rate
+        self.num_rows = 0
+        self._start()
+
+    def update(self, block: np.ndarray) -> None:
+        """
+        Add the rows of a block to the summary.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A 2D float64 array with one row per scan and one column per
+            channel. Skipped samples are NaN.
+
+        Returns
+        -------
+        None
+        """
+        if len(block):
+            self._update(block)
+            self.num_rows += len(block)
+
+    @abc.abstractmethod
+    def _start(self) -> None:
+        """
+        Set up the summary of a new stream, from channels and scan_rate.
+        """
+
+    @abc.abstractmethod
+    def _update(self, block: np.ndarray) -> None:
+        """
+        Add the rows of a block, which has at least one, to the summary.
+        """
+
+
+def _row_summary(block: np.ndarray) -> tuple:
+    """
+    The sum, count, minimum and maximum of each sample of a block on its
+    own, leaving out NaN, for a _Binner.
+    """
+    present = ~np.isnan(block)
+    return np.where(present, block, 0), present.astype(np.int64), block, block
+
+
+def _summary_frame(channels: List[str], times: np.ndarray, mean: np.ndarray,
+                   low: np.ndarray, high: np.ndarray) -> pd.DataFrame:
+    """
+    A DataFrame with a Time column, then a mean, min and max column for each
+    channel, from arrays with one column per channel.
+    """
+    columns = {"Time": times}
+    for i, channel in enumerate(channels):
+        columns[channel + " mean"] = mean[:, i]
+        columns[channel + " min"] = low[:, i]
+        columns[channel + " max"] = high[:, i]
+    return pd.DataFrame(columns)
+
+
+class _Binner(object):
+    """
+    Groups items, each summarised by a sum, count, minimum and maximum per
+    channel, into bins of a fixed number of items. Items that do not fill a
+    bin are kept until later items do.
+    """
+
+    def __init__(self, factor: int, num_channels: int) -> None:
+        self.factor = factor
+        self._pending = (np.empty((0, num_channels)),
+                         np.empty((0, num_channels), dtype=np.int64),
+                         np.empty((0, num_channels)),
+                         np.empty((0, num_channels)))
+
+    def add(self, total: np.ndarray, count: np.ndarray, low: np.ndarray,
+            high: np.ndarray) -> tuple:
+        """
+        Add items, and get the summary of each bin they complete, as the
+        same four arrays with one row per bin.
+        """
+        items = [np.concatenate((pending, new)) for pending, new
+                 in zip(self._pending, (total, count, low, high))]
+        num_bins = len(items[0]) // self.factor
+        whole = num_bins * self.factor
+        self._pending = tuple(item[whole:] for item in items)
+
+        shape = (num_bins, self.factor, items[0].shape[1])
+        total, count, low, high = [item[:whole].reshape(shape)
+                                   for item in items]
+        return (total.sum(axis=1), count.sum(axis=1),
+                np.fmin.reduce(low, axis=1), np.fmax.reduce(high, axis=1))
+
+
+class Decimator(Stage):
+    """
+    Keeps the mean, minimum and maximum of each channel over consecutive
+    bins of rows, at a fixed output rate, for live plots that cannot keep up
+    with every sample. Only the latest bins are kept, so a dashboard can
+    poll a small series of fixed size however long the run goes.
+
+    Attributes
+    ----------
+    rate : float
+        The number of bins wanted per second.
+    points : int
+        The most bins kept.
+    factor : int
+        The number of rows in each bin, once the stage is started.
+    num_bins : int
+        The number of bins completed, including any since replaced.
+    """
+
+    def __init__(self, rate: float, points=4096) -> None:
+        """
+        Create a decimation stage.
+
+        Parameters
+        ----------
+        rate : float
+            The number of bins wanted per second. Each bin holds the whole
+            number of rows closest to the scan rate divided by this.
+        points : int, optional
+            The most bins to keep; the oldest are replaced after that.
+
+        Raises
+        ------
+        ValueError
+            If rate or points is not positive.
+        """
+        if rate <= 0 or points < 1:
+            raise ValueError("Expected a positive rate and number of points.")
+
+        super().__init__()
+        self.rate = rate
+        self.points = points
+        self.factor = None
+        self.num_bins = 0
+
+    def _start(self) -> None:
+        num_channels = len(self.channels)
+        self.factor = max(1, int(round(self.scan_rate / self.rate)))
+        self.num_bins = 0
+        self._binner = _Binner(self.factor, num_channels)
+
+        self._mean = np.empty((self.points, num_channels))
+        self._min = np.empty((self.points, num_channels))
+        self._max = np.empty((self.points, num_channels))
+
+    def _update(self, block: np.ndarray) -> None:
+        self._emit(*self._binner.add(*_row_summary(block)))
+
+    def _emit(self, total: np.ndarray, count: np.ndarray, low: np.ndarray,
+              high: np.ndarray) -> None:
+        # Only the latest bins fit; write each to its place in the ring.
+        num_bins = len(total)
+        kept = min(num_bins, self.points)
+        slots = np.arange(self.num_bins + num_bins - kept,
+                          self.num_bins + num_bins) % self.points
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            self._mean[slots] = total[-kept:] / count[-kept:]
+        self._min[slots] = low[-kept:]
+        self._max[slots] = high[-kept:]
+        self.num_bins += num_bins
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the bins kept, oldest first.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per bin. The column 'Time' is the device time, in
+            seconds, of the first row of the bin, followed by a mean, min
+            and max column for each channel, such as 'AIN0 mean'.
+        """
+        num_bins = self.num_bins
+        kept = min(num_bins, self.points)
+        slots = np.arange(num_bins - kept, num_bins) % self.points
+
+        return _summary_frame(self.channels,
+                              np.arange(num_bins - kept, num_bins)
+                              * self.factor / self.scan_rate,
+                              self._mean[slots], self._min[slots],
+                              self._max[slots])
+
+
+class _Level(object):
+    """
+    The sum, count, minimum and maximum per channel of each bin of one level
+    of a Pyramid, in arrays that double in size as they fill.
+    """
+
+    def __init__(self, size: int, num_channels: int) -> None:
+        self.size = size
+        self.num_bins = 0
+        self._arrays = (np.empty((16, num_channels)),
+                        np.empty((16, num_channels), dtype=np.int64),
+                        np.empty((16, num_channels)),
+                        np.empty((16, num_channels)))
+
+    def append(self, summary: tuple) -> None:
+        needed = self.num_bins + len(summary[0])
+        if needed > len(self._arrays[0]):
+            capacity = max(needed, 2 * len(self._arrays[0]))
+            grown = []
+            for array in self._arrays:
+                new = np.empty((capacity, array.shape[1]), dtype=array.dtype)
+                new[:self.num_bins] = array[:self.num_bins]
+                grown.append(new)
+            self._arrays = tuple(grown)
+
+        for array, values in zip(self._arrays, summary):
+            array[self.num_bins:needed] = values
+        self.num_bins = needed
+
+    def bins(self, first: int, last: int) -> tuple:
+        return tuple(array[first:last] for array in self._arrays)
+
+
+class Pyramid(Stage):
+    """
+    Keeps the mean, minimum and maximum of each channel at several
+    resolutions over the whole run: bins of factor rows, bins of factor of
+    those, and so on. A summary of any time range at about the resolution
+    of a plot can then be read in time proportional to the number of points
+    wanted, not to the length of the range, so even very long recordings
+    can be scrubbed through interactively.
+
+    Every level together takes about 2 bytes per sample at the default
+    factor of 16, a quarter of the recorded data.
+
+    Attributes
+    ----------
+    factor : int
+        The number of rows in a bin of the finest level, and the number of
+        bins of each level in a bin of the next.
+    """
+
+    def __init__(self, factor=16) -> None:
+        """
+        Create a pyramid stage.
+
+        Parameters
+        ----------
+        factor : int, optional
+            The number of rows in a bin of the finest level, and the number
+            of bins of each level in a bin of the next.
+
+        Raises
+        ------
+        ValueError
+            If factor is less than 2.
+        """
+        if factor < 2:
+            raise ValueError("Expected a factor of at least 2.")
+
+        super().__init__()
+        self.factor = factor
+
+    @property
+    def levels(self) -> List[int]:
+        """
+        Get the number of rows in each bin of each level, finest first.
+        """
+        return [level.size for level in self._levels]
+
+    def _start(self) -> None:
+        self._levels = []
+        self._binners = []
+        self._add_level()
+
+    def _add_level(self) -> None:
+        size = self.factor ** (len(self._levels) + 1)
+        self._levels.append(_Level(size, len(self.channels)))
+        self._binners.append(_Binner(self.factor, len(self.channels)))
+
+    def _update(self, block: np.ndarray) -> None:
+        summary = _row_summary(block)
+        depth = 0
+        while len(summary[0]):
+            if depth == len(self._levels):
+                self._add_level()
+            summary = self._binners[depth].add(*summary)
+            self._levels[depth].append(summary)
+            depth += 1
+
+    def query(self, start: float, end: float, points: int) -> pd.DataFrame:
+        """
+        Summarise a range of time in about as many rows as wanted.
+
+        Parameters
+        ----------
+        start : float
+            The device time, in seconds, to summarise from.
+        end : float
+            The device time, in seconds, to summarise up to.
+        points : int
+            The most rows wanted, such as the width of a plot in pixels.
+
+        Returns
+        -------
+        pandas.DataFrame
+            At most points rows, each summarising the bins that start in
+            an equal share of the range, in the same columns as
+            Decimator.to_dataframe, with Time the start of the first of
+            those bins. A share in which no bin of the finest level starts
+            has no row, and the first and last rows may reach just past the
+            range. The last rows read, until they fill a bin of the finest
+            level, are left out.
+
+        Raises
+        ------
+        ValueError
+            If points is not positive.
+        """
+        if points < 1:
+            raise ValueError("Expected a positive number of points.")
+
+        levels = self._levels
+        first_row = max(0, int(np.floor(start * self.scan_rate)))
+        last_row = min(levels[0].num_bins * levels[0].size,
+                       int(np.ceil(end * self.scan_rate)))
+
+        # The coarsest level that still has a bin for every point.
+        depth = 0
+        while (depth + 1 < len(levels) and levels[depth + 1].num_bins
+               and (last_row - first_row) / levels[depth + 1].size
+               >= points):
+            depth += 1
+
+        # Bins of that level, then, where it has not caught up yet, the
+        # finer bins that will make up its next bins.
+        parts = []
+        offsets = []
+        begin = first_row
+        for level in levels[depth::-1]:
+            first = begin // level.size
+            last = min(level.num_bins, -(-last_row // level.size))
+            if first < last:
+                parts.append(level.bins(first, last))
+                offsets.append(np.arange(first, last) * level.size)
+                begin = last * level.size
+        if not parts or first_row >= last_row:
+            empty = np.empty((0, len(self.channels)))
+            return _summary_frame(self.channels, np.empty(0), empty, empty,
+                                  empty)
+
+        total, count, low, high = [np.concatenate(arrays)
+                                   for arrays in zip(*parts)]
+        offsets = np.concatenate(offsets)
+
+        # Combine the bins that start in each share.
+        edges = np.linspace(first_row, last_row, points + 1)
+        share = np.searchsorted(edges, offsets, side="right") - 1
+        share = np.clip(share, 0, points - 1)
+        groups = np.flatnonzero(np.diff(share, prepend=-1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = (np.add.reduceat(total, groups)
+                    / np.add.reduceat(count, groups))
+        return _summary_frame(self.channels,
+                              offsets[groups] / self.scan_rate, mean,
+                              np.fmin.reduceat(low, groups),
+                              np.fmax.reduceat(high, groups))
+
+
+class RunningStats(Stage):
+    """
+    Keeps the count, mean, standard deviation, minimum, maximum and root
+    mean square of each channel over every sample so far. Each block is
+    summarised on its own and merged in with Welford's method, as extended
+    by Chan et al., which stays accurate over long runs.
+    """
+
+    def _start(self) -> None:
+        num_channels = len(self.channels)
+        # Replaced as a whole, so it can be read while being updated.
+        self._state = (np.zeros(num_channels, dtype=np.int64),
+                       np.zeros(num_channels), np.zeros(num_channels),
+                       np.full(num_channels, np.nan),
+                       np.full(num_channels, np.nan))
+
+    def _update(self, block: np.ndarray) -> None:
+        count, mean, squares, low, high = self._state
+
+        present = ~np.isnan(block)
+        block_count = present.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            block_mean = np.where(present, block, 0).sum(axis=0) / block_count
+        block_squares = np.where(present, block - block_mean, 0)
+        block_squares = (block_squares * block_squares).sum(axis=0)
+
+        total = count + block_count
+        seen = block_count > 0
+        delta = np.where(seen, block_mean - mean, 0)
+        ratio = np.divide(block_count, total, out=np.zeros(len(total)),
+                          where=seen)
+        self._state = (total, mean + delta * ratio,
+                       squares + block_squares + delta * delta * count * ratio,
+                       np.fmin(low, np.fmin.reduce(block, axis=0)),
+                       np.fmax(high, np.fmax.reduce(block, axis=0)))
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the statistics so far.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One row per channel, indexed by channel name, with the columns
+            count, mean, std, min, max and rms. std is the sample standard
+            deviation, as pandas computes it. Statistics of a channel with
+            no samples yet are NaN.
+        """
+        count, mean, squares, low, high = self._state
+        with np.errstate(invalid="ignore", divide="ignore"):
+            mean = np.where(count > 0, mean, np.nan)
+            std = np.where(count > 1, np.sqrt(squares / (count - 1)),
+                           np.nan)
+            rms = np.sqrt(squares / count + mean * mean)
+        return pd.DataFrame({"count": count, "mean": mean, "std": std,
+                             "min": low, "max": high, "rms": rms},
+                            index=pd.Index(self.channels, name="Channel"))
+
+
+class WelchPSD(Stage):
+    """
+    Estimates the power spectral density of each channel by Welch's method:
+    the average periodogram of overlapping, Hann windowed segments, each
+    with its mean removed. Segments are taken as soon as enough rows arrive,
+    so only the start of the next segment is held, and the estimate can be
+    read at any time.
+
+    A segment with a skipped sample is left out of its channel's average.
+
+    Attributes
+    ----------
+    segment_length : int
+        The number of rows in each segment.
+    overlap : int
+        The number of rows each segment shares with the next.
+    """
+
+    def __init__(self, segment_length=1024, overlap=None) -> None:
+        """
+        Create a power spectral density stage.
+
+        Parameters
+        ----------
+        segment_length : int, optional
+            The number of rows in each segment. The spectrum has a point
+            every scan rate divided by this many Hz.
+        overlap : int, optional
+            The number of rows each segment shares with the next. Defaults
+            to half of segment_length.
+
+        Raises
+        ------
+        ValueError
+            If segment_length is less than 2, or overlap is not less than it.
+        """
+        if overlap is None:
+            overlap = segment_length // 2
+        if segment_length < 2 or not 0 <= overlap < segment_length:
+            raise ValueError("Expected at least 2 rows per segment, and an"
+                             " overlap of fewer rows.")
+
+        super().__init__()
+        self.segment_length = segment_length
+        self.overlap = overlap
+
+    def _start(self) -> None:
+        num_channels = len(self.channels)
+        length = self.segment_length
+        self._window = 0.5 - 0.5 * np.cos(2 * np.pi * np.arange(length)
+                                          / length)
+        self._pending = np.empty((0, num_channels))
+        # Replaced as a whole, so it can be read while being updated.
+        self._state = (np.zeros((length // 2 + 1, num_channels)),
+                       np.zeros(num_channels, dtype=np.int64))
+
+    def _update(self, block: np.ndarray) -> None:
+        data = np.concatenate((self._pending, block))
+        length = self.segment_length
+        step = length - self.overlap
+        num_segments = ((len(data) - length) // step + 1
+                        if len(data) >= length else 0)
+        self._pending = data[num_segments * step:]
+        if not num_segments:
+            return
+
+        # One (channels, segment_length) view per segment, without copying.
+        segments = np.lib.stride_tricks.sliding_window_view(
+            data, length, axis=0)[::step][:num_segments]
+        valid = ~np.isnan(segments).any(axis=2)
+        segments = segments - segments.mean(axis=2, keepdims=True)
+        spectra = np.fft.rfft(segments * self._window, axis=2)
+        power = spectra.real * spectra.real + spectra.imag * spectra.imag
+
+        total, counts = self._state
+        self._state = (total + np.where(valid[:, :, np.newaxis], power,
+                                        0).sum(axis=0).T,
+                       counts + valid.sum(axis=0))
+
+    @property
+    def num_segments(self) -> np.ndarray:
+        """
+        Get the number of segments averaged so far for each channel.
+        """
+        return self._state[1].copy()
+
+    def to_dataframe(self) -> pd.DataFrame:
+        """
+        Get the spectrum estimated so far.
+
+        Returns
+        -------
+        pandas.DataFrame
+            One column per channel, of power spectral density in units
+            squared per Hz, such as V**2/Hz, indexed by frequency in Hz from
+            0 to half the scan rate. A channel with no whole segment yet is
+            NaN.
+        """
+        total, counts = self._state
+        length = self.segment_length
+        with np.errstate(invalid="ignore", divide="ignore"):
+            density = total / (counts * self.scan_rate
+                               * np.sum(self._window * self._window))
+
+        # Fold in the negative frequencies, which 0 Hz and, for an even
+        # segment length, half the scan rate do not have.
+        density[1:length - length // 2] *= 2
+        return pd.DataFrame(density, columns=self.channels,
+                            index=pd.Index(np.fft.rfftfreq(
+                                length, 1 / self.scan_rate),
+                                name="Frequency"))
@@ -0,0 +1,357 @@
+"""
+A module that provides sinks to write stream data to disk while it is being
+collected by a LabjackReader.
+"""
+import abc
+import json
+import struct
+
+import numpy as np
+from typing import List
+
+from labjackcontroller.labtools import BlockConsumer, _store_columns
+
+
+class StreamWriter(abc.ABC):
+    """
+    Base class for objects that append blocks of stream data to a file as a
+    LabjackReader collects it. Pass an instance to collect_data as its
+    writer argument.
+
+    Blocks are written from a background thread and handed over through a
+    bounded queue, so the speed of the disk never holds up reading from the
+    device unless the queue fills up.
+
+    Subclasses implement _open, _write and _close, which are all called from
+    the thread that writes. Blocks reach _write as 2D float64 arrays, or as
+    arrays of records if any column is stored as another type.
+
+    Attributes
+    ----------
+    path : str
+        The file being written to.
+    columns : List[str]
+        The name of each column written, once the writer is started.
+    metadata : dict
+        The stream parameters and device information recorded with the data,
+        once the writer is started.
+    dtypes : List[numpy.dtype]
+        The data type each column is written as, once the writer is started.
+    rows_written : int
+        The number of rows written to the file so far.
+    """
+
+    def __init__(self, path: str, max_pending=64, batch_rows=None) -> None:
+        """
+        Create a writer. No file is created until a stream starts.
+
+        Parameters
+        ----------
+        path : str
+            The file to write to. An existing file is overwritten.
+        max_pending : int, optional
+            The most blocks that can wait to be written.
+        batch_rows : int, optional
+            If set, rows are regrouped so each write has this many rows.
+            Otherwise, each write has the rows of one packet.
+        """
+        self.path = path
+        self.max_pending = max_pending
+        self.batch_rows = batch_rows
+        self.columns = []
+        self.metadata = {}
+        self.dtypes = []
+        self.rows_written = 0
+        self._consumer = None
+
+    def start(self, columns: List[str], metadata: dict,
+              dtypes=None) -> None:
+        """
+        Open the file and start the thread that writes to it.
+
+        Parameters
+        ----------
+        columns : List[str]
+            The name of each column of the blocks that will be written.
+        metadata : dict
+            JSON-serializable information to record with the data.
+        dtypes : List, optional
+            The data type to write each column as. Every column is float64 if
+            None.
+
+        Returns
+        -------
+        None
+
+        """
+        self.columns = list(columns)
+        self.metadata = dict(metadata)
+        if dtypes is None:
+            dtypes = [np.float64] * len(self.columns)
+        self.dtypes = [np.dtype(dtype) for dtype in dtypes]
+        self.rows_written = 0
+
+        self._record_type = None
+        if any(dtype != np.float64 for dtype in self.dtypes):
+            self._record_type = np.dtype(list(zip(self.columns,
+                                                  self.dtypes)))
+
+        self._open()
+        self._consumer = BlockConsumer(self._write_block,
+                                       max_pending=self.max_pending,
+                                       batch_rows=self.batch_rows)
+
+    def put(self, block: np.ndarray) -> None:
+        """
+        Queue a block of rows to be written.
+
+        Parameters
+        ----------
+        block : numpy.ndarray
+            A 2D array with one row per scan.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        Exception
+            Whatever exception stopped an earlier block from being written.
+        """
+        self._consumer.put(block)
+
+    def close(self, flush=True) -> None:
+        """
+        Stop the writing thread and close the file. Does nothing if the
+        writer is not started.
+
+        Parameters
+        ----------
+        flush : bool, optional
+            If True, wait for every queued block to be written. Otherwise,
+            blocks still waiting are dropped.
+
+        Returns
+        -------
+        None
+
+        Raises
+        ------
+        Exception
+            If flush is True, whatever exception stopped a block from being
+            written.
+        """
+        if self._consumer is None:
+            return
+
+        consumer, self._consumer = self._consumer, None
+        try:
+            consumer.close(flush=flush)
+        finally:
+            self._close()
+
+    def _write_block(self, block: np.ndarray) -> None:
+        if self._record_type is not None:
+            records = np.empty(len(block), dtype=self._record_type)
+            _store_columns(records, block)
+            block = records
+        self._write(block)
+        self.rows_written += len(block)
+
+    @abc.abstractmethod
+    def _open(self) -> None:
+        """
+        Create the file and write anything that comes before the rows.
+        """
+
+    @abc.abstractmethod
+    def _write(self, block: np.ndarray) -> None:
+        """
+        Append a block, already converted to the column types, to the file.
+        """
+
+    @abc.abstractmethod
+    def _close(self) -> None:
+        """
+        Finish and close the file.
+        """
+
+
+class NpyWriter(StreamWriter):
+    """
+    Appends stream data to a .npy file, readable with numpy.load. This is a
+    2D float64 array, or an array of records if any column is stored as
+    another type. The header is rewritten after every write, so the file
+    stays valid if the process dies mid-run. Columns and metadata are written
+    to a JSON file alongside it, named by adding '.json' to the path.
+    """
+
+    def _description(self, num_rows: int) -> str:
+        if self._record_type is None:
+            descr, shape = "'<f8'", (num_rows, len(self.columns))
+        else:
+            descr, shape = repr(self._record_type.descr), (num_rows,)
+        return "{'descr': %s, 'fortran_order': False, 'shape': %r, }" \
+            % (descr, shape)
+
+    def _header(self, num_rows: int) -> bytes:
+        # Magic string, format version 1.0, header length, header.
+        return b"\x93NUMPY\x01\x00" + struct.pack("<H", self._header_len) \
+            + self._description(num_rows).ljust(self._header_len - 1) \
+            .encode("latin1") + b"\n"
+
+    def _open(self) -> None:
+        with open(self.path + ".json", "w") as sidecar:
+            json.dump({"columns": self.columns, "metadata": self.metadata},
+                      sidecar)
+
+        # The header is rewritten in place as rows are added, so leave room
+        # for the largest row count, keeping the data 64-byte aligned.
+        longest = len(self._description(2 ** 63)) + 1
+        self._header_len = 64 * ((longest + 10) // 64 + 1) - 10
+
+        self._file = open(self.path, "wb")
+        self._file.write(self._header(0))
+
+    def _write(self, block: np.ndarray) -> None:
+        self._file.write(np.ascontiguousarray(block).tobytes())
+
+        # Count this block in the header, then go back to the end.
+        self._file.seek(0)
+        self._file.write(self._header(self.rows_written + len(block)))
+        self._file.seek(0, 2)
+
+        self._file.flush()
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class HDF5Writer(StreamWriter):
+    """
+    Appends stream data to a chunked, resizable HDF5 dataset; a 2D float64
+    dataset, or a 1D compound dataset if any column is stored as another
+    type. Columns and metadata are stored as attributes of the dataset.
+    Requires h5py.
+    """
+
+    def __init__(self, path: str, dataset="data", chunk_rows=4096,
+                 compression=None, max_pending=64, batch_rows=None) -> None:
+        """
+        Create a writer. No file is created until a stream starts.
+
+        Parameters
+        ----------
+        path : str
+            The file to write to. An existing file is overwritten.
+        dataset : str, optional
+            The name of the dataset to create in the file.
+        chunk_rows : int, optional
+            The number of rows in each HDF5 chunk.
+        compression : str, optional
+            An h5py compression filter, such as 'gzip' or 'lzf'.
+        max_pending : int, optional
+            The most blocks that can wait to be written.
+        batch_rows : int, optional
+            If set, rows are regrouped so each write has this many rows.
+            Otherwise, each write has the rows of one packet.
+
+        Raises
+        ------
+        ImportError
+            If h5py is not installed.
+        """
+        import h5py
+        self._h5py = h5py
+
+        super().__init__(path, max_pending=max_pending,
+                         batch_rows=batch_rows)
+        self.dataset = dataset
+        self.chunk_rows = chunk_rows
+        self.compression = compression
+
+    def _open(self) -> None:
+        self._file = self._h5py.File(self.path, "w")
+        if self._record_type is None:
+            self._data = self._file.create_dataset(
+                self.dataset, shape=(0, len(self.columns)),
+                maxshape=(None, len(self.columns)),
+                chunks=(self.chunk_rows, len(self.columns)),
+                dtype="f8", compression=self.compression)
+        else:
+            self._data = self._file.create_dataset(
+                self.dataset, shape=(0,), maxshape=(None,),
+                chunks=(self.chunk_rows,), dtype=self._record_type,
+                compression=self.compression)
+
+        self._data.attrs["columns"] = self.columns
+        for key, value in self.metadata.items():
+            self._data.attrs[key] = value if value is not None else ""
+
+    def _write(self, block: np.ndarray) -> None:
+        self._data.resize(self.rows_written + len(block), axis=0)
+        self._data[self.rows_written:] = block
+        self._file.flush()
+
+    def _close(self) -> None:
+        self._file.close()
+
+
+class ParquetWriter(StreamWriter):
+    """
+    Appends stream data to a Parquet file, one row group per write, with one
+    column per channel and time. Columns and metadata are stored in
+    the file's schema metadata under the key 'labjackcontroller'. Requires
+    pyarrow.
+    """
+
+    def __init__(self, path: str, max_pending=64,
+                 batch_rows=65536) -> None:
+        """
+        Create a writer. No file is created until a stream starts.
+
+        Parameters
+        ----------
+        path : str
+            The file to write to. An existing file is overwritten.
+        max_pending : int, optional
+            The most blocks that can wait to be written.
+        batch_rows : int, optional
+            The number of rows in each row group. If None, each packet
+            becomes its own row group, which makes for a slow file to read.
+
+        Raises
+        ------
+        ImportError
+            If pyarrow is not installed.
+        """
+        import pyarrow
+        import pyarrow.parquet
+        self._pyarrow = pyarrow
+
+        super().__init__(path, max_pending=max_pending,
+                         batch_rows=batch_rows)
+
+    def _open(self) -> None:
+        pa = self._pyarrow
+        description = json.dumps({"columns": self.columns,
+                                  "metadata": self.metadata})
+        self._schema = pa.schema([(column, pa.from_numpy_dtype(dtype))
+                                  for column, dtype in zip(self.columns,
+                                                           self.dtypes)],
+                                 metadata={"labjackcontroller": description})
+        self._file = pa.parquet.ParquetWriter(self.path, self._schema)
+
+    def _write(self, block: np.ndarray) -> None:
+        pa = self._pyarrow
+        if self._record_type is None:
+            columns = [block[:, i] for i in range(block.shape[1])]
+        else:
+            columns = [block[name] for name in self.columns]
+        table = pa.Table.from_arrays([pa.array(column) for column in columns],
+                                     schema=self._schema)
+        self._file.write_table(table)
+
+    def _close(self) -> None:
+        self._file.close()
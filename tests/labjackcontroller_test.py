@@ -1,7 +1,20 @@
 import pytest
+import asyncio
+import sys
 import itertools
+import json
+import threading
+import time
 import numpy as np
-from labjackcontroller.labtools import LabjackReader, LJMLibrary
+from labjackcontroller.labtools import LabjackReader, LJMLibrary, DataBuffer, \
+    BlockConsumer, FrequencyCache, MultiReader, Telemetry, _find_skips
+from labjackcontroller.writers import StreamWriter, NpyWriter, HDF5Writer, \
+    ParquetWriter
+from labjackcontroller.simulation import SimulatedLJM
+from labjackcontroller.stages import Stage, Decimator, Pyramid, \
+    RunningStats, WelchPSD
+from labjack.ljm import errorcodes as ljm_errorcodes
+from labjack.ljm.ljm import LJMError
 
 
 @pytest.fixture(scope='session')
@@ -9,6 +22,20 @@ def get_ljm_devices():
     return LJMLibrary().list_all()
 
 
+@pytest.fixture
+def simulated_ljm(monkeypatch, tmp_path):
+    monkeypatch.setenv("LABJACKCONTROLLER_CACHE",
+                       str(tmp_path / "max_freq.json"))
+
+    def install(**kwargs):
+        simulation = SimulatedLJM(**kwargs)
+        LJMLibrary.use_backend(simulation)
+        return simulation
+
+    yield install
+    LJMLibrary.use_backend(None)
+
+
 @pytest.fixture(scope='session')
 def ljm_all_channels():
     channels = [*["AIN" + str(num) for num in range(0, 1)],
@@ -67,6 +94,75 @@ def test_open_close_status(get_ljm_devices):
             curr_device.close()
 
 
+class CountingLJM(SimulatedLJM):
+    """
+    Counts the searches for devices and the requests for handle info, which
+    LJMLibrary should only make when its caches cannot answer.
+    """
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.num_list_all = 0
+        self.num_handle_info = 0
+
+    def LJM_ListAll(self, *args):
+        self.num_list_all += 1
+        return super().LJM_ListAll(*args)
+
+    def LJM_GetHandleInfo(self, *args):
+        self.num_handle_info += 1
+        return super().LJM_GetHandleInfo(*args)
+
+
+def test_connection_pool(simulated_ljm):
+    devices = [("T7", "USB", 470010000, "0.0.0.0"),
+               ("T4", "ETHERNET", 440010001, "192.168.1.2")]
+    simulation = CountingLJM(devices=devices, realtime=False)
+    LJMLibrary.use_backend(simulation)
+
+    library = LJMLibrary()
+    assert library.list_all() == [("T7", "USB", 470010000, "0.0.0.0"),
+                                  ("T4", "Ethernet", 440010001,
+                                   "192.168.1.2")]
+    library.list_all()
+    assert simulation.num_list_all == 1
+    library.list_all(max_age=0)
+    assert simulation.num_list_all == 2
+
+    for device_args in library.list_all():
+        first = LabjackReader(device_args[0], device_identifier=device_args[2])
+        second = LabjackReader(device_args[0],
+                               device_identifier=device_args[2])
+        first.open(verbose=False)
+        second.open(verbose=False)
+
+        # Both readers share one handle, which stays open for the second.
+        handle = second._handle
+        assert first._handle == handle
+        assert library._ljm_users[handle] == 2
+
+        # The device is only asked again when told to refresh.
+        info = library.connection_info(handle)
+        num_handle_info = simulation.num_handle_info
+        assert library.connection_info(handle) == info
+        assert simulation.num_handle_info == num_handle_info
+        assert library.connection_info(handle, refresh=True) == info
+        assert simulation.num_handle_info == num_handle_info + 1
+
+        first.close()
+        assert library._ljm_users[handle] == 1
+        assert library._ljm_is_open[handle]
+        assert repr(second) == repr(second)
+
+        # The last user closes the handle and forgets its info.
+        second.close()
+        assert not library._ljm_is_open[handle]
+        assert handle not in library._ljm_users
+        assert handle not in library._ljm_info
+
+    assert simulation.num_list_all == 2
+
+
 @pytest.mark.parametrize("resolution", range(1, 8))
 @pytest.mark.parametrize("frequency", [10, 100, 1000])
 def test_collect_data_gathering(get_ljm_devices, ljm_all_channels, resolution,
@@ -134,6 +230,403 @@ def test_callbacks(get_ljm_devices):
         assert np.shape(curr_device.to_array(mode="all")) == (10, 5)
 
 
+def test_compact_dtype(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        curr_device.collect_data(["AIN0", "DIO0"], [10.0], 1, 100,
+                                 dtype="compact")
+
+        data = curr_device.to_dataframe()
+        assert list(data.dtypes) == [np.float32, np.uint16, np.float64,
+                                     np.float64]
+
+
+def test_packet_timestamps(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        curr_device.collect_data(["AIN0", "AIN1"], 2 * [10.0], 1, 100,
+                                 scans_per_read=10)
+        rows = curr_device.to_array(copy=True)
+
+        curr_device.collect_data(["AIN0", "AIN1"], 2 * [10.0], 1, 100,
+                                 scans_per_read=10, timestamps="packet")
+
+        data = curr_device.to_array()
+        assert data.shape == (100, 4)
+        assert np.allclose(np.diff(data[:, 2]), 0.01)
+
+        # The simulated clock makes the values and device times the same as
+        # a run storing times in every row.
+        assert np.allclose(data[:, :3], rows[:, :3])
+
+        # Every row of a packet shares its system time.
+        host_times = data[:, 3].reshape((10, 10))
+        assert np.all(host_times == host_times[:, :1])
+        assert np.all(np.diff(host_times[:, 0]) >= 0)
+
+
+def test_mask_skips(simulated_ljm):
+    # Every other packet starts with a skipped scan.
+    simulated_ljm(realtime=False, skip_every=2)
+    with LabjackReader("T7") as curr_device:
+        _, num_skips = curr_device.collect_data(["AIN0", "DIO0"], [10.0],
+                                                1, 100, scans_per_read=10,
+                                                dtype="compact")
+        masked = curr_device.to_array(mask_skips=True)
+
+        assert num_skips == 5
+        assert curr_device.skips["length"].sum() == 2 * num_skips
+        assert masked["DIO0"].dtype == np.float64
+        assert np.isnan(masked["AIN0"]).sum() == num_skips
+        assert np.isnan(masked["DIO0"]).sum() == num_skips
+
+
+def test_multi_reader(simulated_ljm):
+    with pytest.raises(ValueError):
+        MultiReader([])
+
+    devices = [("T7", "USB", serial, "0.0.0.0")
+               for serial in (470010000, 470010001)]
+    simulated_ljm(devices=devices, realtime=True)
+    readers = [LabjackReader("T7", device_identifier=str(device[2]))
+               for device in devices]
+    with MultiReader(readers) as multi:
+        results = multi.collect_data(["AIN0", "AIN1"], 2 * [10.0], 1, 100,
+                                     scans_per_read=10)
+
+        assert len(results) == len(readers)
+        assert readers[0]._handle != readers[1]._handle
+        for reader in readers:
+            data = reader.to_array()
+            assert data.shape == (100, 4)
+            # System times share one origin, set before any stream started.
+            assert data[0, 3] > 0
+
+
+class FailOnceLJM(SimulatedLJM):
+    """
+    Fails to start the first stream on the second device.
+    """
+    failed = False
+
+    def LJM_eStreamStart(self, handle, *args):
+        if self._handles.get(handle) == 1 and not self.failed:
+            self.failed = True
+            return ljm_errorcodes.COULD_NOT_START_STREAM
+        return super().LJM_eStreamStart(handle, *args)
+
+
+def test_multi_reader_error(simulated_ljm):
+    devices = [("T7", "USB", serial, "0.0.0.0")
+               for serial in (470010000, 470010001)]
+    LJMLibrary.use_backend(FailOnceLJM(devices=devices, realtime=True))
+    readers = [LabjackReader("T7", device_identifier=str(device[2]))
+               for device in devices]
+
+    # The first device streams until the second fails to start.
+    with pytest.raises(LJMError):
+        MultiReader(readers).collect_data(["AIN0"], [10.0], None, 100,
+                                          buffer_rows=50)
+
+    # Neither reader's next run is cut short.
+    for reader in readers:
+        reader.collect_data(["AIN0"], [10.0], 0.2, 100)
+        assert len(reader.to_array()) == 20
+        reader.close()
+
+
+def test_block_callbacks(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        shapes = []
+
+        # Scan for 1 second at 100 Hz, with 40 rows per callback.
+        curr_device.collect_data(["AIN0", "AIN2", "AIN4"], 3 * [10.0], 1, 100,
+                                 callback_function=lambda block:
+                                     shapes.append(np.shape(block)),
+                                 callback_mode="block", callback_rows=40)
+
+        assert shapes == [(40, 5), (40, 5), (20, 5)]
+
+        # While the callback is stuck, reading stops once two packets are
+        # pending: one more was read, and one is being handled.
+        gate = threading.Event()
+        blocks = []
+
+        def wait_for_gate(block):
+            gate.wait()
+            blocks.append(block)
+
+        worker = threading.Thread(target=curr_device.collect_data,
+                                  args=(["AIN0"], [10.0], 1, 100),
+                                  kwargs={"scans_per_read": 10,
+                                          "callback_function": wait_for_gate,
+                                          "callback_mode": "block",
+                                          "max_pending": 2})
+        worker.start()
+        time.sleep(0.5)
+        assert worker.is_alive()
+        assert len(curr_device.to_array()) == 40
+
+        gate.set()
+        worker.join(timeout=3)
+        assert not worker.is_alive()
+        assert np.array_equal(np.concatenate(blocks),
+                              curr_device.to_array())
+
+
+def test_block_callbacks_dropped(simulated_ljm):
+    # The device stops responding after five packets.
+    simulated_ljm(realtime=False, disconnect_after=5)
+    with LabjackReader("T7") as curr_device:
+        gate = threading.Event()
+        blocks = []
+
+        def wait_for_gate(block):
+            gate.wait()
+            blocks.append(block)
+
+        # Let the first callback finish only after the run has failed.
+        timer = threading.Timer(0.5, gate.set)
+        timer.start()
+        with pytest.raises(LJMError):
+            curr_device.collect_data(["AIN0"], [10.0], 1, 100,
+                                     scans_per_read=10,
+                                     callback_function=wait_for_gate,
+                                     callback_mode="block")
+        timer.join()
+
+        # Blocks still waiting when the run failed are dropped.
+        assert len(blocks) <= 1
+        assert len(curr_device.to_array()) == 50
+
+
+def test_data_buffer_dtypes():
+    buffer = DataBuffer(["AIN0", "DIO0", "Time"], 4,
+                        dtypes=["f4", "u2", "f8"])
+    buffer.write(np.array([[0.5, 1.0, 0.0], [0.25, -9999.0, 0.1]]))
+
+    rows = buffer.read(0, 2)
+    assert rows.dtype.names == ("AIN0", "DIO0", "Time")
+    assert rows["AIN0"].dtype == np.float32
+    assert rows["DIO0"].tolist() == [1, 0]
+    assert rows["Time"].tolist() == [0.0, 0.1]
+
+    with pytest.raises(ValueError):
+        DataBuffer(["AIN0", "Time"], 4, dtypes=["f4"])
+
+
+def test_data_buffer_packet_times():
+    buffer = DataBuffer(["AIN0", "Time", "System Time"], 6, wrap=True,
+                        packet_rows=4, scan_rate=100.0)
+    for packet in range(3):
+        block = np.zeros((4, 3))
+        block[:, 0] = np.arange(4 * packet, 4 * packet + 4)
+        block[:, 2] = packet + 0.5
+        buffer.write(block)
+
+    # Only the AIN0 column is stored, and the last 6 rows are held.
+    assert buffer._view.shape == (6, 1)
+    rows = buffer.read(0, 6)
+    assert rows[:, 0].tolist() == list(range(6, 12))
+    assert np.allclose(rows[:, 1], np.arange(6, 12) / 100.0)
+    assert rows[:, 2].tolist() == [1.5, 1.5, 2.5, 2.5, 2.5, 2.5]
+
+    with pytest.raises(ValueError):
+        DataBuffer(["AIN0", "Time", "System Time"], 6, packet_rows=4)
+
+
+def test_find_skips():
+    packet = np.ones((6, 3))
+    packet[1:3, 0] = -9999.0
+    packet[5, 0] = -9999.0
+    packet[:, 2] = -9999.0
+
+    skips = _find_skips(packet, 10)
+    assert skips.tolist() == [(11, 2, 0), (15, 1, 0), (10, 6, 2)]
+    assert len(_find_skips(np.ones((6, 3)), 10)) == 0
+
+
+def _backlog_fit(times, backlogs):
+    fit = np.zeros(5)
+    for t, b in zip(times, backlogs):
+        fit += (1, t, b, t * t, t * b)
+    return fit
+
+
+def test_judge_trial():
+    times = np.linspace(0.1, 1.0, 10)
+
+    # A flat backlog passes early, a growing one fails early.
+    steady = _backlog_fit(times, [10] * 10)
+    assert LabjackReader._judge_trial(steady, 10, 0, 100, 1.0, 4.0)
+    growing = _backlog_fit(times, 200 * times)
+    assert LabjackReader._judge_trial(growing, 200, 0, 100, 1.0, 4.0) \
+        is False
+
+    # Undecided until the trial is long enough, then judged on backlog.
+    few = _backlog_fit(times[:2], [10, 10])
+    assert LabjackReader._judge_trial(few, 10, 0, 100, 0.2, 4.0) is None
+    assert LabjackReader._judge_trial(few, 10, 0, 100, 4.0, 4.0)
+
+    # Skips always fail.
+    assert LabjackReader._judge_trial(steady, 10, 1, 100, 1.0, 4.0) is False
+
+    assert LabjackReader._trial_seconds(10, 100, 200, True) == 1.0
+    assert LabjackReader._trial_seconds(10, 199, 200, False) < 10
+    assert LabjackReader._trial_seconds(10, 100, 200, False) == 1.0
+
+
+def test_frequency_cache(tmp_path):
+    cache = FrequencyCache(str(tmp_path / "cache" / "max_freq.json"))
+    key = FrequencyCache.key(470012345, "USB", ["AIN0", "AIN1"],
+                             [10.0, 10.0], 0)
+    assert cache.get(key) is None
+
+    cache.put(key, 57400.0, 1024)
+    assert FrequencyCache(cache.path).get(key) == (57400.0, 1024)
+    assert cache.get(FrequencyCache.key(470012345, "USB", ["AIN0"],
+                                        [10.0], 0)) is None
+
+    cache.clear()
+    assert cache.get(key) is None
+
+
+def test_column_dtypes():
+    dtypes = LabjackReader._column_dtypes(["AIN0", "DIO1", "FIO_STATE",
+                                           "TEMPERATURE_DEVICE_K"],
+                                          "compact")
+    assert dtypes == [np.float32, np.uint16, np.uint16, np.float64,
+                      np.float64, np.float64]
+
+    assert LabjackReader._column_dtypes(["DIO1"], "float32")[0] == np.float32
+
+    with pytest.raises(ValueError):
+        LabjackReader._column_dtypes(["AIN0"], "float16")
+
+
+def test_block_consumer():
+    shapes = []
+    consumer = BlockConsumer(lambda block: shapes.append(np.shape(block)),
+                             max_pending=2, batch_rows=4)
+
+    for _ in range(5):
+        consumer.put(np.zeros((3, 2)))
+    consumer.close()
+
+    # 15 rows regrouped into batches of 4, plus the remainder.
+    assert shapes == [(4, 2), (4, 2), (4, 2), (3, 2)]
+
+    def fail(block):
+        raise RuntimeError()
+
+    consumer = BlockConsumer(fail)
+    consumer.put(np.zeros((3, 2)))
+    with pytest.raises(RuntimeError):
+        consumer.close()
+
+
+def write_stream(writer, blocks, dtypes=None):
+    writer.start(["AIN0", "Time", "System Time"], {"frequency": 1000},
+                 dtypes=dtypes)
+    for block in blocks:
+        writer.put(block)
+    writer.close()
+
+
+def test_npy_writer(tmp_path):
+    blocks = np.arange(30.0).reshape((5, 2, 3))
+    path = str(tmp_path / "stream.npy")
+
+    write_stream(NpyWriter(path), blocks)
+
+    assert np.array_equal(np.load(path), blocks.reshape((10, 3)))
+    with open(path + ".json") as sidecar:
+        assert json.load(sidecar)["metadata"] == {"frequency": 1000}
+
+    write_stream(NpyWriter(path), blocks, dtypes=["f4", "f8", "f8"])
+    records = np.load(path)
+    assert records["AIN0"].dtype == np.float32
+    assert np.array_equal(records["Time"], blocks.reshape((10, 3))[:, 1])
+
+
+def test_incomplete_writer(tmp_path):
+    class OpenOnly(StreamWriter):
+        def _open(self):
+            pass
+
+    # Fails when created, not on the writing thread mid-run.
+    with pytest.raises(TypeError):
+        OpenOnly(str(tmp_path / "run"))
+
+
+def test_collect_data_writer(simulated_ljm, tmp_path):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        path = str(tmp_path / "stream.npy")
+
+        curr_device.collect_data(["AIN0", "AIN2"], 2 * [10.0], 1, 100,
+                                 scans_per_read=10, writer=NpyWriter(path))
+
+        assert np.array_equal(np.load(path), curr_device.to_array())
+        with open(path + ".json") as sidecar:
+            description = json.load(sidecar)
+        assert description["columns"] == ["AIN0", "AIN2", "Time",
+                                          "System Time"]
+        assert description["metadata"]["channels"] == ["AIN0", "AIN2"]
+        assert description["metadata"]["frequency"] == 100
+        assert description["metadata"]["scans_per_read"] == 10
+        assert description["metadata"]["device_type"] == "T7"
+
+
+def test_collect_data_hdf5_parquet_writers(simulated_ljm, tmp_path):
+    h5py = pytest.importorskip("h5py")
+    parquet = pytest.importorskip("pyarrow.parquet")
+
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        path = str(tmp_path / "stream.h5")
+        curr_device.collect_data(["AIN0", "AIN2"], 2 * [10.0], 1, 100,
+                                 scans_per_read=10,
+                                 writer=HDF5Writer(path, chunk_rows=16))
+        with h5py.File(path, "r") as h5_file:
+            assert np.array_equal(h5_file["data"][:],
+                                  curr_device.to_array())
+            assert list(h5_file["data"].attrs["columns"]) == \
+                ["AIN0", "AIN2", "Time", "System Time"]
+            assert h5_file["data"].attrs["frequency"] == 100
+
+        path = str(tmp_path / "stream.parquet")
+        curr_device.collect_data(["AIN0", "AIN2"], 2 * [10.0], 1, 100,
+                                 scans_per_read=10,
+                                 writer=ParquetWriter(path, batch_rows=16))
+        table = parquet.read_table(path)
+        assert table.column_names == ["AIN0", "AIN2", "Time", "System Time"]
+        assert np.array_equal(table.to_pandas().values,
+                              curr_device.to_array())
+        description = json.loads(
+            table.schema.metadata[b"labjackcontroller"])
+        assert description["metadata"]["scans_per_read"] == 10
+
+
+def test_hdf5_parquet_writers(tmp_path):
+    h5py = pytest.importorskip("h5py")
+    parquet = pytest.importorskip("pyarrow.parquet")
+    blocks = np.arange(30.0).reshape((5, 2, 3))
+
+    path = str(tmp_path / "stream.h5")
+    write_stream(HDF5Writer(path, chunk_rows=4), blocks)
+    with h5py.File(path, "r") as h5_file:
+        assert np.array_equal(h5_file["data"][:], blocks.reshape((10, 3)))
+        assert h5_file["data"].attrs["frequency"] == 1000
+
+    path = str(tmp_path / "stream.parquet")
+    write_stream(ParquetWriter(path, batch_rows=4), blocks)
+    table = parquet.read_table(path)
+    assert table.column_names == ["AIN0", "Time", "System Time"]
+    assert np.array_equal(table.to_pandas().values, blocks.reshape((10, 3)))
+
+
 def new_callback(row):
     # This function belongs to test_callbacks above.
     # We expect 3 channels, plus two for time.
@@ -173,3 +666,622 @@ def test_to_array(get_ljm_devices):
 
         with pytest.raises(Exception):
             curr_device.to_array(mode='range', start=-30, end=4)
+
+
+def test_data_buffer_wrap():
+    buffer = DataBuffer(["A", "B"], 5, wrap=True)
+
+    buffer.write(np.arange(14, dtype=float).reshape((7, 2)))
+    assert buffer.num_rows == 5
+    assert buffer.total_rows == 7
+    assert list(buffer.read(0, 5)[:, 0]) == [4, 6, 8, 10, 12]
+
+    # Rows come back oldest first, even across the end of the buffer.
+    buffer.write(np.arange(100, 104, dtype=float).reshape((2, 2)))
+    assert list(buffer.read(0, 5)[:, 0]) == [8, 10, 12, 100, 102]
+    assert list(buffer.read(2, 4)[:, 0]) == [12, 100]
+
+    # Without wrapping, rows past the capacity are dropped.
+    buffer = DataBuffer(["A", "B"], 5)
+    assert buffer.write(np.zeros((7, 2))) == 5
+    assert buffer.is_full
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8),
+                    reason="Shared memory requires Python 3.8")
+def test_data_buffer_shared():
+    buffer = DataBuffer(["A", "B"], 5, storage="shared",
+                        metadata={"frequency": 10})
+    attached = DataBuffer.attach(buffer.name)
+
+    assert attached.columns == ["A", "B"]
+    assert attached.metadata == {"frequency": 10}
+    assert attached.num_rows == 0
+
+    # Writes are visible without copying anything over.
+    buffer.write(np.ones((3, 2)))
+    assert attached.num_rows == 3
+    assert np.all(attached.read(0, 3) == 1)
+
+    attached.close()
+    buffer.close()
+
+
+def test_data_buffer_file(tmp_path):
+    path = str(tmp_path / "buffer.ljdata")
+
+    buffer = DataBuffer(["A", "B"], 5, storage="file", name=path)
+    buffer.write(np.arange(6, dtype=float).reshape((3, 2)))
+    buffer.close()
+
+    # The rows outlive the object that wrote them.
+    reopened = DataBuffer.attach(path, storage="file")
+    assert reopened.num_rows == 3
+    assert list(reopened.read(0, 3, copy=False)[:, 1]) == [1, 3, 5]
+
+    with pytest.raises(ValueError):
+        DataBuffer(["A", "B"], 5, storage="file")
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8),
+                    reason="Shared memory requires Python 3.8")
+def test_attach(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        curr_device.collect_data(["AIN0"], [10.0], 1, 10, storage="shared")
+        name = curr_device.storage_name
+        attached = LabjackReader.attach(name)
+
+        assert np.all(attached.to_array(mode="all")
+                      == curr_device.to_array(mode="all"))
+        assert attached.device_type == "T7"
+        assert list(attached.to_dataframe().columns) == \
+            ["AIN0", "Time", "System Time"]
+
+        # The next run unlinks the old block, though readers attached to it
+        # keep their rows.
+        before = attached.to_array(copy=True)
+        curr_device.collect_data(["AIN0"], [10.0], 1, 10, storage="shared")
+        assert curr_device.storage_name != name
+        with pytest.raises(FileNotFoundError):
+            LabjackReader.attach(name)
+        assert np.array_equal(attached.to_array(), before)
+
+        attached._data_buffer.close()
+        curr_device._data_buffer.close()
+        with pytest.raises(FileNotFoundError):
+            LabjackReader.attach(curr_device.storage_name)
+
+
+def test_collect_data_continuous(simulated_ljm):
+    simulated_ljm(realtime=True)
+    with LabjackReader("T7") as curr_device:
+        worker = threading.Thread(target=curr_device.collect_data,
+                                  args=(["AIN0"], [10.0], None, 100),
+                                  kwargs={"buffer_rows": 50,
+                                          "scans_per_read": 10})
+        worker.start()
+        time.sleep(1)
+        curr_device.stop()
+        worker.join(timeout=3)
+        assert not worker.is_alive()
+
+        # Only the most recent rows are kept, in time order.
+        data = curr_device.to_array(mode="all")
+        assert np.shape(data) == (50, 3)
+        assert np.allclose(np.diff(data[:, 1]), 0.01)
+        # The ring has wrapped at least once.
+        assert data[0, 1] >= 0.5
+
+
+def test_stop_before_streaming(simulated_ljm):
+    simulated_ljm(realtime=True)
+    with LabjackReader("T7") as reader:
+        # Hold the run just before it starts streaming.
+        barrier = threading.Barrier(2)
+        worker = threading.Thread(target=reader.collect_data,
+                                  args=(["AIN0"], [10.0], None, 100),
+                                  kwargs={"buffer_rows": 50,
+                                          "start_barrier": barrier})
+        worker.start()
+        while not barrier.n_waiting:
+            time.sleep(0.001)
+        reader.stop()
+        barrier.wait()
+        worker.join(timeout=3)
+        assert not worker.is_alive()
+
+        # The stop does not carry over to the next run.
+        reader.collect_data(["AIN0"], [10.0], 0.5, 100)
+        assert len(reader.to_array()) == 50
+
+
+def test_stop_when_idle(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as reader:
+        reader.stop()
+        reader.collect_data(["AIN0"], [10.0], 0.5, 100)
+        assert len(reader.to_array()) == 50
+
+        reader.stop()
+        blocks = list(reader.iter_blocks(["AIN0"], [10.0], 100, seconds=0.5,
+                                         scans_per_read=10))
+        assert sum(len(block) for block in blocks) == 50
+
+
+def test_ring_skips_bounded(simulated_ljm):
+    simulated_ljm(realtime=False, skip_every=2)
+    with LabjackReader("T7") as reader:
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 20, 500,
+                            scans_per_read=100, buffer_rows=300)
+        # Only skips in the last 300 rows are kept: rows 9700 and 9900.
+        assert sorted(set(reader.skips["row"])) == [9700, 9900]
+        assert sum(len(skips) for skips in reader._skip_intervals) == 4
+
+
+def test_iter_blocks(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        # Scan for 1 second at 100 Hz, 10 scans at a time.
+        blocks = list(curr_device.iter_blocks(["AIN0", "AIN1"], [10.0, 10.0],
+                                              100, seconds=1,
+                                              scans_per_read=10))
+
+        assert all(np.shape(block) == (10, 4) for block in blocks)
+        assert sum(len(block) for block in blocks) == 100
+
+        # Nothing should have been accumulated.
+        assert curr_device.to_array(mode="all") is None
+
+        # The blocks join up into what collect_data records, system time
+        # aside.
+        curr_device.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 1, 100,
+                                 scans_per_read=10)
+        assert np.array_equal(np.concatenate(blocks)[:, :3],
+                              curr_device.to_array()[:, :3])
+
+        # Abandoning the generator part-way stops the stream.
+        blocks = curr_device.iter_blocks(["AIN0"], [10.0], 100,
+                                         scans_per_read=10)
+        assert np.shape(next(blocks)) == (10, 3)
+        assert curr_device._stream_running
+        blocks.close()
+        assert not curr_device._stream_running
+
+        curr_device.collect_data(["AIN0"], [10.0], 1, 100)
+        assert len(curr_device.to_array()) == 100
+
+
+def test_astream(simulated_ljm):
+    async def gather_blocks(reader):
+        async with reader.astream(["AIN0"], [10.0], 100, seconds=1,
+                                  scans_per_read=10) as stream:
+            return [block async for block in stream]
+
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as curr_device:
+        blocks = asyncio.run(gather_blocks(curr_device))
+
+        assert all(np.shape(block) == (10, 3) for block in blocks)
+        assert sum(len(block) for block in blocks) == 100
+
+        # A finished stream leaves nothing behind to end the next run.
+        curr_device.collect_data(["AIN0"], [10.0], 1, 100)
+        assert len(curr_device.to_array()) == 100
+
+
+def test_simulated_collect_data(simulated_ljm):
+    simulation = simulated_ljm(realtime=False, skip_every=3, skip_scans=2)
+    assert LJMLibrary().list_all() == [("T7", "USB", 470010000, "0.0.0.0")]
+
+    with LabjackReader("T7") as reader:
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 1, 500,
+                            scans_per_read=100)
+        data = reader.to_array()
+
+        assert data.shape == (500, 4)
+        times = np.arange(500) / 500
+        good = np.ones(500, dtype=bool)
+        good[200:202] = False
+        assert np.allclose(data[good, 0], np.sin(2 * np.pi * times[good]))
+        assert np.allclose(data[good, 1],
+                           np.sin(4 * np.pi * times[good]))
+        assert np.all(data[~good, :2] == -9999.0)
+        assert reader.skips.tolist() == [(200, 2, 0), (200, 2, 1)]
+
+    assert simulation.registers[470010000]["AIN1_RANGE"] == 10.0
+
+
+def test_simulated_shared_handle(simulated_ljm):
+    simulated_ljm(realtime=False)
+    first, second = LabjackReader("T7"), LabjackReader("T7")
+    first.open(verbose=False)
+
+    def close_first(block):
+        # Neither close may end the second reader's stream or connection.
+        first.close()
+        first.close()
+
+    second.collect_data(["AIN0"], [10.0], 1, 1000, scans_per_read=100,
+                        callback_function=close_first, callback_mode="block")
+    assert first._handle == second._handle
+    assert second.to_array().shape == (1000, 3)
+    assert LJMLibrary()._ljm_is_open[second._handle]
+    second.close()
+    assert not LJMLibrary()._ljm_is_open.get(second._handle)
+
+
+def test_simulated_digital_channel(simulated_ljm):
+    simulation = simulated_ljm(realtime=False)
+    with LabjackReader("T7") as reader:
+        # Voltages are only for the analog inputs; the extra one is ignored.
+        reader.collect_data(["DIO0", "AIN1"], [5.0, 10.0], 1, 100)
+        assert reader.to_array().shape == (100, 4)
+
+        registers, = simulation.registers.values()
+        assert registers["AIN1_RANGE"] == 5.0
+        assert "DIO0_RANGE" not in registers
+
+        with pytest.raises(ValueError):
+            LJMLibrary().write_names(reader._handle, ["AIN0_RANGE"],
+                                     [10.0, 10.0])
+
+
+class RoundingLJM(SimulatedLJM):
+    """
+    Streams a little slower than asked, as a device rounding its scan rate
+    to its clock does, and reports the rate it uses.
+    """
+
+    def LJM_eStreamStart(self, handle, scans_per_read, num_addresses,
+                         addresses, frequency):
+        frequency = self._value(frequency)
+        frequency.value *= 0.9999
+        return super().LJM_eStreamStart(handle, scans_per_read,
+                                        num_addresses, addresses, frequency)
+
+
+def test_find_max_freq_rounded_rate(simulated_ljm):
+    LJMLibrary.use_backend(RoundingLJM(realtime=False))
+    with LabjackReader("T7") as reader:
+        # The T7 is rated for 600 Hz on one channel at resolution 8.
+        frequency, scans_per_read = reader.find_max_freq(
+            ["AIN0"], [10.0], resolution=8, verbose=False, num_seconds=0.1)
+    assert frequency == 600
+    assert scans_per_read >= 1
+
+
+def test_simulated_backlog_and_disconnect(simulated_ljm):
+    # The host needs 4 ms per scan, twice the time between scans.
+    simulated_ljm(realtime=False, scan_overhead=4e-3)
+    library = LJMLibrary()
+    handle = library.connection_open("T7", "ANY", "ANY")
+    library.stream_start(handle, ["AIN0"], 500, 100)
+    packet = np.empty(100)
+    backlogs = [library.stream_read_into(handle, packet)[1]
+                for _ in range(3)]
+    assert backlogs == [200, 300, 400]
+    library.stream_stop(handle)
+    library.connection_close(handle)
+
+    simulated_ljm(realtime=False, disconnect_after=2)
+    with LabjackReader("T7") as reader:
+        with pytest.raises(LJMError):
+            reader.collect_data(["AIN0"], [10.0], 1, 500, scans_per_read=100)
+
+
+def test_telemetry(simulated_ljm):
+    simulated_ljm(realtime=False, skip_every=2, scan_overhead=4e-3)
+    with LabjackReader("T7") as reader:
+        reader.collect_data(["AIN0"], [10.0], 1, 500, scans_per_read=100)
+        reads = reader.telemetry.to_array()
+
+        assert len(reads) == 5
+        assert reads["skips"].tolist() == [0, 1, 0, 1, 0]
+        assert np.all(np.diff(reads["ljm_backlog"]) > 0)
+        assert np.all(np.diff(reads["time"]) >= 0)
+        assert np.all(reads["read_seconds"] >= 0)
+        assert list(reader.telemetry.to_dataframe().columns) == \
+            list(Telemetry.dtype.names)
+
+        reader.collect_data(["AIN0"], [10.0], 1, 500, scans_per_read=100,
+                            telemetry_reads=0)
+        assert reader.telemetry is None
+
+
+def test_telemetry_wraps():
+    telemetry = Telemetry(3)
+    for i in range(5):
+        telemetry.record(i, 0, 0, 0, 0, 0)
+    assert telemetry.num_reads == 5
+    assert telemetry.to_array()["time"].tolist() == [2, 3, 4]
+
+
+def test_to_array_views(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as reader:
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 1, 500,
+                            scans_per_read=100)
+
+        view = reader.to_array()
+        assert not view.flags.writeable
+        assert np.shares_memory(view, reader.to_array(mode="relative",
+                                                      num_rows=10))
+        assert np.shares_memory(view, reader.to_dataframe().values)
+
+        copied = reader.to_array(copy=True)
+        assert copied.flags.writeable
+        assert not np.shares_memory(view, copied)
+        assert not np.shares_memory(view, reader.to_dataframe(copy=True)
+                                    .values)
+
+        # Views outlive the run they came from.
+        before = view.copy()
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 1, 500,
+                            scans_per_read=100)
+        assert np.array_equal(view, before)
+
+
+def test_data_buffer_columns():
+    block = np.column_stack((np.arange(12.0), -np.arange(12.0),
+                             np.arange(12) / 100, np.arange(12) / 10))
+    for dtypes in (None, [np.float32, np.int16, np.float64, np.float64]):
+        rows = DataBuffer(["AIN0", "DIO0", "Time", "System Time"], 10,
+                          dtypes=dtypes)
+        columns = DataBuffer(["AIN0", "DIO0", "Time", "System Time"], 10,
+                             dtypes=dtypes, layout="columns")
+        for buffer in (rows, columns):
+            buffer.write(block[:8])
+
+        assert np.array_equal(columns.read(2, 8), rows.read(2, 8))
+        for got, expected in zip(columns.read_columns(2, 8, copy=False),
+                                 rows.read_columns(2, 8)):
+            assert got.flags.c_contiguous and not got.flags.writeable
+            assert np.array_equal(got, expected)
+
+    with pytest.raises(ValueError):
+        DataBuffer(["AIN0"], 10, layout="diagonal")
+
+
+def test_columns_layout(simulated_ljm):
+    simulated_ljm(realtime=False, skip_every=2)
+    with LabjackReader("T7") as reader:
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 1, 500,
+                            scans_per_read=100, layout="columns")
+
+        columns = reader.to_columns()
+        assert list(columns) == ["AIN0", "AIN1", "Time", "System Time"]
+        assert columns["AIN1"].flags.c_contiguous
+        assert np.array_equal(np.column_stack(list(columns.values())),
+                              reader.to_array())
+
+        frame = reader.to_dataframe()
+        assert np.shares_memory(frame["AIN1"].to_numpy(), columns["AIN1"])
+
+        masked = reader.to_columns(mode="relative", num_rows=400,
+                                   mask_skips=True)
+        # Rows 100 and 300 were skipped; the last 400 rows start at 100.
+        assert np.flatnonzero(np.isnan(masked["AIN0"])).tolist() == [0, 200]
+        assert np.flatnonzero(np.isnan(masked["AIN1"])).tolist() == [0, 200]
+
+
+@pytest.mark.skipif(sys.version_info < (3, 8),
+                    reason="Shared memory requires Python 3.8")
+def test_collect_data_checks_before_streaming(simulated_ljm):
+    simulation = simulated_ljm(realtime=False)
+    with LabjackReader("T7") as reader:
+        with pytest.raises(ValueError):
+            reader.collect_data(["AIN0"], [10.0], 1, 100, layout="diagonal")
+        assert not simulation._streams
+
+        # A buffer that cannot be allocated leaves the device idle.
+        taken = DataBuffer(["A"], 10, storage="shared")
+        with pytest.raises(FileExistsError):
+            reader.collect_data(["AIN0"], [10.0], 1, 100, storage="shared",
+                                storage_name=taken.name)
+        assert not simulation._streams
+        assert not reader._stream_running
+        taken.close()
+
+        reader.collect_data(["AIN0"], [10.0], 1, 100, scans_per_read=10)
+        assert len(reader.to_array()) == 100
+
+
+def test_collect_data_rounded_rate(simulated_ljm):
+    LJMLibrary.use_backend(RoundingLJM(realtime=False))
+    with LabjackReader("T7") as reader:
+        reader.collect_data(["AIN0"], [10.0], 1, 100, scans_per_read=10,
+                            timestamps="packet")
+
+        # The buffer is made before the stream reports its actual rate.
+        buffer = reader._data_buffer
+        assert buffer.scan_rate == pytest.approx(99.99)
+        assert buffer.metadata["frequency"] == buffer.scan_rate
+        assert DataBuffer._read_description(buffer._raw)["scan_rate"] \
+            == buffer.scan_rate
+        assert np.allclose(np.diff(reader.to_array()[:, 1]), 1 / 99.99)
+
+
+def test_decimator():
+    decimator = Decimator(10, points=4)
+    decimator.start(["AIN0", "AIN1"], 100)
+    assert decimator.factor == 10
+
+    values = np.arange(120, dtype=float).reshape((60, 2))
+    values[3, 1] = np.nan
+    # Uneven blocks carry partial bins over.
+    for begin, end in ((0, 7), (7, 8), (8, 55), (55, 60)):
+        decimator.update(values[begin:end])
+    assert decimator.num_bins == 6 and decimator.num_rows == 60
+
+    frame = decimator.to_dataframe()
+    # Only the last 4 bins are kept.
+    assert np.allclose(frame["Time"], [0.2, 0.3, 0.4, 0.5])
+    expected = values[20:].reshape((4, 10, 2))
+    assert np.allclose(frame["AIN0 mean"], expected[:, :, 0].mean(axis=1))
+    assert np.allclose(frame["AIN1 min"], expected[:, :, 1].min(axis=1))
+    assert np.allclose(frame["AIN1 max"], expected[:, :, 1].max(axis=1))
+
+    # One block may complete more bins than are kept.
+    decimator.start(["AIN0", "AIN1"], 100)
+    decimator.update(values)
+    assert decimator.num_bins == 6
+    frame = decimator.to_dataframe()
+    assert np.allclose(frame["Time"], [0.2, 0.3, 0.4, 0.5])
+    assert np.allclose(frame["AIN0 max"], values[29::10, 0])
+
+    decimator.start(["AIN0", "AIN1"], 100)
+    decimator.update(values[:10])
+    # The skipped sample is left out.
+    assert decimator.to_dataframe()["AIN1 mean"][0] \
+        == np.mean(np.delete(values[:10, 1], 3))
+
+
+def test_incomplete_stage():
+    class StartOnly(Stage):
+        def _start(self):
+            pass
+
+    with pytest.raises(TypeError):
+        StartOnly()
+
+
+def test_collect_data_decimate(simulated_ljm):
+    simulated_ljm(realtime=False, skip_every=3)
+    with LabjackReader("T7") as reader:
+        with pytest.raises(ValueError):
+            reader.to_dataframe(decimate=True)
+
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 2, 500,
+                            scans_per_read=150, stages=[Decimator(25)])
+        frame = reader.to_dataframe(decimate=True)
+        assert len(frame) == 50
+        assert not frame.isna().any().any()
+
+        data = reader.to_dataframe(mask_skips=True)
+        expected = data["AIN0"].to_numpy().reshape((50, 20))
+        assert np.allclose(frame["AIN0 mean"], np.nanmean(expected, axis=1))
+        assert np.allclose(frame["AIN0 max"], np.nanmax(expected, axis=1))
+
+
+def test_pyramid():
+    pyramid = Pyramid(factor=4)
+    pyramid.start(["AIN0"], 100)
+    values = np.sin(np.arange(5002.0))[:, np.newaxis]
+    values[1234] = np.nan
+    for begin in range(0, len(values), 333):
+        pyramid.update(values[begin:begin + 333])
+    assert pyramid.levels[:5] == [4, 16, 64, 256, 1024]
+
+    # 5000 rows fill bins of the finest level; the rest are left out.
+    frame = pyramid.query(0, 100, 10)
+    assert len(frame) <= 10
+    assert np.isclose(frame["AIN0 max"].max(), np.nanmax(values[:5000]))
+    assert np.isclose(frame["AIN0 min"].min(), np.nanmin(values[:5000]))
+    times = np.round(np.append(frame["Time"].to_numpy() * 100, 5000))
+    times = times.astype(int)
+    for row, (begin, end) in enumerate(zip(times[:-1], times[1:])):
+        assert np.isclose(frame["AIN0 mean"][row],
+                          np.nanmean(values[begin:end]))
+
+    # A narrow range comes from the finest bins.
+    frame = pyramid.query(12, 12.4, 100)
+    assert np.allclose(frame["Time"], np.arange(1200, 1240, 4) / 100)
+    assert np.allclose(frame["AIN0 max"],
+                       np.nanmax(values[1200:1240].reshape((10, 4)), axis=1))
+    assert pyramid.query(60, 70, 10).empty
+
+
+def test_reader_summary(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as reader:
+        with pytest.raises(ValueError):
+            reader.summary(0, 1, 10)
+
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 4, 500,
+                            scans_per_read=100, stages=[Pyramid()])
+        frame = reader.summary(1, 3, 4)
+        assert len(frame) == 4
+
+        # Rows 500 to 1500, in whole bins of 16 rows.
+        edges = np.append(np.round(frame["Time"].to_numpy() * 500), 1504)
+        assert edges[0] == 496
+        data = reader.to_dataframe()["AIN1"].to_numpy()
+        for row, (begin, end) in enumerate(zip(edges[:-1].astype(int),
+                                               edges[1:].astype(int))):
+            assert np.isclose(frame["AIN1 mean"][row],
+                              data[begin:end].mean())
+            assert frame["AIN1 max"][row] == data[begin:end].max()
+
+
+def test_running_stats(simulated_ljm):
+    stats = RunningStats()
+    stats.start(["AIN0"], 100)
+    empty = stats.to_dataframe().loc["AIN0"]
+    assert empty["count"] == 0
+    assert empty.drop("count").isna().all()
+
+    simulated_ljm(realtime=False, skip_every=3)
+    with LabjackReader("T7") as reader:
+        with pytest.raises(ValueError):
+            reader.running_stats()
+
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 2, 500,
+                            scans_per_read=150, stages=[stats])
+        data = reader.to_dataframe(mask_skips=True)[["AIN0", "AIN1"]]
+        expected = data.agg(["count", "mean", "std", "min", "max"]).T
+        expected["rms"] = np.sqrt((data ** 2).mean())
+
+        result = reader.running_stats()
+        assert result.index.tolist() == ["AIN0", "AIN1"]
+        assert (result["count"] < 1000).all()
+        assert np.allclose(result.to_numpy(), expected.to_numpy())
+
+
+def test_welch_psd():
+    times = np.arange(4000) / 1000
+    values = np.column_stack((2 * np.sin(2 * np.pi * 50 * times),
+                              np.cos(2 * np.pi * 125 * times)))
+
+    whole = WelchPSD(segment_length=200)
+    whole.start(["AIN0", "AIN1"], 1000)
+    whole.update(values)
+    # 4000 rows hold 39 segments of 200 rows, 100 apart.
+    assert whole.num_segments.tolist() == [39, 39]
+
+    spectrum = whole.to_dataframe()
+    assert spectrum.index[1] == 5 and spectrum.index[-1] == 500
+    assert spectrum.idxmax().tolist() == [50, 125]
+    # The density sums to the power of each sine.
+    assert np.allclose(spectrum.sum() * 5, [2, 0.5], rtol=1e-2)
+
+    # Blocks of any size give the same estimate.
+    blocks = WelchPSD(segment_length=200)
+    blocks.start(["AIN0", "AIN1"], 1000)
+    for begin in range(0, 4000, 77):
+        blocks.update(values[begin:begin + 77])
+    assert np.allclose(blocks.to_dataframe(), spectrum)
+
+    # A segment with a skipped sample is left out.
+    values[150, 1] = np.nan
+    blocks.start(["AIN0", "AIN1"], 1000)
+    blocks.update(values)
+    assert blocks.num_segments.tolist() == [39, 37]
+    assert np.allclose(blocks.to_dataframe(), spectrum, rtol=1e-2)
+
+
+def test_power_spectrum_without_data(simulated_ljm):
+    simulated_ljm(realtime=False)
+    with LabjackReader("T7") as reader:
+        with pytest.raises(ValueError):
+            reader.power_spectrum()
+
+        reader.collect_data(["AIN0", "AIN1"], [10.0, 10.0], 4, 500,
+                            scans_per_read=100, keep_data=False,
+                            stages=[WelchPSD(segment_length=500)])
+        # Only the last packet is kept.
+        assert len(reader.to_array()) == 100
+
+        # The simulated channels are sines of 1 and 2 Hz.
+        spectrum = reader.power_spectrum()
+        assert spectrum.idxmax().tolist() == [1, 2]